@@ -0,0 +1,84 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+#
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# NOTE:
+# This module is imported by launcher before gtk, vte and dtk,
+# don't import any heavy module here, otherwise client handoff will slow down.
+
+import dbus
+import getopt
+import os
+
+APP_SERVER_DBUS_NAME   = "com.deepin.terminal.server"
+APP_SERVER_OBJECT_NAME = "/com/deepin/terminal/server"
+
+def parse_options(argv):
+    '''
+    Parse command line options.
+
+    @param argv: Command line arguments, without program name.
+
+    @return: Return (quake_mode, working_directory, standalone) tuple.
+    '''
+    opts, args = getopt.getopt(argv, "", ["quake-mode", "working-directory=", "standalone"])
+    quake_mode = False
+    working_directory = None
+    standalone = False
+    for (option_name, option_value) in opts:
+        if option_name == "--quake-mode":
+            quake_mode = True
+        elif option_name == "--working-directory":
+            working_directory = option_value
+        elif option_name == "--standalone":
+            standalone = True
+
+    return (quake_mode, working_directory, standalone)
+
+def open_in_running_server(working_directory=None):
+    '''
+    Ask running terminal server to open new window.
+
+    @param working_directory: Working directory of new window, use current directory if it's None.
+
+    @return: Return True if running server open new window, return False if no server running.
+    '''
+    bus = None
+    try:
+        # Use private connection, avoid shared connection without main loop pass to server.
+        bus = dbus.SessionBus(private=True)
+        if not bus.name_has_owner(APP_SERVER_DBUS_NAME):
+            return False
+
+        if working_directory == None:
+            working_directory = os.getcwd()
+
+        server = bus.get_object(APP_SERVER_DBUS_NAME, APP_SERVER_OBJECT_NAME)
+        server.new_window(os.path.abspath(working_directory), dbus_interface=APP_SERVER_DBUS_NAME)
+
+        return True
+    except Exception, e:
+        print "function open_in_running_server got error: %s" % e
+
+        return False
+    finally:
+        if bus:
+            bus.close()
@@ -0,0 +1,121 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+#
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import gzip
+import os
+import stat
+import tempfile
+
+# Read umask once when import, os.umask can't read it without set it, that's not thread safe.
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+def write_file_atomic(path, content, prefix="tmp"):
+    '''
+    Write temp file and rename it to path, file is never left half written.
+
+    Symlink is resolved, so rename replace file it point to, not symlink itself.
+    Mode of existing file is kept, new file get default mode, not 0600 of temp file.
+
+    @param path: Path of file.
+    @param content: Content to write.
+    @param prefix: Prefix of temp file name.
+    '''
+    path = os.path.realpath(path)
+    directory = os.path.dirname(path)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        mode = 0666 & ~UMASK
+
+    (fd, temp_path) = tempfile.mkstemp(prefix=prefix, dir=directory)
+    try:
+        with os.fdopen(fd, "w") as temp_file:
+            temp_file.write(content)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+            os.fchmod(temp_file.fileno(), mode)
+        os.rename(temp_path, path)
+    except:
+        os.remove(temp_path)
+        raise
+
+class ExportFile(object):
+    '''
+    File written to temporary file, and renamed to target file when commit, so cancel won't leave half file.
+
+    Content is compressed with gzip if target file end with '.gz'.
+    '''
+
+    def __init__(self, path):
+        '''
+        Init ExportFile class.
+
+        @param path: Path of target file.
+        '''
+        self.path = path
+
+        (fd, self.temp_path) = tempfile.mkstemp(prefix=".%s." % os.path.basename(path), dir=os.path.dirname(path))
+        # Temporary file is only readable by user, give it same permission as normal file.
+        os.fchmod(fd, 0666 & ~UMASK)
+
+        # GzipFile don't close file object that pass to it, and drop reference of it when close,
+        # so keep raw file to close it self.
+        self.raw_file = os.fdopen(fd, "wb")
+        if path.endswith(".gz"):
+            self.output_file = gzip.GzipFile(os.path.basename(path)[:-3], "wb", fileobj=self.raw_file)
+        else:
+            self.output_file = self.raw_file
+
+    def write(self, content):
+        self.output_file.write(content)
+
+    def close(self):
+        if self.output_file:
+            try:
+                if self.output_file is not self.raw_file:
+                    self.output_file.close()
+            finally:
+                self.raw_file.close()
+                self.output_file = None
+
+    def commit(self):
+        '''
+        Finish writing, and rename temporary file to target file.
+        '''
+        self.close()
+        os.rename(self.temp_path, self.path)
+
+    def abort(self):
+        '''
+        Close and remove temporary file.
+        '''
+        try:
+            self.close()
+        except (IOError, OSError):
+            pass
+
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
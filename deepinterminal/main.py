@@ -24,11 +24,11 @@
 from collections import OrderedDict
 from contextlib import contextmanager 
 from deepin_utils.config import Config
-from deepin_utils.core import unzip, is_int
+from deepin_utils.core import unzip
 from deepin_utils.file import get_parent_dir
 from deepin_utils.file import remove_path, touch_file
 from deepin_utils.font import get_font_families
-from deepin_utils.process import run_command, get_command_output_first_line
+from deepin_utils.process import run_command
 from dtk.ui.constant import WIDGET_POS_BOTTOM_LEFT, ALIGN_END, DEFAULT_FONT_SIZE
 from dtk.ui.draw import draw_pixbuf, draw_text, draw_round_rectangle, draw_radial_ring, draw_vlinear
 from dtk.ui.events import EventRegister
@@ -37,25 +37,40 @@ from dtk.ui.keymap import get_keyevent_name, is_no_key_press
 from dtk.ui.label import Label
 from dtk.ui.menu import Menu
 from dtk.ui.utils import (container_remove_all, get_match_parent, cairo_state, propagate_expose, 
-                          is_left_button, is_right_button, is_in_rect, get_match_children)
+                          is_left_button, is_right_button, is_in_rect)
 from dtk.ui.utils import get_window_shadow_size
 from dtk.ui.utils import place_center, get_widget_root_coordinate
 from dtk.ui.window import Window
+from client import APP_SERVER_DBUS_NAME, APP_SERVER_OBJECT_NAME, parse_options, open_in_running_server
 from nls import _
+from process_tree import ProcessTree
+from file_utils import ExportFile, write_file_atomic
+from man_index import ManIndex, split_page_key
+from pane_index import PaneIndex, DIRECTION_UP, DIRECTION_DOWN, DIRECTION_LEFT, DIRECTION_RIGHT
+from scrollback_archive import ScrollbackArchive
+from session_log import SessionLog, session_log_writer
+import bisect
 import cairo
 import commands
-import gc
+import gio
 import gobject
 import gtk
+import json
 import os
+import pipes
+import re
+import Queue
 import pango
+import signal
 import sqlite3
-import subprocess
 import sys
+import threading
+import time
 import traceback
+import StringIO
 import urllib
 import vte
-import getopt
+import weakref
 
 PROJECT_NAME = "deepin-terminal"
 
@@ -88,7 +103,9 @@ from dtk.ui.theme import ui_theme
 from dtk.ui.treeview import TreeView, NodeItem, get_background_color, get_text_color
 from dtk.ui.unique_service import UniqueService, is_exists
 from dtk.ui.utils import color_hex_to_cairo, alpha_color_hex_to_cairo, cairo_disable_antialias
+from dbus.mainloop.glib import DBusGMainLoop
 import dbus
+import dbus.service
 
 APP_DBUS_NAME   = "com.deepin.terminal"
 APP_OBJECT_NAME = "/com/deepin/terminal"
@@ -105,9 +122,46 @@ gtk.rc_parse_string(
     """ % PANED_HANDLE_SIZE
 )
 
+# Worker threads hand results back to GTK thread through gobject.idle_add.
+gobject.threads_init()
+
 global_event = EventRegister()
+global_event.register_event("xdg-open", lambda command: run_command("xdg-open %s" % command))
 focus_terminal = None
 
+class WindowEventRegister(object):
+    '''
+    Forward global event to callbacks of terminal windows.
+
+    global_event can't remove callback, so it only hold one forward callback per event,
+    and window remove its callbacks here when closed, then closed window can be freed in terminal server.
+    '''
+	
+    def __init__(self):
+        '''
+        Init WindowEventRegister class.
+        '''
+        # Key is event name, value is list of (window, callback).
+        self.window_callbacks = {}
+        
+    def register_event(self, window, event_name, callback):
+        if event_name not in self.window_callbacks:
+            self.window_callbacks[event_name] = []
+            global_event.register_event(event_name, lambda *args, **kwargs: self.emit(event_name, *args, **kwargs))
+            
+        self.window_callbacks[event_name].append((window, callback))
+        
+    def unregister_window(self, window):
+        for (event_name, callbacks) in self.window_callbacks.items():
+            self.window_callbacks[event_name] = filter(lambda (callback_window, callback): callback_window != window, callbacks)
+            
+    def emit(self, event_name, *args, **kwargs):
+        # Copy list, callback may close window and unregister it.
+        for (window, callback) in list(self.window_callbacks[event_name]):
+            callback(*args, **kwargs)
+            
+window_event_register = WindowEventRegister()
+
 STARTUP_MODE_ITEMS = [
     (_("Normal"), "normal"),
     (_("Maximize"), "maximize"),
@@ -123,7 +177,7 @@ CURSOR_BLINK_MODE_ITEMS =[(_("System"), "system"),
             
 WORKSPACE_SNAPSHOT_HEIGHT = 160
 WORKSPACE_SNAPSHOT_OFFSET_TOP = 10
-WORKSPACE_SNAPSHOT_OFFSET_BOTTOM = 30
+WORKSPACE_SNAPSHOT_OFFSET_BOTTOM = 44
 WORKSPACE_SNAPSHOT_OFFSET_X = 10
 
 WORKSPACE_ADD_SIZE = 48
@@ -152,6 +206,39 @@ TRANSPARENT_OFFSET = 0.1
 MIN_TRANSPARENT = 0.2
 
 SEARCH_BAR_PADDING = 6
+SEARCH_DELAY = 200              # milliseconds
+SEARCH_CHUNK_ROWS = 500
+SEARCH_REGEX_CACHE_SIZE = 32
+GLOBAL_SEARCH_THREADS = 2
+GLOBAL_SEARCH_MAX_RESULTS = 1000
+GLOBAL_SEARCH_SNIPPET_LENGTH = 80
+
+TEXT_CACHE_MARGIN_ROWS = 100
+
+EXPORT_CHUNK_ROWS = 2000
+
+SCROLLBACK_MAX_LINES = 1000000
+SCROLLBACK_ARCHIVE_DELAY = 1000  # milliseconds
+SCROLLBACK_ARCHIVE_SYNC_RATIO = 0.5
+
+SESSION_LOG_DELAY = 1000  # milliseconds
+
+MEMORY_CHECK_INTERVAL = 10      # seconds
+MEMORY_BUDGET_MAX_SIZE = 65536  # megabytes
+MEMORY_TRIM_LINES = 1000
+# Approximate bytes of one cell in vte row buffer.
+VTE_CELL_SIZE = 16
+
+MATCH_RESOLVE_THREADS = 4
+MATCH_RESOLVE_TIMEOUT = 1000    # milliseconds
+MATCH_RESOLVE_CACHE_TTL = 10    # seconds
+MATCH_RESOLVE_CACHE_SIZE = 256
+
+# Process tree read by correlative window lookup is reused in this interval.
+CORRELATIVE_SCAN_INTERVAL = 1   # seconds
+
+# Print startup and split timing when environment variable DEEPIN_TERMINAL_PROFILE is set.
+PROFILE_TIMING = os.environ.has_key("DEEPIN_TERMINAL_PROFILE")
 
 _HOME = os.path.expanduser('~')
 XDG_CONFIG_HOME = os.environ.get('XDG_CONFIG_HOME') or \
@@ -162,6 +249,23 @@ XDG_CONFIG_HOME = os.environ.get('XDG_CONFIG_HOME') or \
 # please don't fill password if you care about safety problem.
 LOGIN_DATABASE = os.path.join(XDG_CONFIG_HOME, PROJECT_NAME, ".config", "login.db")
 
+SESSION_PATH = os.path.join(XDG_CONFIG_HOME, PROJECT_NAME, "session.json")
+SESSION_VERSION = 2
+# Windows closed in this interval one after another are saved together, such as logout.
+SESSION_CLOSE_INTERVAL = 2
+
+XDG_CACHE_HOME = os.environ.get('XDG_CACHE_HOME') or \
+            os.path.join(_HOME, '.cache')
+MAN_INDEX_PATH = os.path.join(XDG_CACHE_HOME, PROJECT_NAME, "man_index.json")
+MAN_RENDER_DIR = os.path.join(XDG_CACHE_HOME, PROJECT_NAME, "man")
+SCROLLBACK_ARCHIVE_DIR = os.path.join(XDG_CACHE_HOME, PROJECT_NAME, "scrollback")
+
+XDG_DATA_HOME = os.environ.get('XDG_DATA_HOME') or \
+            os.path.join(_HOME, '.local', 'share')
+SESSION_LOG_DIR = os.path.join(XDG_DATA_HOME, PROJECT_NAME, "logs")
+
+man_index = ManIndex(MAN_INDEX_PATH, MAN_RENDER_DIR)
+
 GENERAL_CONFIG = [
     ("font", "Monospace"),
     ("font_size", "11"),
@@ -194,10 +298,12 @@ KEYBIND_CONFIG = [
     ("switch_next_workspace", "Ctrl + ."),
     ("search_forward", "Ctrl + '"),
     ("search_backward", "Ctrl + \""),
+    ("search_all_terminals", "Ctrl + Shift + f"),
     ("toggle_full_screen", "F11"),
     ("show_helper_window", "Ctrl + Shift + ?"),
     ("show_remote_login_window", "Ctrl + 9"),
     ("show_correlative_window", "Ctrl + 8"),
+    ("save_output", "Ctrl + Shift + s"),
     ]
 
 ADVANCED_CONFIG = [
@@ -210,6 +316,14 @@ ADVANCED_CONFIG = [
     ("scroll_on_key", "True"),
     ("scroll_on_output", "False"),
     ("copy_on_selection", "False"),
+    ("shell_pool_size", "0"),
+    ("shell_pool_expire", "600"),
+    ("cache_rendered_man", "True"),
+    ("scrollback_lines", "10000"),
+    ("scrollback_archive", "True"),
+    ("memory_budget", "1024"),
+    ("session_log", "False"),
+    ("restore_session", "True"),
     ]
 
 DEFAULT_CONFIG = [
@@ -246,15 +360,92 @@ MATCH_URL = 1
 MATCH_FILE = 2
 MATCH_DIRECTORY = 3
 MATCH_COMMAND = 4
+MATCH_PATH = 5
+MATCH_GIT_SHA = 6
+MATCH_HOST = 7
+MATCH_EMAIL = 8
 
 MIN_FONT_SIZE = 8
 
+APPEARANCE_FONT = 1
+APPEARANCE_COLOR = 2
+APPEARANCE_OPACITY = 3
+APPEARANCE_CURSOR_SHAPE = 4
+APPEARANCE_CURSOR_BLINK_MODE = 5
+
+# Write config file after changes quiet down, but never delay changes too long.
+CONFIG_WRITE_DELAY = 500        # milliseconds
+CONFIG_WRITE_MAX_DELAY = 5      # seconds
+
+# Wait a moment after config file changed by other process, merge burst file events.
+CONFIG_RELOAD_DELAY = 100       # milliseconds
+
+SHELL_POOL_MAX_SIZE = 8
+SHELL_POOL_EXPIRE_CHECK_INTERVAL = 30
+
 def is_bool(string_value):
     if isinstance(string_value, bool):
         return string_value
     else:
         return string_value.lower() == "true"
 
+def parse_color(color_value):
+    # Raise ValueError if color is invalid.
+    gtk.gdk.color_parse(color_value)
+    
+    return color_value
+
+# Parse function of typed config options, other options keep string value.
+CONFIG_TYPES = {
+    ("general", "font_size") : int,
+    ("general", "font_color") : parse_color,
+    ("general", "background_color") : parse_color,
+    ("general", "background_transparent") : float,
+    ("general", "background_image") : is_bool,
+    ("advanced", "ask_on_quit") : is_bool,
+    ("advanced", "scroll_on_key") : is_bool,
+    ("advanced", "scroll_on_output") : is_bool,
+    ("advanced", "copy_on_selection") : is_bool,
+    ("advanced", "shell_pool_size") : int,
+    ("advanced", "shell_pool_expire") : int,
+    ("advanced", "cache_rendered_man") : is_bool,
+    ("advanced", "scrollback_lines") : int,
+    ("advanced", "scrollback_archive") : is_bool,
+    ("advanced", "memory_budget") : int,
+    ("advanced", "session_log") : is_bool,
+    ("advanced", "restore_session") : is_bool,
+    ("save_state", "window_width") : int,
+    ("save_state", "window_height") : int,
+    }
+
+class ConfigSnapshot(object):
+    '''
+    Immutable typed config values, default values already merged in.
+    '''
+	
+    def __init__(self, values):
+        '''
+        Init ConfigSnapshot class.
+        
+        @param values: Dict that key is (selection, option) and value is typed config value.
+        '''
+        self._values = dict(values)
+        
+    def get(self, selection, option, default=None):
+        return self._values.get((selection, option), default)
+    
+    def get_changed_keys(self, snapshot):
+        '''
+        Get keys that have different value with given snapshot.
+        
+        @param snapshot: Other ConfigSnapshot instance.
+        
+        @return: Return set of (selection, option).
+        '''
+        return set(filter(
+                lambda key: self._values.get(key) != snapshot._values.get(key), 
+                set(self._values.keys()) | set(snapshot._values.keys())))
+    
 def get_active_working_directory(toplevel_widget):
     '''
     Get active working directory with given toplevel widget.
@@ -269,6 +460,79 @@ def get_active_working_directory(toplevel_widget):
     else:
         return None
     
+def get_fork_info(working_directory=None):
+    '''
+    Get command and directory to fork terminal shell.
+    
+    @param working_directory: Working directory of terminal, startup directory in config has higher priority.
+    
+    @return: Return (fork_command, directory) tuple, directory is None if shell inherit current directory.
+    '''
+    directory = None
+    startup_directory = get_config("advanced", "startup_directory")
+    if startup_directory != "":
+        directory = commands.getoutput("echo %s" % startup_directory)
+        
+    if directory == None or not os.path.exists(directory):
+        if working_directory and os.path.exists(working_directory):
+            directory = working_directory
+        else:
+            directory = None
+            
+    startup_command = get_config("advanced", "startup_command")    
+    if startup_command == "":
+        fork_command = os.getenv("SHELL")
+    else:
+        fork_command = startup_command
+        
+    return (fork_command, directory)
+
+def load_session():
+    '''
+    Load workspace layouts of windows saved when terminal quit.
+    
+    @return: Return list of window sessions, return empty list if no session saved or session file is broken.
+    '''
+    try:
+        with open(SESSION_PATH) as session_file:
+            session = json.load(session_file)
+            
+        if session["version"] == SESSION_VERSION:
+            return filter(lambda window_session: len(window_session["workspaces"]) > 0, session["windows"])
+    except IOError:
+        pass
+    except (ValueError, KeyError, TypeError), e:
+        print "function load_session got error: %s" % e
+        
+    return []
+
+def get_restore_sessions(working_directory):
+    '''
+    Get window sessions to restore when startup.
+    
+    @param working_directory: Working directory of startup, session is only restored when it's None.
+    '''
+    if working_directory == None and get_config("advanced", "restore_session"):
+        return load_session()
+    else:
+        return []
+
+def save_session(window_sessions):
+    '''
+    Save workspace layouts of windows, remove session file if all terminals exited.
+    
+    @param window_sessions: List of window sessions, window session is None if all terminals of window exited.
+    '''
+    window_sessions = filter(lambda window_session: window_session != None, window_sessions)
+    try:
+        if len(window_sessions) > 0:
+            write_file_atomic(SESSION_PATH, json.dumps({"version": SESSION_VERSION, "windows": window_sessions},
+                                                       separators=(",", ":")))
+        elif os.path.exists(SESSION_PATH):
+            os.remove(SESSION_PATH)
+    except (IOError, OSError), e:
+        print "function save_session got error: %s" % e
+    
 def set_terminal_background(terminal):
     cache_pixbuf = CachePixbuf()
     (shadow_x, shadow_y) = get_window_shadow_size(terminal.get_toplevel())
@@ -291,18 +555,48 @@ def set_terminal_background(terminal):
     
 def do_copy_on_selection_toggle(terminal):
     terminal.copy_clipboard()
+    
+class LazyComponent(object):
+    '''
+    Build component when it's first used.
+    '''
+	
+    def __init__(self, build_func):
+        '''
+        Init LazyComponent class.
+        
+        @param build_func: Function to build component, it's called without argument.
+        '''
+        self.build_func = build_func
+        self.component = None
+        
+    def get(self):
+        if self.component == None:
+            self.component = self.build_func()
+            
+        return self.component
+    
+    def is_built(self):
+        return self.component != None
 
 class Terminal(object):
     """
     Terminal class.
     """
 
-    def __init__(self, quake_mode=False, working_directory=None):
+    def __init__(self, quake_mode=False, working_directory=None, server=None, session=None):
         """
         Init Terminal class.
+        
+        @param server: TerminalServer instance if window is running in terminal server.
+        @param session: Window session saved by get_session, restore workspaces of it.
         """
         self.quake_mode = quake_mode
         self.working_directory = working_directory
+        self.server = server
+        self.session = session
+        self.restored_session = session
+        self.is_closed = False
         if self.quake_mode:
             UniqueService(
                 dbus.service.BusName(APP_DBUS_NAME, bus=dbus.SessionBus()),
@@ -313,8 +607,8 @@ class Terminal(object):
         
         self.application = Application(destroy_func=self.quit)
         
-        window_width = int(get_config("save_state", "window_width", 664))
-        window_height = int(get_config("save_state", "window_height", 466))
+        window_width = get_config("save_state", "window_width", 664)
+        window_height = get_config("save_state", "window_height", 466)
         window_min_width = 200
         window_min_height = 150
         self.application.window.set_default_size(window_width, window_height)
@@ -334,7 +628,7 @@ class Terminal(object):
         self.terminal_align = gtk.Alignment()
         self.terminal_align.set(0, 0, 1, 1)
         self.terminal_align.set_padding(0, self.normal_padding, self.normal_padding, self.normal_padding)
-        self.terminal_box = gtk.VBox()
+        self.terminal_box = WorkspaceStack()
         self.terminal_align.add(self.terminal_box)
         self.application.main_box.pack_start(self.terminal_align)
         
@@ -343,30 +637,26 @@ class Terminal(object):
         
         self.application.window.show_window()
         
-        self.workspace_switcher = WorkspaceSwitcher(
-            self.get_workspaces,
-            self.switch_to_workspace
-        )
         self.workspace_switcher_y_offset = 0
         self.is_full_screen = False
-        self.search_bar = SearchBar()
-        self.helper_window = HelperWindow()
-        self.remote_login = RemoteLogin()
+        
+        # Build those components when they're first used, or when idle after first frame drawn.
+        self.lazy_components = OrderedDict([
+                ("workspace_switcher", LazyComponent(
+                        lambda : WorkspaceSwitcher(self.get_workspaces, self.switch_to_workspace, self.new_workspace))),
+                ("search_bar", LazyComponent(SearchBar)),
+                ("helper_window", LazyComponent(HelperWindow)),
+                ("remote_login", LazyComponent(RemoteLogin)),
+                ("global_search", LazyComponent(
+                        lambda : GlobalSearch(self.get_workspace_terminal_infos, self.focus_terminal_row))),
+                ("preference_dialog", LazyComponent(self.create_preference_dialog)),
+                ])
         
         self.is_window_resize_by_user = False
         
         self.generate_keymap()
         
-        self.general_settings = GeneralSettings()
-        self.keybind_settings = KeybindSettings()
-        self.advanced_settings = AdvancedSettings()
-        
-        self.preference_dialog = SettingDialog()
-        self.preference_dialog.set_preference_items(
-            [(_("General"), self.general_settings),
-             (_("Hotkeys"), self.keybind_settings),
-             (_("Advanced"), self.advanced_settings),
-             ])
+        self.first_expose_handler_id = self.application.window.connect_after("expose-event", self.window_first_expose)
         self.application.titlebar.menu_button.connect("button-press-event", self.show_preference_menu)
         self.application.window.connect("destroy", lambda w: self.quit())
         self.application.window.connect("delete-event", self.delete_window)
@@ -376,33 +666,108 @@ class Terminal(object):
         self.application.window.connect("notify::is-active", self.window_is_active)
         self.application.window.connect("window-resize", self.set_window_resize)
         
-        global_event.register_event("close-workspace", self.close_workspace)
-        global_event.register_event("change-window-title", self.change_window_title)
-        global_event.register_event("show-menu", self.show_menu)
-        global_event.register_event("xdg-open", lambda command: run_command("xdg-open %s" % command))
-        global_event.register_event("change-background-transparent", self.change_background_transparent)
-        global_event.register_event("adjust-background-transparent", self.adjust_background_transparent)
-        global_event.register_event("scroll-on-key-toggle", self.scroll_on_key_toggle)
-        global_event.register_event("scroll-on-output-toggle", self.scroll_on_output_toggle)
-        global_event.register_event("copy-on-selection-toggle", self.copy_on_selection_toggle)
-        global_event.register_event("set-cursor-shape", self.set_cursor_shape)
-        global_event.register_event("set-cursor-blink-mode", self.set_cursor_blink_mode)
-        global_event.register_event("change-font", self.change_font)
-        global_event.register_event("change-font-size", self.change_font_size)
-        global_event.register_event("change-color-scheme", self.change_color_scheme)
-        global_event.register_event("change-font-color", self.change_color_scheme)
-        global_event.register_event("change-background-color", self.change_color_scheme)
-        global_event.register_event("keybind-changed", self.keybind_change)
-        global_event.register_event("ssh-login", self.ssh_login)
-        global_event.register_event("background-image-toggle", self.background_image_toggle)
-        global_event.register_event("new-workspace", self.new_workspace)
-        global_event.register_event("quit", self.quit)
-        
-        skin_config.connect("theme-changed", lambda w, n: self.change_background_image())
+        self.register_event("close-workspace", self.close_workspace)
+        self.register_event("change-window-title", self.change_window_title)
+        self.register_event("show-menu", self.show_menu)
+        self.register_event("change-background-transparent", self.change_background_transparent)
+        self.register_event("adjust-background-transparent", self.adjust_background_transparent)
+        self.register_event("scroll-on-key-toggle", self.scroll_on_key_toggle)
+        self.register_event("scroll-on-output-toggle", self.scroll_on_output_toggle)
+        self.register_event("copy-on-selection-toggle", self.copy_on_selection_toggle)
+        self.register_event("set-scrollback-lines", self.set_scrollback_lines)
+        self.register_event("set-cursor-shape", self.set_cursor_shape)
+        self.register_event("set-cursor-blink-mode", self.set_cursor_blink_mode)
+        self.register_event("change-font", self.change_font)
+        self.register_event("change-font-size", self.change_font_size)
+        self.register_event("change-color-scheme", self.change_color_scheme)
+        self.register_event("change-font-color", self.change_color_scheme)
+        self.register_event("change-background-color", self.change_color_scheme)
+        self.register_event("keybind-changed", self.keybind_change)
+        self.register_event("ssh-login", self.ssh_login)
+        self.register_event("background-image-toggle", self.background_image_toggle)
+        self.register_event("quit", self.quit)
+        
+        self.theme_changed_handler_id = skin_config.connect(
+            "theme-changed", lambda w, n: self.is_closed or self.change_background_image())
         
         if self.quake_mode:
             self.fullscreen()
             
+        memory_governor.start()
+            
+    def register_event(self, event_name, callback):
+        # Closed window in terminal server shouldn't respond global event.
+        def handle_event(*args, **kwargs):
+            if not self.is_closed:
+                callback(*args, **kwargs)
+                
+        window_event_register.register_event(self, event_name, handle_event)
+        
+    def unregister_events(self):
+        '''
+        Remove handlers of global event and skin config, they keep closed window alive in terminal server.
+        '''
+        window_event_register.unregister_window(self)
+        skin_config.disconnect(self.theme_changed_handler_id)
+        
+    def is_own_widget(self, widget):
+        return widget.get_toplevel() == self.application.window
+        
+    @property
+    def workspace_switcher(self):
+        return self.lazy_components["workspace_switcher"].get()
+    
+    @property
+    def search_bar(self):
+        return self.lazy_components["search_bar"].get()
+    
+    @property
+    def helper_window(self):
+        return self.lazy_components["helper_window"].get()
+    
+    @property
+    def remote_login(self):
+        return self.lazy_components["remote_login"].get()
+    
+    @property
+    def global_search(self):
+        return self.lazy_components["global_search"].get()
+    
+    @property
+    def preference_dialog(self):
+        return self.lazy_components["preference_dialog"].get()
+    
+    def is_workspace_switcher_visible(self):
+        return self.lazy_components["workspace_switcher"].is_built() and self.workspace_switcher.get_visible()
+    
+    def create_preference_dialog(self):
+        preference_dialog = SettingDialog()
+        preference_dialog.set_preference_items(
+            [(_("General"), GeneralSettings()),
+             (_("Hotkeys"), KeybindSettings()),
+             (_("Advanced"), AdvancedSettings()),
+             ])
+        
+        return preference_dialog
+    
+    def window_first_expose(self, widget, event):
+        self.application.window.disconnect(self.first_expose_handler_id)
+        
+        gobject.idle_add(self.warm_up_components, priority=gobject.PRIORITY_LOW)
+        man_index.refresh()
+        
+        return False
+    
+    def warm_up_components(self):
+        # Only build one component each idle loop, keep window responsive.
+        for (component_name, component) in self.lazy_components.items():
+            if not component.is_built():
+                component.get()
+                
+                return True
+            
+        return False
+        
     def zoom_in_window(self):
         pass
     
@@ -413,7 +778,7 @@ class Terminal(object):
         pass
         
     def button_press_terminal(self, widget, event):
-        if self.workspace_switcher.get_visible():
+        if self.is_workspace_switcher_visible():
             self.workspace_switcher.hide_switcher()
             
     def set_window_resize(self, widget):
@@ -431,7 +796,22 @@ class Terminal(object):
         if not self.quake_mode:
             self.save_window_size()
             
-        gtk.main_quit()
+        setting_config.flush()
+        
+        # Terminal server save session of all windows when last window closed, quake window is never saved.
+        if not self.server and not self.quake_mode and get_config("advanced", "restore_session"):
+            self.merge_session()
+        
+        # Log screen rows of terminals, window maybe quit without destroy terminals.
+        for terminal in self.get_all_terminals():
+            terminal.stop_session_log()
+            
+        if self.server:
+            self.is_closed = True
+            self.unregister_events()
+            self.server.close_window(self)
+        else:
+            gtk.main_quit()
             
     def delete_window(self, widget, event):
         self.quit()
@@ -439,12 +819,15 @@ class Terminal(object):
         return True
         
     def quit(self):
-        child_pids = self.get_terminal_child_pids(self.get_all_terminals())
+        if self.is_closed:
+            return
         
-        ask_on_quit = is_bool(get_config("advanced", "ask_on_quit"))
-        if not ask_on_quit or len(child_pids) == 0:
+        terminal_jobs = self.get_terminal_jobs(self.get_all_terminals())
+        
+        ask_on_quit = get_config("advanced", "ask_on_quit")
+        if not ask_on_quit or len(terminal_jobs) == 0:
             self._quit()
-        elif len(child_pids) > 0:
+        elif len(terminal_jobs) > 0:
             dialog = ConfirmDialog(
                 _("Close terminal?"),
                 _("Terminal still have running programs. Are you sure you want to quit?"),
@@ -459,7 +842,7 @@ class Terminal(object):
         global focus_terminal
         
         # Focus terminal when window active.
-        if window.props.is_active and focus_terminal:
+        if window.props.is_active and focus_terminal and self.is_own_widget(focus_terminal):
             focus_terminal.grab_focus()
         
     def quake(self):
@@ -478,30 +861,36 @@ class Terminal(object):
             focus_terminal.grab_focus()
         
     def background_image_toggle(self, status):
-        for terminal in get_match_children(self.application.window, TerminalWrapper):
-            if status:
-                set_terminal_background(terminal)
-            else:
+        for terminal in self.get_all_terminals():
+            if not status:
                 terminal.reset_background()
+            elif terminal.get_realized():
+                # Terminal in hidden workspace will set background when it's realized.
+                set_terminal_background(terminal)
         
     def change_background_image(self):
         display_background_image = get_config("general", "background_image")
-        if is_bool(display_background_image):
-            for terminal in get_match_children(self.application.window, TerminalWrapper):
-                set_terminal_background(terminal)
+        if display_background_image:
+            for terminal in self.get_all_terminals():
+                if terminal.get_realized():
+                    set_terminal_background(terminal)
+        
+    def ssh_login(self, parent_window, user, server, password, port):
+        if parent_window != self.application.window:
+            return
         
-    def ssh_login(self, user, server, password, port):
         active_terminal = self.application.window.get_focus()
         if active_terminal and isinstance(active_terminal, TerminalWrapper):
             active_terminal.feed_child(
                 "%s %s %s %s %s\n" % (os.path.join("/usr/share/deepin-terminal/scripts/", "ssh_login.sh"), user, server, password, port))
         
     def keybind_change(self, key_value, new_key):
-        for terminal in get_match_children(self.application.window, TerminalWrapper):
+        for terminal in self.get_all_terminals():
             terminal.generate_keymap()
             
         self.generate_keymap()    
-        self.search_bar.generate_keymap()
+        if self.lazy_components["search_bar"].is_built():
+            self.search_bar.generate_keymap()
         
     def generate_keymap(self):
         get_keybind = lambda key_value: get_config("keybind", key_value)
@@ -510,6 +899,7 @@ class Terminal(object):
             "toggle_full_screen",
             "new_workspace",
             "search_forward",
+            "search_all_terminals",
             "show_helper_window",
             "show_remote_login_window",
             "focus_up_terminal",
@@ -536,40 +926,34 @@ class Terminal(object):
             )
                 
     def change_color_scheme(self, value):
-        font_color = get_config("general", "font_color")
-        background_color = get_config("general", "background_color")
-        for terminal in get_match_children(self.application.window, TerminalWrapper):
-            terminal.change_color(font_color, background_color)
-            terminal.background_update()
+        appearance_scheduler.schedule(self.get_all_terminals(), APPEARANCE_COLOR)
         
     def change_font(self, font):    
-        font_size = get_config("general", "font_size")
-        for terminal in get_match_children(self.application.window, TerminalWrapper):
-            terminal.change_font(font, font_size)
+        appearance_scheduler.schedule(self.get_all_terminals(), APPEARANCE_FONT)
 
     def change_font_size(self, font_size):    
-        font = get_config("general", "font")
-        for terminal in get_match_children(self.application.window, TerminalWrapper):
-            terminal.change_font(font, font_size)
+        appearance_scheduler.schedule(self.get_all_terminals(), APPEARANCE_FONT)
         
     def set_cursor_shape(self, cursor_shape):
-        for terminal in get_match_children(self.application.window, TerminalWrapper):
-            terminal.change_cursor_shape(cursor_shape)
+        appearance_scheduler.schedule(self.get_all_terminals(), APPEARANCE_CURSOR_SHAPE)
 
     def set_cursor_blink_mode(self, cursor_blink_mode):
-        for terminal in get_match_children(self.application.window, TerminalWrapper):
-            terminal.change_cursor_blink_mode(cursor_blink_mode)
+        appearance_scheduler.schedule(self.get_all_terminals(), APPEARANCE_CURSOR_BLINK_MODE)
         
     def scroll_on_key_toggle(self, status):
-        for terminal in get_match_children(self.application.window, TerminalWrapper):
+        for terminal in self.get_all_terminals():
             terminal.set_scroll_on_keystroke(status)
 
     def scroll_on_output_toggle(self, status):
-        for terminal in get_match_children(self.application.window, TerminalWrapper):
+        for terminal in self.get_all_terminals():
             terminal.set_scroll_on_output(status)
         
+    def set_scrollback_lines(self, scrollback_lines):
+        for terminal in self.get_all_terminals():
+            terminal.apply_scrollback_lines()
+            
     def copy_on_selection_toggle(self, status):
-        for terminal in get_match_children(self.application.window, TerminalWrapper):
+        for terminal in self.get_all_terminals():
             if status:
                 terminal.connect("selection-changed", do_copy_on_selection_toggle)
             else:
@@ -578,31 +962,21 @@ class Terminal(object):
                 except:
                     pass
         
-    def adjust_background_transparent(self, direction):
-        if not direction in [gtk.gdk.SCROLL_UP, gtk.gdk.SCROLL_DOWN]:
+    def adjust_background_transparent(self, terminal, direction):
+        if not direction in [gtk.gdk.SCROLL_UP, gtk.gdk.SCROLL_DOWN] or not self.is_own_widget(terminal):
             return
         
         transparent = get_config("general", "background_transparent")
         if direction == gtk.gdk.SCROLL_UP:
-            transparent = min(float(transparent) + TRANSPARENT_OFFSET, 1.0)
+            transparent = min(transparent + TRANSPARENT_OFFSET, 1.0)
         elif direction == gtk.gdk.SCROLL_DOWN:
-            transparent = max(float(transparent) - TRANSPARENT_OFFSET, MIN_TRANSPARENT)
+            transparent = max(transparent - TRANSPARENT_OFFSET, MIN_TRANSPARENT)
             
         with save_config(setting_config):    
             setting_config.config.set("general", "background_transparent", transparent)
         
-        for terminal in get_match_children(self.application.window, TerminalWrapper):
-            terminal.set_transparent(float(transparent))
-            
-            # Use background_update to update opacity of terminal.
-            terminal.background_update()
-        
     def change_background_transparent(self, transparent):
-        for terminal in get_match_children(self.application.window, TerminalWrapper):
-            terminal.set_transparent(float(transparent))
-            
-            # Use background_update to update opacity of terminal.
-            terminal.background_update()
+        appearance_scheduler.schedule(self.get_all_terminals(), APPEARANCE_OPACITY)
             
     def show_preference_menu(self, widget, event):
         menu_items = [
@@ -629,7 +1003,10 @@ class Terminal(object):
             get_active_working_directory(self.application.window),
             )
         
-    def show_menu(self, terminal, has_selection, match_text, correlative_window_ids, (x_root, y_root)):
+    def show_menu(self, terminal, has_selection, match_info, correlative_window_ids, (x_root, y_root)):
+        if not self.is_own_widget(terminal):
+            return
+        
         # Build menu.
         menu_items = []
         if has_selection:
@@ -637,24 +1014,38 @@ class Terminal(object):
             
         menu_items.append((None, _("Paste"), terminal.paste_clipboard))    
             
-        if match_text:
-            match_info = terminal.get_match_type(match_text)
-            if match_info:
-                (match_type, match_string) = match_info
-                if match_type == MATCH_FILE:
-                    menu_name = _("Open file")
-                if match_type == MATCH_DIRECTORY:
-                    menu_name = _("Open directory")
-                elif match_type == MATCH_URL:
-                    menu_name = _("Open URL")
-                elif match_type == MATCH_COMMAND:
-                    menu_name = _("Open manual")
-                    
-                menu_items.append((None, menu_name, lambda : terminal.open_match_string(match_type, match_string)))
+        if match_info:
+            (match_type, match_string) = match_info
+            if match_type == MATCH_FILE:
+                menu_name = _("Open file")
+            if match_type == MATCH_DIRECTORY:
+                menu_name = _("Open directory")
+            elif match_type == MATCH_URL:
+                menu_name = _("Open URL")
+            elif match_type == MATCH_GIT_SHA:
+                menu_name = _("Show commit")
+            elif match_type == MATCH_HOST:
+                menu_name = _("Open address")
+            elif match_type == MATCH_EMAIL:
+                menu_name = _("Send mail")
+            elif match_type == MATCH_COMMAND:
+                menu_name = _("Open manual")
+                
+                # Render man page before user open it.
+                if get_config("advanced", "cache_rendered_man"):
+                    man_index.render(match_string)
+                
+            menu_items.append((None, menu_name, lambda : terminal.open_match_string(match_type, match_string)))
                 
         menu_items.append((None, _("Open current directory"), lambda : terminal.open_match_string(MATCH_DIRECTORY, terminal.get_working_directory())))        
+        menu_items.append((None, _("Save output..."), terminal.save_output))
+        
+        if terminal.session_log:
+            menu_items.append((None, _("Stop logging"), terminal.stop_session_log))
+        else:
+            menu_items.append((None, _("Start logging"), terminal.start_session_log))
                 
-        if correlative_window_ids != None and correlative_window_ids != [""]:
+        if correlative_window_ids:
             menu_items.append((
                     None,
                     _("Show correlative child window"), lambda : terminal.show_correlative_window(correlative_window_ids)))
@@ -677,7 +1068,7 @@ class Terminal(object):
                 ]
         
         if len(self.get_workspaces()) > 1:
-            current_workspace = self.terminal_box.get_children()[0]
+            current_workspace = self.terminal_box.get_current_workspace()
             
             workspace_items = [
                 None,
@@ -707,8 +1098,9 @@ class Terminal(object):
         
     def get_all_terminal_infos(self):
         focus_terminal = self.application.window.get_focus()
-        terminals = get_match_children(self.application.window, TerminalWrapper)
-        terminals.remove(focus_terminal)
+        terminals = self.get_workspace_terminals(self.terminal_box.get_current_workspace())
+        if focus_terminal in terminals:
+            terminals.remove(focus_terminal)
         return (focus_terminal, terminals)
         
     def close_other_window(self):
@@ -716,164 +1108,151 @@ class Terminal(object):
         for terminal in terminals:
             terminal.close_current_window()
         
-    def focus_vertical_terminal(self, up=True):
-        # Get all terminal information.
-        (focus_terminal, terminals) = self.get_all_terminal_infos()
-        rect = focus_terminal.allocation
-        x, y, w, h = rect.x, rect.y, rect.width, rect.height
-        
-        # Find terminal intersects with focus one.
-        def is_same_coordinate(t):
-            if up:
-                return t.allocation.y + t.allocation.height + PANED_HANDLE_SIZE == y
-            else:
-                return t.allocation.y == y + h + PANED_HANDLE_SIZE
-            
-        intersectant_terminals = filter(
-            lambda t: 
-            (is_same_coordinate(t) and
-             t.allocation.x < x + w + PANED_HANDLE_SIZE and 
-             t.allocation.x + t.allocation.width + PANED_HANDLE_SIZE > x),
-            terminals)
-        if len(intersectant_terminals) > 0:
-            # Focus terminal if y coordinate is same.
-            same_coordinate_terminals = filter(
-                lambda t: 
-                t.allocation.x == x,
-                intersectant_terminals)
-            if len(same_coordinate_terminals) > 0:
-                print "Same coordinate"
-                same_coordinate_terminals[0].grab_focus()
-            else:
-                # Focus terminal if it's height than focus one.
-                bigger_match_terminals = filter(
-                    lambda t: 
-                    (t.allocation.x < x and 
-                     t.allocation.x + t.allocation.width >= x + w),
-                    intersectant_terminals)
-                if len(bigger_match_terminals) > 0:
-                    print "Bigger"
-                    bigger_match_terminals[0].grab_focus()
-                else:
-                    # Focus biggest intersectant area one.
-                    intersectant_area_infos = map(
-                        lambda t:
-                            (t, 
-                             (t.allocation.width + w - abs(t.allocation.x - x) - abs(t.allocation.x + t.allocation.width - x - w) / 2)),
-                        intersectant_terminals)
-                    biggest_intersectant_terminal = sorted(intersectant_area_infos, key=lambda (_, area): area, reverse=True)[0][0]
-                    print "Biggest"
-                    biggest_intersectant_terminal.grab_focus()
-    
-    def focus_horizontal_terminal(self, left=True):                
-        # Get all terminal information.
-        (focus_terminal, terminals) = self.get_all_terminal_infos()
-        rect = focus_terminal.allocation
-        x, y, w, h = rect.x, rect.y, rect.width, rect.height
-        
-        # Find terminal intersectant with focus one.
-        def is_same_coordinate(t):
-            if left:
-                return t.allocation.x + t.allocation.width + PANED_HANDLE_SIZE == x
-            else:
-                return t.allocation.x == x + w + PANED_HANDLE_SIZE
-            
-        intersectant_terminals = filter(
-            lambda t: 
-            (is_same_coordinate(t) and
-             t.allocation.y < y + h + PANED_HANDLE_SIZE and 
-             t.allocation.y + t.allocation.height + PANED_HANDLE_SIZE > y),
-            terminals)
-        if len(intersectant_terminals) > 0:
-            # Focus terminal if y coordinate is same.
-            same_coordinate_terminals = filter(
-                lambda t: 
-                t.allocation.y == y,
-                intersectant_terminals)
-            if len(same_coordinate_terminals) > 0:
-                print "Same coordinate"
-                same_coordinate_terminals[0].grab_focus()
-            else:
-                # Focus terminal if it's height than focus one.
-                bigger_match_terminals = filter(
-                    lambda t: 
-                    (t.allocation.y < y and 
-                     t.allocation.y + t.allocation.height >= y + h),
-                    intersectant_terminals)
-                if len(bigger_match_terminals) > 0:
-                    print "Bigger"
-                    bigger_match_terminals[0].grab_focus()
-                else:
-                    # Focus biggest intersectant area one.
-                    intersectant_area_infos = map(
-                        lambda t:
-                            (t, 
-                             (t.allocation.height + h - abs(t.allocation.y - y) - abs(t.allocation.y + t.allocation.height - y - h) / 2)),
-                        intersectant_terminals)
-                    biggest_intersectant_terminal = sorted(intersectant_area_infos, key=lambda (_, area): area, reverse=True)[0][0]
-                    print "Biggest"
-                    biggest_intersectant_terminal.grab_focus()
+    def focus_neighbour_terminal(self, direction):
+        focus_terminal = self.application.window.get_focus()
+        workspace = self.terminal_box.get_current_workspace()
+        if workspace and isinstance(focus_terminal, TerminalWrapper):
+            terminal = workspace.get_pane_index().find_neighbour(focus_terminal, direction)
+            if terminal:
+                terminal.grab_focus()
                     
     def focus_up_terminal(self):
-        self.focus_vertical_terminal(True)
+        self.focus_neighbour_terminal(DIRECTION_UP)
         
     def focus_down_terminal(self):
-        self.focus_vertical_terminal(False)
+        self.focus_neighbour_terminal(DIRECTION_DOWN)
     
     def focus_left_terminal(self):
-        self.focus_horizontal_terminal(True)
+        self.focus_neighbour_terminal(DIRECTION_LEFT)
 
     def focus_right_terminal(self):
-        self.focus_horizontal_terminal(False)
+        self.focus_neighbour_terminal(DIRECTION_RIGHT)
+        
+    def get_terminal_jobs(self, terminals):
+        '''
+        Get jobs running in terminals.
         
-    def get_terminal_child_pids(self, terminals):
-        return filter(lambda pid: pid != '', map(lambda terminal: commands.getoutput("pgrep -P %s" % terminal.process_id), terminals))
+        @return: Return list of (terminal, job_pid, job_name), terminal is not in list if it's idle.
+        '''
+        # Read /proc once for all terminals, not fork pgrep for every terminal.
+        process_tree = ProcessTree()
+        terminal_jobs = []
+        for terminal in terminals:
+            job = process_tree.get_job(terminal.process_id)
+            if job:
+                (job_pid, job_name) = job
+                terminal_jobs.append((terminal, job_pid, job_name))
+                
+        return terminal_jobs
         
     def get_all_terminals(self):
-        return get_match_children(self.application.window, TerminalWrapper)
+        return terminal_registry.get_terminals(self.workspace_list)
         
     def get_workspace_terminals(self, workspace):
-        return get_match_children(workspace, TerminalWrapper)
+        return terminal_registry.get_workspace_terminals(workspace)
         
-    def get_workspaces(self):
-        children = self.terminal_box.get_children()
-        if len(children) == 1:
-            child = children[0]
-            if child and isinstance(child, Workspace):
-                child.save_workspace_snapshot()
+    def get_workspace_terminal_infos(self):
+        '''
+        Get terminals of all workspaces.
         
+        @return: Return list of (workspace_index, terminals), terminals are in order of panes.
+        '''
+        return map(lambda (index, workspace): (index, workspace.get_terminals()), enumerate(self.workspace_list))
+    
+    def focus_terminal_row(self, terminal, row):
+        workspace = terminal_registry.get_terminal_workspace(terminal)
+        if workspace in self.workspace_list:
+            self.switch_to_workspace(self.workspace_list.index(workspace))
+            terminal.grab_focus()
+            terminal.scroll_to_row(row)
+    
+    def get_workspaces(self):
         return self.workspace_list
     
+    def update_workspace_snapshot(self):
+        current_workspace = self.terminal_box.get_current_workspace()
+        if current_workspace:
+            current_workspace.save_workspace_snapshot()
+            
+            # Workspace restored from session has no snapshot before it's shown.
+            if current_workspace.snapshot_pixbuf:
+                for workspace in self.workspace_list:
+                    if workspace.snapshot_pixbuf == None:
+                        workspace.init_blank_snapshot(
+                            current_workspace.snapshot_pixbuf.get_width(),
+                            current_workspace.snapshot_pixbuf.get_height())
+    
     def switch_to_workspace(self, workspace_index):
         workspace = self.workspace_list[workspace_index]
-        current_workspace = self.terminal_box.get_children()[0]
-        if workspace != current_workspace:
-            self.remove_current_workspace()
-            self.terminal_box.add(workspace)
-            self.terminal_box.show_all()
-        
-    def remove_current_workspace(self, save_snapshot=True):
-        children = self.terminal_box.get_children()
-        if len(children) == 1:
-            child = children[0]
-            if child and isinstance(child, Workspace):
-                child.save_workspace_snapshot()
-                self.terminal_box.remove(child)
-        
+        if workspace != self.terminal_box.get_current_workspace():
+            self.update_workspace_snapshot()
+            self.terminal_box.switch_workspace(workspace)
+            
     def first_workspace(self):
-        self.new_workspace(self.working_directory)
+        if self.session:
+            self.restore_session(self.session)
+            self.session = None
+        else:
+            self.new_workspace(self.working_directory)
+            
+    def merge_session(self):
+        '''
+        Save session of standalone window, keep other windows in session file.
+        
+        Window replace session that it restored, other windows saved by terminal server are kept.
+        '''
+        window_sessions = filter(lambda window_session: window_session != self.restored_session, load_session())
+        save_session(window_sessions + [self.get_session()])
+        
+    def restore_session(self, session):
+        '''
+        Restore workspaces of session.
+        
+        Only current workspace fork shells, other workspaces build terminals when they're shown first time.
+        '''
+        for layout in session["workspaces"]:
+            workspace = Workspace()
+            workspace.pending_layout = layout
+            self.terminal_box.add_workspace(workspace, False)
+            self.workspace_list.append(workspace)
+            
+        current_index = min(max(0, session.get("current", 0)), len(self.workspace_list) - 1)
+        self.terminal_box.switch_workspace(self.workspace_list[current_index])
+        
+    def get_session(self):
+        '''
+        Get split tree, working directories and startup commands of all workspaces in window.
+        
+        @return: Return window session dict, return None if all terminals exited.
+        '''
+        current_workspace = self.terminal_box.get_current_workspace()
+        current_index = 0
+        layouts = []
+        for workspace in self.workspace_list:
+            layout = workspace.get_layout()
+            if layout != None:
+                if workspace == current_workspace:
+                    current_index = len(layouts)
+                layouts.append(layout)
+                
+        if len(layouts) > 0:
+            return {
+                "current": current_index,
+                "workspaces": layouts,
+                }
+        else:
+            return None
                 
     def new_workspace(self, working_directory=None):
         if working_directory == None or not(os.path.exists(working_directory)):
             working_directory = get_active_working_directory(self.application.window)
         
         workspace = Workspace()
-        terminal_grid = TerminalGrid(working_directory=working_directory)
+        terminal_grid = TerminalGrid(working_directory=working_directory, workspace=workspace)
         workspace.add(terminal_grid)
         
-        self.remove_current_workspace()
-        self.terminal_box.add(workspace)
-        self.terminal_box.show_all()
+        self.update_workspace_snapshot()
+        self.terminal_box.add_workspace(workspace)
         
         self.workspace_list.append(workspace)
         
@@ -884,22 +1263,27 @@ class Terminal(object):
         if workspace in self.workspace_list:
             self.workspace_list.remove(workspace)
             
+        terminal_registry.unregister_workspace(workspace)
+            
         # Show previous workspace.
-        if len(self.workspace_list) > 0:
-            self.remove_current_workspace(False)
-            self.terminal_box.add(self.workspace_list[workspace_index - 1])
-            self.terminal_box.show_all()
+        if len(self.workspace_list) > 0 and workspace == self.terminal_box.get_current_workspace():
+            self.terminal_box.switch_workspace(self.workspace_list[workspace_index - 1])
+            
+        self.terminal_box.remove_workspace(workspace)
         
     def close_workspace(self, workspace):    
+        if workspace not in self.workspace_list:
+            return
+        
         if len(self.workspace_list) == 1:
-            global_event.emit("quit")
+            self.quit()
         else:        
-            child_pids = self.get_terminal_child_pids(self.get_workspace_terminals(workspace))
+            terminal_jobs = self.get_terminal_jobs(self.get_workspace_terminals(workspace))
 
-            ask_on_quit = is_bool(get_config("advanced", "ask_on_quit"))
-            if not ask_on_quit or len(child_pids) == 0:
+            ask_on_quit = get_config("advanced", "ask_on_quit")
+            if not ask_on_quit or len(terminal_jobs) == 0:
                 self._close_workspace(workspace)
-            elif len(child_pids) > 0:
+            elif len(terminal_jobs) > 0:
                 dialog = ConfirmDialog(
                     _("Close workspace?"),
                     _("Workspace still have running programs. Are you sure you want to quit?"),
@@ -910,13 +1294,14 @@ class Terminal(object):
                     )
                 dialog.show_all()
             
-    def change_window_title(self, window_title):
-        self.application.titlebar.change_title(window_title)
+    def change_window_title(self, terminal, window_title):
+        if self.is_own_widget(terminal):
+            self.application.titlebar.change_title(window_title)
         
     def close_current_workspace(self):
-        children = self.terminal_box.get_children()
-        if len(children) > 0:
-            self.close_workspace(children[0])
+        current_workspace = self.terminal_box.get_current_workspace()
+        if current_workspace:
+            self.close_workspace(current_workspace)
         else:
             print "IMPOSSIBLE: no workspace in terminal_box"
             
@@ -929,11 +1314,12 @@ class Terminal(object):
             WORKSPACE_SNAPSHOT_HEIGHT
             
     def get_current_workspace_index(self):
-        current_workspace = self.terminal_box.get_children()[0]
-        return self.workspace_list.index(current_workspace)
+        return self.workspace_list.index(self.terminal_box.get_current_workspace())
     
     def show_workspace(self):
         if not self.workspace_switcher.get_visible():
+            # Refresh snapshot once when switcher show, expose of switcher just draw cached snapshots.
+            self.update_workspace_snapshot()
             self.workspace_switcher.show_switcher(
                 self.get_current_workspace_index(),
                 self.get_workspace_switcher_coordinate()
@@ -957,6 +1343,9 @@ class Terminal(object):
             self.application.window.get_focus(),
             )
         
+    def search_all_terminals(self):
+        self.global_search.show_search(self.application.window)
+        
     def key_press_terminal(self, widget, event):
         """
         Key event callback
@@ -967,7 +1356,8 @@ class Terminal(object):
         if key_name in self.keymap:
             # Hide switcher first when key not is workspace switch key. 
             if key_name not in [self.switch_prev_workspace_key, self.switch_next_workspace_key]:
-                self.workspace_switcher.hide_switcher()
+                if self.is_workspace_switcher_visible():
+                    self.workspace_switcher.hide_switcher()
                 
             self.keymap[key_name]()
             
@@ -976,7 +1366,7 @@ class Terminal(object):
             return False
         
     def key_release_terminal(self, widget, event):
-        if self.workspace_switcher.get_visible():
+        if self.is_workspace_switcher_visible():
             if is_no_key_press(event):
                 self.switch_to_workspace(self.workspace_switcher.workspace_index)
                 self.workspace_switcher.hide_switcher()
@@ -1017,14 +1407,112 @@ class Terminal(object):
         """
         Main function.
         """
+        self.apply_startup_mode()
+            
+        # self.application.run()
+        gtk.main()    
+        
+    def apply_startup_mode(self):
         startup_mode = get_config("advanced", "startup_mode", "normal")
         if startup_mode == "maximize":
             self.application.window.maximize()
         elif startup_mode == "fullscreen":
             self.toggle_full_screen()
             
-        # self.application.run()
-        gtk.main()    
+class TerminalServer(dbus.service.Object):
+    """
+    Run all terminal windows in one process, later launches ask it to open new window.
+    """
+    
+    def __init__(self):
+        """
+        Init TerminalServer class.
+        
+        Raise dbus.exceptions.DBusException if session bus is not available or server is running.
+        """
+        DBusGMainLoop(set_as_default=True)
+        bus_name = dbus.service.BusName(APP_SERVER_DBUS_NAME, bus=dbus.SessionBus(), do_not_queue=True)
+        dbus.service.Object.__init__(self, bus_name, APP_SERVER_OBJECT_NAME)
+        
+        self.bus_name = bus_name
+        self.terminals = []
+        self.window_sessions = []
+        self.last_close_time = 0
+        
+    @dbus.service.method(APP_SERVER_DBUS_NAME, in_signature="s", out_signature="")
+    def new_window(self, working_directory):
+        # Return DBus call first, client exit without waiting window build.
+        gobject.idle_add(self.open_window, working_directory)
+        
+    def open_window(self, working_directory=None, session=None):
+        terminal = Terminal(working_directory=working_directory, server=self, session=session)
+        terminal.apply_startup_mode()
+        self.terminals.append(terminal)
+        
+        return False
+    
+    def close_window(self, terminal):
+        '''
+        Close window, save session of windows when last window closed.
+        
+        Windows close one by one when logout or quit, so windows closed in SESSION_CLOSE_INTERVAL
+        before last one are saved with it. Window closed by user early while others stay open is dropped.
+        '''
+        if terminal in self.terminals:
+            self.terminals.remove(terminal)
+            
+        restore_session = get_config("advanced", "restore_session")
+        if restore_session:
+            close_time = time.time()
+            if close_time - self.last_close_time > SESSION_CLOSE_INTERVAL:
+                self.window_sessions = []
+                
+            self.window_sessions.append(terminal.get_session())
+            self.last_close_time = close_time
+            
+        terminal.application.window.destroy()
+        
+        if len(self.terminals) == 0:
+            if restore_session:
+                save_session(self.window_sessions)
+                
+            gtk.main_quit()
+            
+    def run(self, working_directory=None):
+        window_sessions = get_restore_sessions(working_directory)
+        if len(window_sessions) > 0:
+            for window_session in window_sessions:
+                self.open_window(session=window_session)
+        else:
+            self.open_window(working_directory)
+        
+        gtk.main()
+        
+def get_first_session(working_directory):
+    '''
+    Get session of first window, standalone window only restore one window.
+    '''
+    window_sessions = get_restore_sessions(working_directory)
+    if len(window_sessions) > 0:
+        return window_sessions[0]
+    else:
+        return None
+        
+def start(quake_mode=False, working_directory=None, standalone=False):
+    if quake_mode:
+        if not is_exists(APP_DBUS_NAME, APP_OBJECT_NAME):
+            Terminal(quake_mode, working_directory).run()
+    elif standalone:
+        Terminal(working_directory=working_directory, session=get_first_session(working_directory)).run()
+    else:
+        try:
+            terminal_server = TerminalServer()
+        except dbus.exceptions.DBusException, e:
+            # Run standalone window if session bus is not available or other server is running.
+            print "function start got error: %s" % e
+            Terminal(working_directory=working_directory, session=get_first_session(working_directory)).run()
+        else:
+            terminal_server.run(working_directory)
 
 class TerminalWrapper(vte.Terminal):
     """
@@ -1044,59 +1532,37 @@ class TerminalWrapper(vte.Terminal):
         vte.Terminal.__init__(self)
         self.parent_widget = parent_widget
         self.press_q_quit = press_q_quit
+        self.startup_command = command
+        self.is_exited = False
         self.set_word_chars("-A-Za-z0-9,./?%&#:_")
-        self.set_scrollback_lines(-1)
-        
-        self.change_color(
-            get_config("general", "font_color"),
-            get_config("general", "background_color")
-            )
         
-        transparent = get_config("general", "background_transparent")
-        self.set_transparent(float(transparent))
+        self.scrollback_archive = None
+        self.archive_reader = None
+        self.archive_id = None
+        self.is_trim_pending = False
         
-        scroll_on_key = is_bool(get_config("advanced", "scroll_on_key"))
-        self.set_scroll_on_keystroke(scroll_on_key)
+        self.session_log = None
+        self.log_reader = None
+        self.log_id = None
         
-        scroll_on_output = is_bool(get_config("advanced", "scroll_on_output"))
-        self.set_scroll_on_output(scroll_on_output)
+        self.text_cache = TerminalTextCache(self)
         
-        copy_on_selection = is_bool(get_config("advanced", "copy_on_selection"))
-        if copy_on_selection:
-            self.connect("selection-changed", do_copy_on_selection_toggle)
+        self.pending_appearance = set()
+        self.apply_settings()
         
-        cursor_shape = get_config("advanced", "cursor_shape")
-        self.change_cursor_shape(cursor_shape)
+        # Pass directory to fork_command and not os.chdir, this will make terminal with 'clear' init value,
+        # and not change working directory of whole process.
+        (fork_command, directory) = get_fork_info(working_directory)
+        self.fork_info = (fork_command, directory)
+        self.process_id = self.fork_command(fork_command, directory=directory)
+        self.cwd_path = '/proc/%s/cwd' % self.process_id
         
-        cursor_blink_mode = get_config("advanced", "cursor_blink_mode")
-        self.change_cursor_blink_mode(cursor_blink_mode)
-
-        self.default_font = get_config("general", "font")
-        self.default_font_size = int(get_config("general", "font_size"))
-        self.current_font_size = self.default_font_size
-        self.change_font(self.default_font, self.current_font_size)
-        
-        startup_directory = get_config("advanced", "startup_directory")
-        directory = commands.getoutput("echo %s" % startup_directory)
-        if os.path.exists(directory):
-            os.chdir(directory)
-        elif working_directory:
-            # Use os.chdir and not child_feed("cd %s\n" % working_directory), 
-            # this will make terminal with 'clear' init value.
-            # child_feed have cd information after terminal created.
-            os.chdir(working_directory)
-            
-        startup_command = get_config("advanced", "startup_command")    
-        if startup_command == "":
-            fork_command = os.getenv("SHELL")
-        else:
-            fork_command = startup_command
-            
-        self.process_id = self.fork_command(fork_command)
-        self.cwd_path = '/proc/%s/cwd' % self.process_id
-        
-        if command:
-            self.feed_child(command)
+        if command:
+            self.feed_child(command)
+            
+        # Terminal in shell pool start logging when it's adopted.
+        if self.parent_widget and get_config("advanced", "session_log"):
+            self.start_session_log()
 
         # Key and signals
         self.generate_keymap()
@@ -1112,7 +1578,11 @@ class TerminalWrapper(vte.Terminal):
         self.set_match_tag()
         
         self.connect("realize", self.realize_callback)
+        self.connect("map", lambda w: self.apply_appearance())
         self.connect("child-exited", lambda w: self.exit_callback())
+        self.connect("contents-changed", self.on_contents_changed)
+        self.connect("size-allocate", self.on_size_allocate)
+        self.connect("destroy", self.on_destroy)
         self.connect("key-press-event", self.handle_keys)
         self.connect("drag-data-received", self.on_drag_data_received)
         self.connect("window-title-changed", self.on_window_title_changed)
@@ -1120,28 +1590,106 @@ class TerminalWrapper(vte.Terminal):
         self.connect("button-press-event", self.on_button_press)
         self.connect("scroll-event", self.on_scroll)
         
-    def set_match_tag(self):
-        userchars = "-A-Za-z0-9"
-        passchars = "-A-Za-z0-9,?;.:/!%$^*&~\"#'"
-        hostchars = "-A-Za-z0-9"
-        pathchars = "-A-Za-z0-9_$.+!*(),;:@&=?/~#%'\""
-        schemes   = "(news:|telnet:|nntp:|file:/|https?:|ftps?:|webcal:)"
-        user      = "[" + userchars + "]+(:[" + passchars + "]+)?"
-        urlpath   = "/[" + pathchars + "]*[^]'.}>) \t\r\n,\\\"]"
-        lboundry = "\\<"
-        rboundry = "\\>"
-        self.url_match_tag = self.match_add(
-            lboundry + schemes + 
-            "//(" + user + "@)?[" + hostchars  +".]+(:[0-9]+)?(" + 
-            urlpath + ")?" + rboundry + "/?")
-        self.match_set_cursor_type(self.url_match_tag, gtk.gdk.HAND2)
+        self.search_highlight = None
+        self.connect_after("expose-event", self.draw_search_highlight)
+        
+        self.hover_match_text = None
+        self.connect("motion-notify-event", self.on_motion_notify)
+        
+        # Child program maybe open new window when terminal lose focus, lookup correlative windows when back.
+        self.connect("focus-in-event", lambda w, e: correlative_window_finder.lookup(self.process_id))
+        
+    def apply_settings(self):
+        self.change_color(
+            get_config("general", "font_color"),
+            get_config("general", "background_color")
+            )
+        
+        transparent = get_config("general", "background_transparent")
+        self.set_transparent(transparent)
+        
+        scroll_on_key = get_config("advanced", "scroll_on_key")
+        self.set_scroll_on_keystroke(scroll_on_key)
+        
+        scroll_on_output = get_config("advanced", "scroll_on_output")
+        self.set_scroll_on_output(scroll_on_output)
+        
+        self.apply_scrollback_lines()
+        
+        try:
+            self.disconnect_by_func(do_copy_on_selection_toggle)
+        except:
+            pass
+        copy_on_selection = get_config("advanced", "copy_on_selection")
+        if copy_on_selection:
+            self.connect("selection-changed", do_copy_on_selection_toggle)
+        
+        cursor_shape = get_config("advanced", "cursor_shape")
+        self.change_cursor_shape(cursor_shape)
+        
+        cursor_blink_mode = get_config("advanced", "cursor_blink_mode")
+        self.change_cursor_blink_mode(cursor_blink_mode)
+
+        self.default_font = get_config("general", "font")
+        self.default_font_size = get_config("general", "font_size")
+        self.current_font_size = self.default_font_size
+        self.change_font(self.default_font, self.current_font_size)
+        
+    def apply_appearance(self):
+        '''
+        Apply pending appearance changes scheduled by AppearanceScheduler.
+        '''
+        if APPEARANCE_FONT in self.pending_appearance:
+            self.default_font = get_config("general", "font")
+            self.default_font_size = get_config("general", "font_size")
+            self.current_font_size = self.default_font_size
+            self.change_font(self.default_font, self.current_font_size)
+            
+        if APPEARANCE_COLOR in self.pending_appearance:
+            self.change_color(
+                get_config("general", "font_color"),
+                get_config("general", "background_color")
+                )
+            
+        if APPEARANCE_OPACITY in self.pending_appearance:
+            self.set_transparent(get_config("general", "background_transparent"))
+            
+        if APPEARANCE_CURSOR_SHAPE in self.pending_appearance:
+            self.change_cursor_shape(get_config("advanced", "cursor_shape"))
+            
+        if APPEARANCE_CURSOR_BLINK_MODE in self.pending_appearance:
+            self.change_cursor_blink_mode(get_config("advanced", "cursor_blink_mode"))
+            
+        # Use background_update once to update color and opacity of terminal.
+        if APPEARANCE_COLOR in self.pending_appearance or APPEARANCE_OPACITY in self.pending_appearance:
+            self.background_update()
+            
+        self.pending_appearance.clear()
+        
+    def adopt(self, parent_widget):
+        '''
+        Adopt terminal from shell pool.
+        
+        Settings maybe changed when terminal is idle in pool, so apply them again.
+        '''
+        self.parent_widget = parent_widget
+        self.apply_settings()
+        self.generate_keymap()
+        
+        if get_config("advanced", "session_log"):
+            self.start_session_log()
         
-        self.file_match_tag = self.match_add("[^\t\n ]+")
-        self.match_set_cursor_type(self.file_match_tag, gtk.gdk.HAND2)
+    def set_match_tag(self):
+        # Key is match tag of vte, value is MatchRule.
+        self.match_rules = {}
+        for match_rule in MATCH_RULES:
+            match_tag = self.match_add(match_rule.pattern)
+            self.match_set_cursor_type(match_tag, gtk.gdk.HAND2)
+            self.match_rules[match_tag] = match_rule
         
     def init_background(self):
         display_background_image = get_config("general", "background_image")
-        if is_bool(display_background_image):
+        if display_background_image:
             set_terminal_background(self)
         
     def generate_keymap(self):
@@ -1159,6 +1707,7 @@ class TerminalWrapper(vte.Terminal):
             "scroll_page_up",
             "scroll_page_down",
             "show_correlative_window",
+            "save_output",
             ]
         
         self.keymap = {}
@@ -1169,28 +1718,41 @@ class TerminalWrapper(vte.Terminal):
         if self.press_q_quit:
             self.keymap["q"] = self.exit_callback
             
-    def get_correlative_window_ids(self):
-        try:
-            child_process_id = commands.getoutput("pgrep -P %s" % self.process_id)
-            return filter(is_int, commands.getoutput("xdotool search --all --pid %s --onlyvisible" % child_process_id).split("\n"))
-        except Exception, e:
-            print "function get_correlative_window_ids got error: %s" % (e)
-            traceback.print_exc(file=sys.stdout)
-            
-            return None
+    def save_output(self):
+        '''
+        Ask file name and save scrollback of terminal to it, file is compressed with gzip if file name end with '.gz'.
+        '''
+        dialog = gtk.FileChooserDialog(
+            _("Save output"),
+            self.get_toplevel(),
+            gtk.FILE_CHOOSER_ACTION_SAVE,
+            (gtk.STOCK_CANCEL, gtk.RESPONSE_CANCEL, gtk.STOCK_SAVE, gtk.RESPONSE_OK),
+            )
+        dialog.set_do_overwrite_confirmation(True)
+        working_directory = self.get_working_directory()
+        if working_directory:
+            dialog.set_current_folder(working_directory)
+        dialog.set_current_name("output.txt")
+        
+        for (filter_name, filter_pattern) in [(_("Plain text"), "*.txt"), (_("Gzip compressed text"), "*.gz")]:
+            file_filter = gtk.FileFilter()
+            file_filter.set_name(filter_name)
+            file_filter.add_pattern(filter_pattern)
+            dialog.add_filter(file_filter)
+        
+        if dialog.run() == gtk.RESPONSE_OK:
+            filepath = dialog.get_filename()
+            dialog.destroy()
             
+            ExportDialog(self, filepath).show_export(self.get_toplevel())
+        else:
+            dialog.destroy()
+        
     def show_correlative_window(self, window_ids=None):
-        try:
-            if window_ids:
-                correlative_window_ids = window_ids
-            else:
-                correlative_window_ids = self.get_correlative_window_ids()
-            for correlative_window_id in correlative_window_ids:
-                if is_int(correlative_window_id):
-                    subprocess.Popen("xdotool windowactivate %s" % correlative_window_id, shell=True)
-        except Exception, e:
-            print "function show_correlative_window got error: %s" % (e)
-            traceback.print_exc(file=sys.stdout)
+        if window_ids:
+            activate_windows(window_ids)
+        else:
+            correlative_window_finder.lookup(self.process_id, activate_windows)
             
     def scroll_page_up(self):
         adj = self.get_adjustment()
@@ -1208,8 +1770,16 @@ class TerminalWrapper(vte.Terminal):
         
         adj.set_value(min(upper - page_size, value + page_size))
             
-    def show_man_window(self, command):
-        self.split_vertically(command="man %s\n" % command, press_q_quit=True)
+    def show_man_window(self, page_key):
+        render_path = None
+        if get_config("advanced", "cache_rendered_man"):
+            render_path = man_index.get_render_path(page_key)
+            
+        if render_path:
+            self.split_vertically(command="less %s\n" % pipes.quote(render_path), press_q_quit=True)
+        else:
+            (name, section) = split_page_key(page_key)
+            self.split_vertically(command="man %s %s\n" % (pipes.quote(section), pipes.quote(name)), press_q_quit=True)
             
     def split_vertically(self, command=None, press_q_quit=False):
         if self.parent_widget:
@@ -1247,7 +1817,7 @@ class TerminalWrapper(vte.Terminal):
 
     def on_scroll(self, widget, event):
         if self.is_ctrl_press(event):
-            global_event.emit("adjust-background-transparent", event.direction)
+            global_event.emit("adjust-background-transparent", self, event.direction)
         
     def set_transparent(self, transparent):
         self.set_opacity(int(transparent * 65535))
@@ -1260,74 +1830,377 @@ class TerminalWrapper(vte.Terminal):
             int(event.x / self.get_char_width()),
             int(event.y / self.get_char_height()))
     
-    def filter_file_string(self, match_string):
-        # ` and ' is not valid filename char, so replace operation is safe.
-        return commands.getoutput("echo %s" % match_string.replace('\'', '').replace('`', ''))
-    
-    def get_match_type(self, match_text):
+    def resolve_match(self, match_text, callback):
+        '''
+        Resolve match type of match text, filesystem is probed in match resolver thread.
+        
+        @param match_text: Return value of get_match_text.
+        @param callback: Called with (match_type, match_string), or None if nothing match.
+        '''
         if match_text:
             (match_string, match_tag) = match_text
-            if match_tag == self.url_match_tag:
-                return (MATCH_URL, match_string)
-            elif match_tag == self.file_match_tag:
-                match_file = False
-                
-                file_string = self.filter_file_string(match_string)
-                print file_string
-                
-                if os.path.exists(file_string):
-                    if os.path.isdir(file_string):
-                        return (MATCH_DIRECTORY, file_string)
+            if match_tag in self.match_rules:
+                match_info = self.match_rules[match_tag].parse(match_string)
+                if match_info:
+                    (match_type, match_value) = match_info
+                    if match_type == MATCH_PATH:
+                        match_resolver.resolve(
+                            self,
+                            expand_match_string(match_value),
+                            self.get_working_directory(),
+                            callback)
                     else:
-                        return (MATCH_FILE, file_string)
-                else:
-                    working_directory = get_active_working_directory(self.get_toplevel())    
-                    filepath = os.path.join(working_directory, file_string)
-                    
-                    if os.path.exists(filepath):
-                        if os.path.isdir(filepath):
-                            return (MATCH_DIRECTORY, filepath)
-                        else:
-                            return (MATCH_FILE, filepath)
-                        
-                if not match_file:        
-                    man_path = get_command_output_first_line("man -w %s" % match_string, True).split("\n")[0]
-                    if os.path.exists(man_path):
-                        return (MATCH_COMMAND, match_string)
-                    
-        return None
-    
+                        match_resolver.cancel(self)
+                        callback(match_info)
+                    return
+            
+        match_resolver.cancel(self)
+        callback(None)
+        
+    def open_match_info(self, match_info):
+        if match_info:
+            (match_type, match_string) = match_info
+            self.open_match_string(match_type, match_string)
+            
     def open_match_string(self, match_type, match_string):
         if match_type in [MATCH_URL, MATCH_FILE, MATCH_DIRECTORY]:
             global_event.emit("xdg-open", match_string)
         elif match_type == MATCH_COMMAND:
             self.show_man_window(match_string)
+        elif match_type == MATCH_GIT_SHA:
+            self.split_vertically(command="git show %s\n" % match_string, press_q_quit=True)
+        elif match_type == MATCH_HOST:
+            global_event.emit("xdg-open", "http://%s" % match_string)
+        elif match_type == MATCH_EMAIL:
+            global_event.emit("xdg-open", "mailto:%s" % match_string)
         
     def is_ctrl_press(self, event):
         return event.state == gtk.gdk.CONTROL_MASK
             
     def on_button_press(self, widget, event):
         if is_left_button(event) and self.is_ctrl_press(event):
-            (column, row) = self.get_cursor_position()
             match_text = self.get_match_text(event)
             if match_text:
-                (match_type, match_string) = self.get_match_type(match_text)
-                self.open_match_string(match_type, match_string)
+                self.resolve_match(match_text, self.open_match_info)
         elif is_right_button(event):
             self.grab_focus()
             
+            has_selection = self.get_has_selection()
+            (x_root, y_root) = (int(event.x_root), int(event.y_root))
+            self.resolve_match(
+                self.get_match_text(event),
+                lambda match_info: self.popup_menu(has_selection, match_info, (x_root, y_root)))
+            
+            # Refresh correlative windows after menu show, don't block menu.
+            correlative_window_finder.lookup(self.process_id)
+            
+    def popup_menu(self, has_selection, match_info, (x_root, y_root)):
+        # Terminal maybe closed before match resolved.
+        if self.get_realized():
             global_event.emit(
                 "show-menu", 
                 self, 
-                self.get_has_selection(),
-                self.get_match_text(event),
-                self.get_correlative_window_ids(),
-                (int(event.x_root), int(event.y_root)),
+                has_selection,
+                match_info,
+                correlative_window_finder.get_cache(self.process_id),
+                (x_root, y_root),
                 )
+            
+    def on_motion_notify(self, widget, event):
+        match_text = self.get_match_text(event)
+        if match_text != self.hover_match_text:
+            self.hover_match_text = match_text
+            
+            # Resolve match under pointer before click, and cancel resolving of last match.
+            self.resolve_match(match_text, lambda match_info: None)
         
     def get_first_row(self):
         return int(self.get_adjustment().get_lower())
     
+    def get_row_text(self, row):
+        '''
+        Get text of row.
+        
+        @return: Return unicode text, end with newline if row isn't soft wrapped.
+        '''
+        return self.text_cache.get_row_text(row)
+    
+    def get_range_text(self, start_row, end_row):
+        '''
+        Get text of rows between start_row and end_row (include end_row) with one vte call, rows are not cached.
+        
+        @return: Return unicode text, newline is added after rows that aren't soft wrapped.
+        '''
+        return self.get_text_range(start_row, 0, end_row, self.get_column_count() - 1).decode("utf-8", "replace")
+    
+    def apply_scrollback_lines(self):
+        scrollback_lines = get_config("advanced", "scrollback_lines")
+        if scrollback_lines > 0:
+            self.set_scrollback_lines(scrollback_lines)
+        else:
+            # Unlimited scrollback, nothing need archive.
+            self.set_scrollback_lines(-1)
+            
+    def is_archive_enabled(self):
+        return get_config("advanced", "scrollback_lines") > 0 and get_config("advanced", "scrollback_archive")
+    
+    def schedule_archive(self):
+        if not self.is_archive_enabled():
+            return
+        
+        screen_row = int(self.get_adjustment().get_upper()) - self.get_row_count()
+        if screen_row - self.get_archive_row() >= get_config("advanced", "scrollback_lines") * SCROLLBACK_ARCHIVE_SYNC_RATIO:
+            # Output is faster than archiving in idle, archive now before vte drop rows.
+            if self.archive_id:
+                gobject.source_remove(self.archive_id)
+                self.archive_id = None
+                
+            while self.archive_rows(SEARCH_CHUNK_ROWS):
+                pass
+            
+            self.finish_pending_trim()
+        elif self.archive_id == None:
+            self.archive_id = gobject.timeout_add(SCROLLBACK_ARCHIVE_DELAY, self.archive_scrollback)
+            
+    def archive_scrollback(self):
+        '''
+        Archive rows that scrolled out of screen, before vte drop them from memory.
+        
+        Rows out of screen never change, so they can be archived any time before they're dropped.
+        '''
+        if self.archive_rows(SEARCH_CHUNK_ROWS):
+            # Output is faster than archiving, continue when idle.
+            self.archive_id = gobject.idle_add(self.archive_scrollback, priority=gobject.PRIORITY_LOW)
+        else:
+            self.archive_id = None
+            self.finish_pending_trim()
+            
+        return False
+    
+    def archive_rows(self, row_count):
+        '''
+        Archive next rows out of screen.
+        
+        @param row_count: Maximum number of rows to archive.
+        
+        @return: Return True if some rows still need archive.
+        '''
+        if self.scrollback_archive == None:
+            try:
+                self.scrollback_archive = ScrollbackArchive(SCROLLBACK_ARCHIVE_DIR)
+            except (IOError, OSError), e:
+                print "function archive_rows got error: %s" % e
+                return False
+            
+            self.archive_reader = ScrollbackReader(self, read_archive=False)
+            
+        screen_row = int(self.get_adjustment().get_upper()) - self.get_row_count()
+        dropped_rows = self.archive_reader.update_rows(self.get_first_row(), screen_row - 1)
+        if dropped_rows > 0:
+            # Record gap in history, so search and export show rows are missing.
+            self.scrollback_archive.append_lines([(
+                        self.get_first_row() - 1,
+                        u"[deepin-terminal: %s rows dropped before archived]" % dropped_rows)])
+        
+        self.scrollback_archive.append_lines(self.archive_reader.read_lines(row_count, False))
+        
+        return not self.archive_reader.is_finish()
+    
+    def get_scrollback_size(self):
+        '''
+        Get approximate memory size of rows kept by vte.
+        '''
+        return (self.get_last_row() - self.get_first_row() + 1) * self.get_column_count() * VTE_CELL_SIZE
+    
+    def trim_scrollback(self):
+        '''
+        Trim scrollback in memory to MEMORY_TRIM_LINES rows.
+        
+        If archive is enabled, rows are archived chunk by chunk in idle first, and trim after archive finish,
+        so trim never block GTK thread.
+        
+        @return: Return approximate bytes will be released.
+        '''
+        self.text_cache.clear()
+        
+        scrollback_size = self.get_scrollback_size()
+        trim_size = max(0, scrollback_size - (MEMORY_TRIM_LINES + self.get_row_count()) * self.get_column_count() * VTE_CELL_SIZE)
+        
+        if self.is_archive_enabled():
+            self.is_trim_pending = True
+            if self.archive_id == None:
+                self.archive_id = gobject.idle_add(self.archive_scrollback, priority=gobject.PRIORITY_LOW)
+        else:
+            self.shrink_scrollback()
+            
+        return trim_size
+    
+    def finish_pending_trim(self):
+        if self.is_trim_pending:
+            self.is_trim_pending = False
+            self.shrink_scrollback()
+            
+    def shrink_scrollback(self):
+        # Vte drop old rows when scrollback lines become smaller, and don't restore them when it become larger.
+        self.set_scrollback_lines(MEMORY_TRIM_LINES)
+        self.apply_scrollback_lines()
+        self.text_cache.clear()
+    
+    def get_archive_row(self):
+        '''
+        Get first row that not archive yet.
+        '''
+        if self.archive_reader:
+            return self.archive_reader.line_row
+        else:
+            return self.get_first_row()
+        
+    def close_scrollback_archive(self):
+        if self.archive_id:
+            gobject.source_remove(self.archive_id)
+            self.archive_id = None
+            
+        self.is_trim_pending = False
+        
+        if self.scrollback_archive:
+            self.scrollback_archive.close()
+            self.scrollback_archive = None
+            self.archive_reader = None
+    
+    def start_session_log(self):
+        '''
+        Log output of terminal, include scrollback printed before logging start.
+        '''
+        if self.session_log == None:
+            log_name = "%s-%s.log" % (time.strftime("%Y%m%d-%H%M%S"), self.process_id)
+            self.session_log = SessionLog(os.path.join(SESSION_LOG_DIR, log_name))
+            self.log_reader = ScrollbackReader(self, read_archive=False)
+            self.schedule_log()
+            
+    def schedule_log(self):
+        if self.log_id == None and self.session_log:
+            self.log_id = gobject.timeout_add(SESSION_LOG_DELAY, self.log_output)
+            
+    def log_output(self):
+        '''
+        Log rows that scrolled out of screen, screen rows maybe change, they're logged when logging stop.
+        '''
+        if self.log_rows(SEARCH_CHUNK_ROWS, False):
+            self.log_id = gobject.idle_add(self.log_output, priority=gobject.PRIORITY_LOW)
+        else:
+            self.log_id = None
+            
+        return False
+    
+    def log_rows(self, row_count, log_screen):
+        '''
+        Pass next rows to session log writer.
+        
+        @param row_count: Maximum number of rows to log.
+        @param log_screen: Whether log rows on screen.
+        
+        @return: Return True if some rows still need log.
+        '''
+        if log_screen:
+            end_row = self.get_last_row()
+        else:
+            end_row = int(self.get_adjustment().get_upper()) - self.get_row_count() - 1
+        dropped_rows = self.log_reader.update_rows(self.get_first_row(), end_row)
+        if dropped_rows > 0:
+            session_log_writer.write(
+                self.session_log,
+                "[deepin-terminal: %s rows dropped before logged]\n" % dropped_rows)
+        
+        lines = self.log_reader.read_lines(row_count, log_screen)
+        if len(lines) > 0:
+            session_log_writer.write(
+                self.session_log,
+                "".join(map(lambda (line_row, line): line.encode("utf-8") + "\n", lines)))
+        
+        return not self.log_reader.is_finish()
+    
+    def stop_session_log(self):
+        if self.log_id:
+            gobject.source_remove(self.log_id)
+            self.log_id = None
+            
+        if self.session_log:
+            while self.log_rows(SEARCH_CHUNK_ROWS, True):
+                pass
+            
+            session_log_writer.close(self.session_log)
+            self.session_log = None
+            self.log_reader = None
+            
+    def on_contents_changed(self, widget):
+        self.schedule_archive()
+        self.schedule_log()
+        
+        workspace = terminal_registry.get_terminal_workspace(self)
+        if workspace:
+            workspace.mark_snapshot_dirty()
+        
+    def on_size_allocate(self, widget, rect):
+        # Split, close and paned dragging all change allocation of terminals.
+        workspace = terminal_registry.get_terminal_workspace(self)
+        if workspace:
+            workspace.invalidate_pane_index()
+        
+    def on_destroy(self, widget):
+        self.close_scrollback_archive()
+        self.stop_session_log()
+    
+    def set_search_highlight(self, match_position):
+        '''
+        Highlight match of search bar.
+        
+        @param match_position: (start_row, start_column, end_row, end_column) of match, None to clear highlight.
+        '''
+        if match_position != self.search_highlight:
+            self.search_highlight = match_position
+            self.queue_draw()
+            
+    def draw_search_highlight(self, widget, event):
+        if self.search_highlight:
+            (start_row, start_column, end_row, end_column) = self.search_highlight
+            char_width = self.get_char_width()
+            char_height = self.get_char_height()
+            column_count = self.get_column_count()
+            top_row = int(self.get_adjustment().get_value())
+            inner_border = self.style_get_property("inner-border")
+            if inner_border:
+                (border_x, border_y) = (inner_border.left, inner_border.top)
+            else:
+                (border_x, border_y) = (0, 0)
+            
+            cr = widget.window.cairo_create()
+            cr.set_source_rgba(*alpha_color_hex_to_cairo(("#FFFF00", 0.4)))
+            for row in range(max(start_row, top_row), min(end_row, top_row + self.get_row_count() - 1) + 1):
+                if row == start_row:
+                    begin_column = start_column
+                else:
+                    begin_column = 0
+                    
+                if row == end_row:
+                    finish_column = end_column
+                else:
+                    finish_column = column_count
+                    
+                cr.rectangle(
+                    border_x + begin_column * char_width,
+                    border_y + (row - top_row) * char_height,
+                    (finish_column - begin_column) * char_width,
+                    char_height)
+            cr.fill()
+            
+        return False
+    
+    def scroll_to_row(self, row):
+        # Put row in middle of view.
+        adj = self.get_adjustment()
+        adj.set_value(max(adj.get_lower(), min(adj.get_upper() - adj.get_page_size(), 
+                                               row - adj.get_page_size() / 2)))
+    
     def get_last_row(self):
         return int(self.get_adjustment().get_upper()) - 1
     
@@ -1337,12 +2210,8 @@ class TerminalWrapper(vte.Terminal):
     def move_to_end(self):
         last_row = self.get_last_row()
         self.set_cursor_position(0, last_row)
-        last_row_column_number = self.get_column_count() - 1
-        last_row_content = self.get_text_range(last_row, 0, last_row, last_row_column_number, self.search_character)
-        self.set_cursor_position(len(last_row_content.split("\n")[0]), last_row)
-    
-    def search_character(self, widget, col, row, junk):
-        return(True) 
+        last_row_content = self.get_row_text(last_row)
+        self.set_cursor_position(get_text_width(last_row_content.rstrip("\n")), last_row)
 
     def revert_default_size(self):
         self.current_font_size = self.default_font_size
@@ -1358,11 +2227,33 @@ class TerminalWrapper(vte.Terminal):
         
     def get_working_directory(self):
         return os.readlink(self.cwd_path)
+    
+    def get_layout(self):
+        '''
+        Get layout of terminal to save in session.
+        
+        @return: Return dict of working directory and startup command,
+        return None if shell exited or terminal is viewer of man page or git commit.
+        '''
+        if self.is_exited or self.press_q_quit:
+            return None
+        
+        layout = {}
+        try:
+            layout["cwd"] = self.get_working_directory().decode("utf-8")
+        except (OSError, UnicodeDecodeError):
+            # Restored shell start in default directory.
+            pass
+        
+        if self.startup_command:
+            layout["command"] = self.startup_command
+            
+        return layout
         
     def change_window_title(self):
         global focus_terminal
         
-        global_event.emit("change-window-title", self.get_working_directory())
+        global_event.emit("change-window-title", self, self.get_working_directory())
         
         # Save focus terminal. 
         focus_terminal = self
@@ -1384,6 +2275,11 @@ class TerminalWrapper(vte.Terminal):
         Call parent_widget.child_exit_callback
         :param widget: self
         """
+        self.is_exited = True
+        correlative_window_finder.invalidate(self.process_id)
+        self.close_scrollback_archive()
+        self.stop_session_log()
+        
         if self.parent_widget:
             self.parent_widget.child_exit_callback(self.parent_widget)
 
@@ -1392,6 +2288,8 @@ class TerminalWrapper(vte.Terminal):
         Callback for realize-signal.
         :param widget: which widget sends the signal.
         """
+        # Apply appearance changes when terminal is hidden.
+        self.apply_appearance()
         self.init_background()
         
         widget.grab_focus()
@@ -1428,29 +2326,111 @@ class TerminalGrid(gtk.VBox):
                  working_directory=None,
                  command=None,
                  press_q_quit=False,
+                 workspace=None,
+                 layout=None,
                  ):
         """
         Initial values
         :param parent_widget: which TerminalGrid this widget belongs to.
+        :param workspace: which Workspace this widget belongs to, use workspace of parent_widget if it's None.
+        :param layout: layout saved by get_layout, restore split tree and terminals of it.
         """
         gtk.VBox.__init__(self)
 
         # Keep a reference to parent
         self.parent_widget = parent_widget
+        if workspace == None and parent_widget:
+            workspace = parent_widget.workspace
+        self.workspace = workspace
+        
+        if layout and "split" in layout:
+            self.restore_split(layout)
+            return
+        elif layout:
+            working_directory = layout.get("cwd")
+            if working_directory:
+                working_directory = working_directory.encode("utf-8")
+            command = layout.get("command")
+            if command:
+                command = command.encode("utf-8")
+        
         if terminal:
             self.terminal = terminal
             self.terminal.parent_widget = self
         else:
-            self.terminal = TerminalWrapper(
-                self, 
-                working_directory=working_directory,
-                command=command,
-                press_q_quit=press_q_quit,
-                )
+            # Adopt pre-spawned shell if possible, terminal with command always fork new one.
+            self.terminal = None
+            if command == None and not press_q_quit:
+                self.terminal = shell_pool.adopt(self, working_directory)
+                
+            if self.terminal == None:
+                self.terminal = TerminalWrapper(
+                    self, 
+                    working_directory=working_directory,
+                    command=command,
+                    press_q_quit=press_q_quit,
+                    )
+                
+        terminal_registry.register(self.terminal, self.workspace)
 
         self.is_parent = False
         self.paned = None
         self.add(self.terminal)
+        
+    def restore_split(self, layout):
+        # Terminal is only kept by leaf grid of split tree.
+        self.terminal = None
+        self.is_parent = True
+        if layout["split"] == TerminalGrid.SPLIT_VERTICALLY:
+            self.paned = VPaned()
+        else:
+            self.paned = HPaned()
+        self.paned.set_position(layout["position"])
+        
+        (first_layout, second_layout) = layout["children"]
+        self.paned.pack1(TerminalGrid(self, layout=first_layout), True, True)
+        self.paned.pack2(TerminalGrid(self, layout=second_layout), True, True)
+        self.add(self.paned)
+        
+    def get_terminals(self):
+        if self.is_parent:
+            terminals = []
+            for grid in self.paned.get_children():
+                terminals += grid.get_terminals()
+            return terminals
+        elif self.terminal:
+            return [self.terminal]
+        else:
+            return []
+        
+    def get_layout(self):
+        '''
+        Get split tree of grid to save in session.
+        
+        @return: Return layout dict, return None if all terminals in grid exited.
+        '''
+        if self.is_parent:
+            layouts = filter(lambda layout: layout != None, map(lambda grid: grid.get_layout(), self.paned.get_children()))
+            if len(layouts) == 2:
+                if isinstance(self.paned, VPaned):
+                    split_policy = TerminalGrid.SPLIT_VERTICALLY
+                else:
+                    split_policy = TerminalGrid.SPLIT_HORIZONTALLY
+                    
+                return {
+                    "split": split_policy,
+                    "position": self.paned.get_position(),
+                    "children": layouts,
+                    }
+            elif len(layouts) == 1:
+                # Keep other child if terminal exited when window quit.
+                return layouts[0]
+            else:
+                return None
+        elif self.terminal:
+            return self.terminal.get_layout()
+        else:
+            return None
 
     def split(self, split_policy, command=None, press_q_quit=False):
         """
@@ -1513,70 +2493,901 @@ class TerminalGrid(gtk.VBox):
                 self.is_parent = False
         else:
             if self.parent_widget:
+                terminal_registry.unregister(self.terminal)
                 self.remove(self.terminal)
                 self.terminal = None
                 self.parent_widget.child_exit_callback(self)
             else:
+                terminal_registry.unregister(self.terminal)
                 workspace = get_match_parent(self, "Workspace")
                 if workspace:
                     global_event.emit("close-workspace", workspace)
 
 gobject.type_register(TerminalGrid)
 
-
-class Workspace(gtk.VBox):
-    """
-    class docs
-    """
-
+class TerminalRegistry(object):
+    '''
+    Registry of live terminals, index by workspace and process id.
+    
+    Terminals are held with weak references, registry never keeps closed terminal alive.
+    '''
+	
     def __init__(self):
-        """
-        init docs
-        """
-        global workspace_index
-        gtk.VBox.__init__(self)
+        '''
+        Init TerminalRegistry class.
+        '''
+        self.pid_terminals = weakref.WeakValueDictionary()
+        self.workspace_terminals = weakref.WeakKeyDictionary()
+        self.terminal_workspaces = weakref.WeakKeyDictionary()
+        
+    def register(self, terminal, workspace):
+        self.unregister(terminal)
+        
+        self.pid_terminals[terminal.process_id] = terminal
+        self.terminal_workspaces[terminal] = workspace
+        if workspace not in self.workspace_terminals:
+            self.workspace_terminals[workspace] = weakref.WeakSet()
+        self.workspace_terminals[workspace].add(terminal)
+        
+    def unregister(self, terminal):
+        if terminal in self.terminal_workspaces:
+            workspace = self.terminal_workspaces.pop(terminal)
+            if workspace in self.workspace_terminals:
+                self.workspace_terminals[workspace].discard(terminal)
+                
+            if self.pid_terminals.get(terminal.process_id) == terminal:
+                del self.pid_terminals[terminal.process_id]
+                
+    def unregister_workspace(self, workspace):
+        for terminal in self.get_workspace_terminals(workspace):
+            self.unregister(terminal)
+            
+        if workspace in self.workspace_terminals:
+            del self.workspace_terminals[workspace]
         
-        self.workspace_index = workspace_index
-        workspace_index += 1
-        self.snapshot_pixbuf = None
+    def get_workspace_terminals(self, workspace):
+        if workspace in self.workspace_terminals:
+            return list(self.workspace_terminals[workspace])
+        else:
+            return []
+        
+    def get_terminals(self, workspaces):
+        terminals = []
+        for workspace in workspaces:
+            terminals += self.get_workspace_terminals(workspace)
+            
+        return terminals
+    
+    def get_terminal_by_pid(self, process_id):
+        return self.pid_terminals.get(process_id)
+    
+    def get_terminal_workspace(self, terminal):
+        return self.terminal_workspaces.get(terminal)
+    
+    def get_workspaces(self):
+        return self.workspace_terminals.keys()
+    
+terminal_registry = TerminalRegistry()
+
+def get_process_rss(pid):
+    try:
+        with open("/proc/%s/statm" % pid) as statm_file:
+            return int(statm_file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, ValueError, IndexError):
+        return 0
+    
+def format_memory_size(size):
+    return "%.1f MB" % (float(size) / (1024 * 1024))
+    
+class MemoryGovernor(object):
+    '''
+    Track approximate memory usage of every workspace, and trim scrollback of least recently viewed workspaces
+    when total scrollback size exceed memory budget.
+    
+    Memory usage of workspace is (scrollback_size, rss_size), rss_size is RSS of processes running in terminals.
+    Scrollback size is read from vte, RSS is sampled from /proc in worker thread, usage use last sampled RSS.
+    '''
+	
+    def __init__(self):
+        '''
+        Init MemoryGovernor class.
+        '''
+        self.workspace_usages = weakref.WeakKeyDictionary()
+        self.rss_sizes = weakref.WeakKeyDictionary()
+        self.check_id = None
+        self.sample_thread = None
+        self.sample_callbacks = []
+        
+    def start(self):
+        if self.check_id == None:
+            self.check_id = gobject.timeout_add_seconds(MEMORY_CHECK_INTERVAL, self.check)
+            
+    def get_workspace_usage(self, workspace):
+        return self.workspace_usages.get(workspace)
+    
+    def update_usages(self, callback=None):
+        '''
+        Update scrollback size of workspaces now, and sample RSS of workspaces in worker thread.
+        
+        @param callback: Called in GTK thread after RSS sampled.
+        '''
+        workspace_pids = []
+        for workspace in terminal_registry.get_workspaces():
+            scrollback_size = 0
+            pids = []
+            for terminal in terminal_registry.get_workspace_terminals(workspace):
+                scrollback_size += terminal.get_scrollback_size()
+                pids.append(terminal.process_id)
+                
+            self.workspace_usages[workspace] = (scrollback_size, self.rss_sizes.get(workspace, 0))
+            workspace_pids.append((weakref.ref(workspace), pids))
+            
+        if callback:
+            self.sample_callbacks.append(callback)
+            
+        if self.sample_thread == None or not self.sample_thread.is_alive():
+            self.sample_thread = threading.Thread(target=self.sample_rss, args=(workspace_pids,))
+            self.sample_thread.setDaemon(True)
+            self.sample_thread.start()
+            
+    def sample_rss(self, workspace_pids):
+        rss_sizes = []
+        try:
+            process_tree = ProcessTree()
+            for (workspace_ref, pids) in workspace_pids:
+                rss_size = 0
+                for pid in pids:
+                    for process_id in [pid] + list(process_tree.get_descendants(pid)):
+                        rss_size += get_process_rss(process_id)
+                        
+                rss_sizes.append((workspace_ref, rss_size))
+        except Exception, e:
+            print "function sample_rss got error: %s" % e
+            
+        gobject.idle_add(self.finish_sample, rss_sizes)
+        
+    def finish_sample(self, rss_sizes):
+        for (workspace_ref, rss_size) in rss_sizes:
+            workspace = workspace_ref()
+            if workspace != None:
+                self.rss_sizes[workspace] = rss_size
+                if workspace in self.workspace_usages:
+                    (scrollback_size, old_rss_size) = self.workspace_usages[workspace]
+                    self.workspace_usages[workspace] = (scrollback_size, rss_size)
+                    
+        (callbacks, self.sample_callbacks) = (self.sample_callbacks, [])
+        for callback in callbacks:
+            callback()
+            
+        return False
+            
+    def check(self):
+        try:
+            self.update_usages()
+            
+            memory_budget = get_config("advanced", "memory_budget") * 1024 * 1024
+            total_size = sum(map(lambda (scrollback_size, rss_size): scrollback_size, self.workspace_usages.values()))
+            if memory_budget > 0 and total_size > memory_budget:
+                # Current workspace of terminal box is visible, don't trim it.
+                workspaces = filter(lambda workspace: not workspace.get_child_visible(), self.workspace_usages.keys())
+                for workspace in sorted(workspaces, key=lambda workspace: workspace.last_view_time):
+                    for terminal in terminal_registry.get_workspace_terminals(workspace):
+                        total_size -= terminal.trim_scrollback()
+                        
+                    if PROFILE_TIMING:
+                        print "Trim scrollback of workspace %s, total scrollback %s" % (
+                            workspace.workspace_index, format_memory_size(total_size))
+                        
+                    if total_size <= memory_budget:
+                        break
+
+        except Exception, e:
+            print "function check got error: %s" % e
+            traceback.print_exc(file=sys.stdout)
+            
+        return True
+    
+memory_governor = MemoryGovernor()
+
+class AppearanceScheduler(object):
+    '''
+    Gather appearance changes of terminals, apply them at most once per frame.
+    
+    Slider dragging and Ctrl + scroll emit many events between two frames,
+    every terminal only updates once with latest config.
+    '''
+	
+    def __init__(self):
+        '''
+        Init AppearanceScheduler class.
+        '''
+        self.pending_terminals = weakref.WeakSet()
+        self.flush_id = None
+        
+    def schedule(self, terminals, change):
+        '''
+        Schedule appearance change.
+        
+        @param terminals: Terminals to update.
+        @param change: Change type, APPEARANCE_FONT, APPEARANCE_COLOR, APPEARANCE_OPACITY, etc.
+        '''
+        for terminal in terminals:
+            terminal.pending_appearance.add(change)
+            self.pending_terminals.add(terminal)
+            
+        # Flush before GTK redraw, which is in priority gobject.PRIORITY_HIGH_IDLE + 20.
+        if self.flush_id == None:
+            self.flush_id = gobject.idle_add(self.flush, priority=gobject.PRIORITY_HIGH_IDLE)
+            
+    def flush(self):
+        self.flush_id = None
+        
+        for terminal in list(self.pending_terminals):
+            # Terminal in hidden workspace apply changes when it's mapped.
+            if terminal.get_mapped():
+                terminal.apply_appearance()
+                
+        self.pending_terminals.clear()
+            
+        return False
+    
+appearance_scheduler = AppearanceScheduler()
+
+def expand_match_string(match_string):
+    '''
+    Expand ~ and environment variables of match string, same as shell without fork it.
+    '''
+    # ` ' and " is not valid filename char, so replace operation is safe.
+    for quote_char in ['\'', '`', '"']:
+        match_string = match_string.replace(quote_char, '')
+        
+    return os.path.expandvars(os.path.expanduser(match_string))
+
+class MatchRule(object):
+    '''
+    Rule to match text under pointer, every match carry type of rule, so resolving don't need guess.
+    '''
+	
+    def __init__(self, match_type, pattern, parse_regex=None, check=None, value_template=r"\1"):
+        '''
+        Init MatchRule class.
+        
+        @param match_type: Type of match, such as MATCH_URL.
+        @param pattern: Regular expression pass to vte.
+        @param parse_regex: Compiled regular expression to parse value of match, use whole match if it's None.
+        @param check: Function to filter out false match, return False to ignore match.
+        @param value_template: Template to build value from groups of parse_regex, default is first group.
+        '''
+        self.match_type = match_type
+        self.pattern = pattern
+        self.parse_regex = parse_regex
+        self.check = check
+        self.value_template = value_template
+        
+    def parse(self, match_string):
+        '''
+        Parse match string.
+        
+        @return: Return (match_type, match_value), return None if match is invalid.
+        '''
+        if self.parse_regex:
+            match = self.parse_regex.match(match_string)
+            if match == None:
+                return None
+            match_value = match.expand(self.value_template)
+        else:
+            match_value = match_string
+            
+        if self.check and not self.check(match_value):
+            return None
+        
+        return (self.match_type, match_value)
+    
+def get_url_pattern():
+    userchars = "-A-Za-z0-9"
+    passchars = "-A-Za-z0-9,?;.:/!%$^*&~\"#'"
+    hostchars = "-A-Za-z0-9"
+    pathchars = "-A-Za-z0-9_$.+!*(),;:@&=?/~#%'\""
+    schemes   = "(news:|telnet:|nntp:|file:/|https?:|ftps?:|webcal:)"
+    user      = "[" + userchars + "]+(:[" + passchars + "]+)?"
+    urlpath   = "/[" + pathchars + "]*[^]'.}>) \t\r\n,\\\"]"
+    lboundry = "\\<"
+    rboundry = "\\>"
+    
+    return (lboundry + schemes + 
+            "//(" + user + "@)?[" + hostchars  +".]+(:[0-9]+)?(" + 
+            urlpath + ")?" + rboundry + "/?")
+
+# Strip ':line:col' suffix of compiler output, such as 'main.c:12:5'.
+PATH_PARSE_REGEX = re.compile(r"^(.+?)(:[0-9]+){0,2}:?$")
+# Manual reference, such as 'ls(1)', value is page key 'ls.1' of man_index.
+COMMAND_PARSE_REGEX = re.compile(r"^(.+)\(([0-9n][a-z]*)\)$")
+
+# Rules are ordered by priority, vte use first rule that match text under pointer.
+# Patterns are POSIX extended regular expression with GNU extension, same as vte.Terminal.match_add.
+# Patterns are built once and shared by all terminals, append rule to MATCH_RULES to match new type.
+MATCH_RULES = [
+    MatchRule(MATCH_URL, get_url_pattern()),
+    MatchRule(MATCH_EMAIL, r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b"),
+    MatchRule(MATCH_HOST, r"\b([0-9]{1,3}\.){3}[0-9]{1,3}(:[0-9]{1,5})?\b"),
+    # Absolute path, or path start with '~', '$VAR', '.', '..'.
+    MatchRule(MATCH_PATH, r"\B(~|\$[A-Za-z_][A-Za-z0-9_]*|\.{1,2})?/[-A-Za-z0-9_.+@~/$%]+(:[0-9]+){0,2}", PATH_PARSE_REGEX),
+    # Relative path include '/', or filename with extension.
+    MatchRule(MATCH_PATH, r"\b[-A-Za-z0-9_.+@]+(/[-A-Za-z0-9_.+@]+)+/?(:[0-9]+){0,2}", PATH_PARSE_REGEX),
+    MatchRule(MATCH_PATH, r"\b[-A-Za-z0-9_+]+\.[A-Za-z][A-Za-z0-9]{0,7}(:[0-9]+){0,2}\b", PATH_PARSE_REGEX),
+    MatchRule(MATCH_COMMAND, r"\b[-A-Za-z0-9_.+]+\([0-9n][a-z]*\)", COMMAND_PARSE_REGEX,
+              lambda page_key: man_index.has_page(page_key), r"\1.\2"),
+    # Commit sha that include digit, ignore pure number and word.
+    MatchRule(MATCH_GIT_SHA, r"\b[0-9a-f]{7,40}\b", None, 
+              lambda sha: not sha.isdigit() and not sha.isalpha()),
+    ]
+
+def probe_file(filepath):
+    if os.path.isdir(filepath):
+        return (MATCH_DIRECTORY, filepath)
+    elif os.path.exists(filepath):
+        return (MATCH_FILE, filepath)
+    else:
+        return None
+    
+class MatchResolver(object):
+    '''
+    Probe files of match text in worker threads, slow mount point (such as NFS, sshfs) won't freeze GTK thread.
+    
+    Every owner has one pending request at most, new request of owner cancel old one.
+    Result is delivered through gobject.idle_add, or None if probe don't finish in MATCH_RESOLVE_TIMEOUT.
+    '''
+	
+    def __init__(self):
+        '''
+        Init MatchResolver class.
+        '''
+        self.request_queue = Queue.Queue()
+        self.threads = []
+        self.request_counter = 0
+        # Key is owner, value is (request_id, callback, timeout_id).
+        self.requests = {}
+        # Key is (file_string, working_directory), value is (match_info, resolve_time).
+        self.cache = {}
+        
+    def resolve(self, owner, file_string, working_directory, callback):
+        '''
+        Resolve file string asynchronously.
+        
+        @param owner: Owner of request, such as terminal.
+        @param file_string: Expanded file string.
+        @param working_directory: Directory to find relative file string, can be None.
+        @param callback: Called with (MATCH_FILE or MATCH_DIRECTORY, filepath), or None if file not exists.
+        '''
+        self.cancel(owner)
+        
+        key = (file_string, working_directory)
+        if key in self.cache:
+            (match_info, resolve_time) = self.cache[key]
+            if time.time() - resolve_time < MATCH_RESOLVE_CACHE_TTL:
+                callback(match_info)
+                return
+            
+        self.request_counter += 1
+        request_id = self.request_counter
+        timeout_id = gobject.timeout_add(MATCH_RESOLVE_TIMEOUT, self.finish, owner, request_id, key, None, False)
+        self.requests[owner] = (request_id, callback, timeout_id)
+        
+        if len(self.threads) < MATCH_RESOLVE_THREADS:
+            thread = threading.Thread(target=self.probe_loop)
+            thread.setDaemon(True)
+            thread.start()
+            self.threads.append(thread)
+            
+        self.request_queue.put((owner, request_id, key))
+        
+    def cancel(self, owner):
+        if owner in self.requests:
+            (request_id, callback, timeout_id) = self.requests.pop(owner)
+            gobject.source_remove(timeout_id)
+            
+    def is_pending(self, owner, request_id):
+        request = self.requests.get(owner)
+        return request != None and request[0] == request_id
+        
+    def probe_loop(self):
+        while True:
+            (owner, request_id, key) = self.request_queue.get()
+            
+            # Skip request cancelled before probe.
+            if self.is_pending(owner, request_id):
+                (file_string, working_directory) = key
+                try:
+                    if working_directory:
+                        match_info = probe_file(os.path.join(working_directory, file_string))
+                    else:
+                        match_info = probe_file(file_string)
+                except Exception, e:
+                    print "function probe_loop got error: %s" % e
+                    match_info = None
+                    
+                gobject.idle_add(self.finish, owner, request_id, key, match_info, True)
+                
+    def finish(self, owner, request_id, key, match_info, probe_finish):
+        # Cache timeout result too, don't probe hang path again until TTL expire.
+        self.cache[key] = (match_info, time.time())
+        if len(self.cache) > MATCH_RESOLVE_CACHE_SIZE:
+            expire_time = time.time() - MATCH_RESOLVE_CACHE_TTL
+            self.cache = dict(filter(lambda (cache_key, (cache_info, resolve_time)): resolve_time > expire_time, self.cache.items()))
+        
+        if self.is_pending(owner, request_id):
+            (request_id, callback, timeout_id) = self.requests.pop(owner)
+            if probe_finish:
+                gobject.source_remove(timeout_id)
+                
+            callback(match_info)
+            
+        return False
+    
+match_resolver = MatchResolver()
+
+def get_window_property(window, property_name):
+    gtk.gdk.error_trap_push()
+    try:
+        property_info = window.property_get(property_name)
+    finally:
+        # Window maybe destroyed before we read it, ignore X error.
+        gtk.gdk.flush()
+        gtk.gdk.error_trap_pop()
+        
+    if property_info:
+        (property_type, property_format, property_data) = property_info
+        return property_data
+    else:
+        return None
+    
+def get_windows_property(window_ids, property_name):
+    '''
+    Read property of many windows, X errors of all windows are trapped together and flushed once.
+    
+    @return: Return dict that key is window id, value is property data or None.
+    '''
+    window_properties = {}
+    gtk.gdk.error_trap_push()
+    try:
+        for window_id in window_ids:
+            window_properties[window_id] = None
+            
+            # Window maybe destroyed before we read it, error is ignored when trap popped.
+            window = gtk.gdk.window_foreign_new(window_id)
+            if window:
+                property_info = window.property_get(property_name)
+                if property_info:
+                    (property_type, property_format, property_data) = property_info
+                    window_properties[window_id] = property_data
+    finally:
+        gtk.gdk.flush()
+        gtk.gdk.error_trap_pop()
+        
+    return window_properties
+    
+def activate_windows(window_ids):
+    for window_id in window_ids:
+        window = gtk.gdk.window_foreign_new(window_id)
+        if window:
+            window.focus()
+        
+class CorrelativeWindowFinder(object):
+    '''
+    Find X windows of programs running in terminal, without forking pgrep and xdotool.
+    
+    Process tree is read in worker thread, and shared by lookups of all terminals in CORRELATIVE_SCAN_INTERVAL.
+    X properties are read in GTK thread, window process ids are cached, so only new windows need to query _NET_WM_PID.
+    '''
+	
+    def __init__(self):
+        '''
+        Init CorrelativeWindowFinder class.
+        '''
+        self.client_list = []
+        self.window_pids = {}
+        self.pid_window_ids = {}
+        self.lookup_callbacks = {}
+        self.process_tree = None
+        self.process_tree_time = 0
+        self.scan_thread = None
+        
+    def get_cache(self, pid):
+        '''
+        Get cached window ids of given terminal process.
+        
+        @return: Return list of window ids, return None if never lookup.
+        '''
+        return self.pid_window_ids.get(pid)
+    
+    def invalidate(self, pid):
+        if pid in self.pid_window_ids:
+            del self.pid_window_ids[pid]
+        
+    def lookup(self, pid, callback=None):
+        '''
+        Lookup windows of given terminal process asynchronously.
+        
+        @param pid: Process id of terminal shell.
+        @param callback: Called with window ids in GTK thread when lookup finish.
+        '''
+        if pid in self.lookup_callbacks:
+            # Lookup is running, just wait result.
+            if callback:
+                self.lookup_callbacks[pid].append(callback)
+            return
+        
+        self.lookup_callbacks[pid] = [callback] if callback else []
+        
+        if self.process_tree and time.time() - self.process_tree_time < CORRELATIVE_SCAN_INTERVAL:
+            gobject.idle_add(self.match_windows, pid, self.process_tree.get_descendants(pid))
+        elif self.scan_thread == None or not self.scan_thread.is_alive():
+            self.scan_thread = threading.Thread(target=self.read_process_tree)
+            self.scan_thread.setDaemon(True)
+            self.scan_thread.start()
+        # Otherwise running scan will match windows of this pid when finish.
+            
+    def read_process_tree(self):
+        try:
+            process_tree = ProcessTree()
+        except Exception, e:
+            print "function read_process_tree got error: %s" % e
+            process_tree = None
+            
+        gobject.idle_add(self.finish_scan, process_tree)
+        
+    def finish_scan(self, process_tree):
+        if process_tree:
+            self.process_tree = process_tree
+            self.process_tree_time = time.time()
+            
+        for pid in self.lookup_callbacks.keys():
+            if process_tree:
+                descendants = process_tree.get_descendants(pid)
+            else:
+                descendants = set()
+            self.match_windows(pid, descendants)
+            
+        return False
+        
+    def update_window_pids(self):
+        client_list = get_window_property(gtk.gdk.get_default_root_window(), "_NET_CLIENT_LIST") or []
+        if client_list != self.client_list:
+            # Window mapped or unmapped, drop cache of closed windows and stale lookup results.
+            self.client_list = client_list
+            self.window_pids = dict(filter(lambda (window_id, pid): window_id in client_list, self.window_pids.items()))
+            self.pid_window_ids = {}
+            
+            new_window_ids = filter(lambda window_id: window_id not in self.window_pids, client_list)
+            for (window_id, pid_data) in get_windows_property(new_window_ids, "_NET_WM_PID").items():
+                if pid_data:
+                    self.window_pids[window_id] = pid_data[0]
+                else:
+                    self.window_pids[window_id] = None
+        
+    def match_windows(self, pid, descendants):
+        try:
+            self.update_window_pids()
+            window_ids = filter(lambda window_id: self.window_pids[window_id] in descendants, self.client_list)
+        except Exception, e:
+            print "function match_windows got error: %s" % e
+            traceback.print_exc(file=sys.stdout)
+            window_ids = []
+            
+        self.pid_window_ids[pid] = window_ids
+        
+        for callback in self.lookup_callbacks.pop(pid, []):
+            callback(window_ids)
+        
+        return False
+    
+correlative_window_finder = CorrelativeWindowFinder()
+
+class ShellPool(object):
+    '''
+    Pool of pre-spawned idle terminals, split and new workspace adopt them to avoid forking shell on demand.
+    '''
+	
+    def __init__(self):
+        '''
+        Init ShellPool class.
+        '''
+        # Item is (fork_info, terminal, spawn_time).
+        self.items = []
+        self.last_fork_info = None
+        self.refill_id = None
+        self.expire_id = None
+        
+    def get_pool_size(self):
+        return min(max(0, get_config("advanced", "shell_pool_size")), SHELL_POOL_MAX_SIZE)
+    
+    def get_expire_time(self):
+        return get_config("advanced", "shell_pool_expire")
+    
+    def adopt(self, parent_widget, working_directory=None):
+        '''
+        Adopt idle terminal with same command and directory.
+        
+        @param parent_widget: TerminalGrid that terminal belongs to.
+        @param working_directory: Working directory of terminal.
+        
+        @return: Return TerminalWrapper, or None if no idle terminal match.
+        '''
+        fork_info = get_fork_info(working_directory)
+        self.last_fork_info = fork_info
+        
+        terminal = None
+        for item in self.items:
+            if item[0] == fork_info:
+                self.items.remove(item)
+                
+                terminal = item[1]
+                terminal.disconnect_by_func(self.remove_exited_terminal)
+                terminal.adopt(parent_widget)
+                break
+            
+        # Refill when GTK is idle, shell will spawn with directory of last request.
+        if self.refill_id == None:
+            self.refill_id = gobject.idle_add(self.refill, priority=gobject.PRIORITY_LOW)
+            
+        return terminal
+    
+    def refill(self):
+        pool_size = self.get_pool_size()
+        
+        # Release oldest terminals if pool size shrink.
+        while len(self.items) > pool_size:
+            self.release(self.items[0])
+            
+        match_items = filter(lambda item: item[0] == self.last_fork_info, self.items)
+        if len(match_items) < pool_size:
+            if len(self.items) >= pool_size:
+                self.release(filter(lambda item: item[0] != self.last_fork_info, self.items)[0])
+                
+            (fork_command, directory) = self.last_fork_info
+            terminal = TerminalWrapper(working_directory=directory)
+            terminal.connect("child-exited", self.remove_exited_terminal)
+            self.items.append((self.last_fork_info, terminal, time.time()))
+            
+            if self.expire_id == None:
+                self.expire_id = gobject.timeout_add_seconds(SHELL_POOL_EXPIRE_CHECK_INTERVAL, self.expire)
+            
+            # Spawn one terminal each idle loop.
+            return True
+        else:
+            self.refill_id = None
+            return False
+        
+    def expire(self):
+        expire_time = self.get_expire_time()
+        for item in filter(lambda (fork_info, terminal, spawn_time): time.time() - spawn_time > expire_time, self.items):
+            self.release(item)
+            
+        if len(self.items) == 0:
+            self.expire_id = None
+            return False
+        else:
+            return True
+            
+    def release(self, item):
+        self.items.remove(item)
+        
+        (fork_info, terminal, spawn_time) = item
+        terminal.disconnect_by_func(self.remove_exited_terminal)
+        try:
+            os.kill(terminal.process_id, signal.SIGHUP)
+        except OSError:
+            pass
+        terminal.destroy()
+        
+    def remove_exited_terminal(self, terminal):
+        for item in self.items:
+            if item[1] == terminal:
+                self.items.remove(item)
+                terminal.destroy()
+                break
+            
+shell_pool = ShellPool()
+
+
+class Workspace(gtk.VBox):
+    """
+    class docs
+    """
+
+    def __init__(self):
+        """
+        init docs
+        """
+        global workspace_index
+        gtk.VBox.__init__(self)
+        
+        self.workspace_index = workspace_index
+        workspace_index += 1
+        self.snapshot_pixbuf = None
+        self.snapshot_dirty = True
+        self.snapshot_size = None
+        
+        # Focus widget when workspace switched out, focus it again when workspace switched back.
+        self.focus_widget = None
+        
+        # Layout restored from session, terminals are built when workspace is shown first time.
+        self.pending_layout = None
+        
+        # Built from allocations of terminals when directional focus need it.
+        self.pane_index = None
+        
+        # Workspace is unmapped when it's switched out, used to find least recently viewed workspace.
+        self.last_view_time = time.time()
+        self.connect("unmap", lambda w: self.update_view_time())
+        self.connect("size-allocate", self.on_size_allocate)
+        
+    def update_view_time(self):
+        self.last_view_time = time.time()
+        
+    def load_pending_layout(self):
+        if self.pending_layout:
+            terminal_grid = TerminalGrid(workspace=self, layout=self.pending_layout)
+            self.pending_layout = None
+            self.add(terminal_grid)
+            self.show_all()
+            
+    def get_layout(self):
+        if self.pending_layout:
+            return self.pending_layout
+        
+        children = self.get_children()
+        if len(children) > 0:
+            return children[0].get_layout()
+        else:
+            return None
+        
+    def invalidate_pane_index(self):
+        self.pane_index = None
+        
+    def get_terminals(self):
+        '''
+        Get terminals in order of split tree, first pane is top left one.
+        '''
+        terminals = []
+        for child in self.get_children():
+            terminals += child.get_terminals()
+            
+        return terminals
+        
+    def get_pane_index(self):
+        if self.pane_index == None:
+            pane_rects = []
+            for terminal in self.get_terminals():
+                rect = terminal.allocation
+                pane_rects.append((terminal, (rect.x, rect.y, rect.width, rect.height)))
+                    
+            # Allocations of neighbour terminals are separated by paned handle.
+            self.pane_index = PaneIndex(pane_rects, PANED_HANDLE_SIZE + 1)
+            
+        return self.pane_index
+        
+    def init_blank_snapshot(self, width, height):
+        self.snapshot_pixbuf = gtk.gdk.Pixbuf(gtk.gdk.COLORSPACE_RGB, False, 8, width, height)
+        self.snapshot_pixbuf.fill(0x000000FF)
+        
+    def mark_snapshot_dirty(self):
+        self.snapshot_dirty = True
+        
+    def on_size_allocate(self, widget, rect):
+        if (rect.width, rect.height) != self.snapshot_size:
+            self.snapshot_dirty = True
         
     def save_workspace_snapshot(self):
-        if self.window and self.window.get_colormap():
+        '''
+        Save snapshot of workspace, snapshot is only captured when content or size changed since last capture.
+        '''
+        if self.snapshot_dirty and self.window and self.window.get_colormap():
             rect = self.allocation
             x, y, width, height = rect.x, rect.y, rect.width, rect.height
-            self.snapshot_pixbuf = gtk.gdk.Pixbuf(gtk.gdk.COLORSPACE_RGB, False, 8, width, height)
-            self.snapshot_pixbuf.get_from_drawable(
-                self.window,
-                self.window.get_colormap(),
-                x, y, 0, 0,
-                width,
-                height,
-                )
+            if width <= 1 or height <= 1:
+                return
+            
             snapshot_height = WORKSPACE_SNAPSHOT_HEIGHT - WORKSPACE_SNAPSHOT_OFFSET_TOP - WORKSPACE_SNAPSHOT_OFFSET_BOTTOM
             snapshot_width = int(width * snapshot_height / height)
-            self.snapshot_pixbuf = self.snapshot_pixbuf.scale_simple(
+            scale = float(snapshot_height) / height
+            
+            # Scale window content with X server, only read snapshot size pixels back.
+            pixmap = gtk.gdk.Pixmap(self.window, snapshot_width, snapshot_height)
+            cr = pixmap.cairo_create()
+            cr.scale(scale, scale)
+            cr.set_source_pixmap(self.window, -x, -y)
+            cr.get_source().set_filter(cairo.FILTER_BILINEAR)
+            cr.set_operator(cairo.OPERATOR_SOURCE)
+            cr.paint()
+            
+            self.snapshot_pixbuf = gtk.gdk.Pixbuf(gtk.gdk.COLORSPACE_RGB, False, 8, snapshot_width, snapshot_height)
+            self.snapshot_pixbuf.get_from_drawable(
+                pixmap,
+                self.window.get_colormap(),
+                0, 0, 0, 0,
                 snapshot_width,
                 snapshot_height,
-                gtk.gdk.INTERP_BILINEAR,
                 )
             
-            gc.collect()
+            self.snapshot_dirty = False
+            self.snapshot_size = (width, height)
         
 gobject.type_register(Workspace)
 
+class WorkspaceStack(gtk.Notebook):
+    '''
+    Container of workspaces, only current workspace is visible.
+    
+    Workspaces are never removed when switching, terminals keep realized and switching just flip visibility.
+    '''
+	
+    def __init__(self):
+        '''
+        Init WorkspaceStack class.
+        '''
+        gtk.Notebook.__init__(self)
+        self.set_show_tabs(False)
+        self.set_show_border(False)
+        
+        # Workspace should switch through Terminal, disable Ctrl + PageUp/PageDown of notebook.
+        self.connect("change-current-page", lambda w, offset: w.stop_emission("change-current-page"))
+        
+    def get_current_workspace(self):
+        page_index = self.get_current_page()
+        if page_index < 0:
+            return None
+        else:
+            return self.get_nth_page(page_index)
+        
+    def add_workspace(self, workspace, switch=True):
+        # Notebook don't switch to hidden page.
+        workspace.show_all()
+        self.append_page(workspace)
+        
+        if switch:
+            self.switch_workspace(workspace)
+        
+    def remove_workspace(self, workspace):
+        page_index = self.page_num(workspace)
+        if page_index >= 0:
+            self.remove_page(page_index)
+            
+    def switch_workspace(self, workspace):
+        # Workspace restored from session fork shells when it's shown first time.
+        # Notebook select first page when it's added, so load layout before check current workspace.
+        workspace.load_pending_layout()
+        
+        current_workspace = self.get_current_workspace()
+        if current_workspace == workspace:
+            return
+        
+        toplevel = self.get_toplevel()
+        if current_workspace and isinstance(toplevel, gtk.Window):
+            current_workspace.focus_widget = toplevel.get_focus()
+            
+        self.set_current_page(self.page_num(workspace))
+        
+        # Terminal only grab focus when it's realized first time, restore focus for workspace that shown before.
+        if workspace.focus_widget and workspace.focus_widget.get_realized():
+            workspace.focus_widget.grab_focus()
+            
+gobject.type_register(WorkspaceStack)
+
 
 class WorkspaceSwitcher(gtk.Window):
     """
     class docs
     """
 
-    def __init__(self, get_workspaces, switch_to_workspace):
+    def __init__(self, get_workspaces, switch_to_workspace, new_workspace):
         """
         init docs
         """
         gtk.Window.__init__(self, gtk.WINDOW_POPUP)
         self.get_workspaces = get_workspaces
         self.switch_to_workspace = switch_to_workspace
+        self.new_workspace = new_workspace
         self.set_decorated(False)
         self.add_events(gtk.gdk.ALL_EVENTS_MASK)
         self.set_colormap(gtk.gdk.Screen().get_rgba_colormap())
@@ -1591,6 +3402,12 @@ class WorkspaceSwitcher(gtk.Window):
         
         self.workspace_snapshot_areas = []
         self.workspace_add_area = None
+        self.workspace_layouts = []
+        self.scale_value = 1.0
+        
+        # Thumbnails, names and frames are drawn to static surface, hover effects are drawn above it.
+        self.static_surface = None
+        self.static_surface_key = None
         
         self.in_workspace_snapshot_area = False
         self.in_workspace_close_area = False
@@ -1602,6 +3419,8 @@ class WorkspaceSwitcher(gtk.Window):
         
     def hide_switcher(self):
         self.workspace_index = 0
+        self.static_surface = None
+        self.static_surface_key = None
         
         self.hide_all()
         
@@ -1632,6 +3451,10 @@ class WorkspaceSwitcher(gtk.Window):
         
         self.workspace_index = current_workspace_index
         
+        # Draw cached usages first, redraw after RSS sampled.
+        memory_governor.update_usages(self.queue_draw)
+        self.static_surface = None
+        
         # Put show_all code at last to avoid cut graphics after show.
         self.show_all()
         
@@ -1639,6 +3462,61 @@ class WorkspaceSwitcher(gtk.Window):
         cr = widget.window.cairo_create()
         rect = widget.allocation
         
+        # Static layer is rebuilt only when workspaces, snapshots, memory usages or size changed,
+        # hover change just repaint damaged area from static layer.
+        workspaces = self.get_workspaces()
+        static_surface_key = (rect.width, rect.height, map(
+                lambda w: (w, w.snapshot_pixbuf, memory_governor.get_workspace_usage(w)), workspaces))
+        if self.static_surface == None or static_surface_key != self.static_surface_key:
+            self.update_layout(rect, workspaces)
+            
+            # Similar surface is kept in X server, painting it don't upload image again.
+            self.static_surface = cr.get_target().create_similar(cairo.CONTENT_COLOR_ALPHA, rect.width, rect.height)
+            self.draw_static_layer(cairo.Context(self.static_surface), rect)
+            self.static_surface_key = static_surface_key
+            
+        area = event.area
+        cr.rectangle(area.x, area.y, area.width, area.height)
+        cr.clip()
+        
+        with cairo_state(cr):
+            cr.set_source_surface(self.static_surface, 0, 0)
+            cr.set_operator(cairo.OPERATOR_SOURCE)
+            cr.paint()
+            
+        self.draw_hover_layer(cr, rect)
+            
+        return True
+    
+    def update_layout(self, rect, workspaces):
+        snapshot_add_width = WORKSPACE_ADD_SIZE + WORKSPACE_ADD_PADDING * 2
+        snapshot_total_width = sum(map(lambda w: w.snapshot_pixbuf.get_width() + WORKSPACE_SNAPSHOT_OFFSET_X * 2, workspaces))
+        have_enough_space = snapshot_total_width + snapshot_add_width * 2 < rect.width
+        if have_enough_space:
+            self.scale_value = 1.0
+            draw_x = (rect.width - snapshot_total_width) / 2
+        else:
+            self.scale_value = float(rect.width) / (snapshot_total_width + snapshot_add_width)
+            draw_x = WORKSPACE_SNAPSHOT_OFFSET_X
+            
+        # Value is (workspace, draw_x, draw_y) before scale.
+        self.workspace_layouts = []
+        self.workspace_snapshot_areas = []    
+        for (workspace_index, workspace) in enumerate(workspaces):
+            snapshot_width = workspace.snapshot_pixbuf.get_width()
+            draw_y = rect.y + WORKSPACE_SNAPSHOT_OFFSET_TOP
+            
+            self.workspace_layouts.append((workspace, draw_x, draw_y))
+            self.workspace_snapshot_areas.append((workspace_index, (
+                        self.scale_value * (draw_x - WORKSPACE_SNAPSHOT_OFFSET_X),
+                        self.scale_value * rect.y,
+                        self.scale_value * (snapshot_width + WORKSPACE_SNAPSHOT_OFFSET_X * 2),
+                        self.scale_value * rect.height,
+                        )))
+            
+            draw_x += snapshot_width + WORKSPACE_SNAPSHOT_OFFSET_X * 2
+            
+    def draw_static_layer(self, cr, rect):
         # Draw background.
         with cairo_state(cr):
             cr.set_source_rgba(*alpha_color_hex_to_cairo(("#000000", 0.6)))
@@ -1659,69 +3537,17 @@ class WorkspaceSwitcher(gtk.Window):
         
         # Draw workspace snapshot.
         text_size = 32
+        memory_text_offset_y = 26
+        memory_text_size = 16
         text_offset_y = 0
             
-        snapshot_add_width = WORKSPACE_ADD_SIZE + WORKSPACE_ADD_PADDING * 2
-        snapshot_total_width = sum(map(lambda w: w.snapshot_pixbuf.get_width() + WORKSPACE_SNAPSHOT_OFFSET_X * 2, self.get_workspaces()))
-        have_enough_space = snapshot_total_width + snapshot_add_width * 2 < rect.width
-        if have_enough_space:
-            scale_value = 1.0
-            draw_x = (rect.width - snapshot_total_width) / 2
-        else:
-            scale_value = float(rect.width) / (snapshot_total_width + snapshot_add_width)
-            draw_x = WORKSPACE_SNAPSHOT_OFFSET_X
-            
-        self.workspace_snapshot_areas = []    
         with cairo_state(cr):    
-            cr.scale(scale_value, scale_value)
-            for (workspace_index, workspace) in enumerate(self.get_workspaces()): 
-                
+            cr.scale(self.scale_value, self.scale_value)
+            for (workspace, draw_x, draw_y) in self.workspace_layouts:
                 snapshot_width = workspace.snapshot_pixbuf.get_width()
                 snapshot_height = workspace.snapshot_pixbuf.get_height()
                 
-                draw_y = rect.y + WORKSPACE_SNAPSHOT_OFFSET_TOP
-                
-                # Draw workspace select background.
-                snapshot_area_x = draw_x - WORKSPACE_SNAPSHOT_OFFSET_X
-                snapshot_area_y = rect.y
-                snapshot_area_width = snapshot_width + WORKSPACE_SNAPSHOT_OFFSET_X * 2
-                snapshot_area_height = rect.height
-                
-                if self.workspace_index == workspace_index and self.in_workspace_snapshot_area:
-                    cr.set_source_rgba(*alpha_color_hex_to_cairo(("#FFFFFF", 0.1)))
-                    cr.rectangle(
-                        snapshot_area_x,
-                        snapshot_area_y,
-                        snapshot_area_width,
-                        snapshot_area_height,
-                        )
-                    cr.fill()
-                    
-                self.workspace_snapshot_areas.append((workspace_index, (
-                                                       scale_value * snapshot_area_x,
-                                                       scale_value * snapshot_area_y,
-                                                       scale_value * snapshot_area_width,
-                                                       scale_value * snapshot_area_height,
-                                                       )))    
-                
-                # Draw workspace snapshot.
-                draw_pixbuf(
-                    cr,
-                    workspace.snapshot_pixbuf,
-                    draw_x,
-                    draw_y,
-                )
-                
-                # Draw workspace snapshot frame.
-                with cairo_disable_antialias(cr):
-                    cr.set_source_rgba(*alpha_color_hex_to_cairo(("#FFFFFF", 0.1)))
-                    cr.rectangle(
-                        draw_x,
-                        draw_y,
-                        workspace.snapshot_pixbuf.get_width(),
-                        workspace.snapshot_pixbuf.get_height(),
-                        )
-                    cr.stroke()
+                self.draw_workspace_snapshot(cr, workspace, draw_x, draw_y)
                 
                 # Draw workspace name.
                 draw_text(
@@ -1735,61 +3561,120 @@ class WorkspaceSwitcher(gtk.Window):
                     alignment=pango.ALIGN_CENTER,
                     )
                 
-                # Draw close button.
-                button_x = snapshot_area_x + WORKSPACE_SNAPSHOT_OFFSET_X * 2
-                if self.workspace_index == workspace_index and self.in_workspace_snapshot_area:
-                    # Draw close button background.
-                    if self.in_workspace_close_area:
-                        cr.set_source_rgba(*alpha_color_hex_to_cairo(("#FF0000", 0.5)))
-                    else:
-                        cr.set_source_rgba(*alpha_color_hex_to_cairo(("#333333", 0.5)))
-                    cr.move_to(
-                        button_x + snapshot_width - self.close_button_size,
-                        snapshot_area_y,
-                        )
-                    cr.line_to(
-                        button_x + snapshot_width,
-                        snapshot_area_y,
-                        )
-                    cr.line_to(
-                        button_x + snapshot_width,
-                        snapshot_area_y + self.close_button_size,
-                        )
-                    cr.line_to(
-                        button_x + snapshot_width - self.close_button_size,
-                        snapshot_area_y,
-                        )
-                    cr.close_path()
-                    cr.fill()
-                    
-                    # Draw close button foreground.
-                    if self.in_workspace_close_area:
-                        cr.set_source_rgba(*alpha_color_hex_to_cairo(("#FFFFFF", 0.8)))
-                    else:
-                        cr.set_source_rgba(*alpha_color_hex_to_cairo(("#FFFFFF", 0.5)))
-                    padding = 5
-                    cr.set_line_width(2)
-                    cr.move_to(
-                        button_x + snapshot_width - self.close_button_size / 2 + padding,
-                        snapshot_area_y + padding,
-                        )
-                    cr.line_to(
-                        button_x + snapshot_width - padding,
-                        snapshot_area_y + self.close_button_size / 2 - padding,
-                        )
-                    cr.stroke()
-                    cr.move_to(
-                        button_x + snapshot_width - self.close_button_size / 2 + padding,
-                        snapshot_area_y + self.close_button_size / 2 - padding,
-                        )
-                    cr.line_to(
-                        button_x + snapshot_width - padding,
-                        snapshot_area_y + padding,
+                # Draw memory usage of workspace.
+                workspace_usage = memory_governor.get_workspace_usage(workspace)
+                if workspace_usage:
+                    (scrollback_size, rss_size) = workspace_usage
+                    draw_text(
+                        cr,
+                        _("Scrollback %s, processes %s") % (format_memory_size(scrollback_size), format_memory_size(rss_size)),
+                        draw_x,
+                        draw_y + snapshot_height + memory_text_offset_y,
+                        snapshot_width,
+                        memory_text_size,
+                        text_size=9,
+                        text_color="#AAAAAA",
+                        alignment=pango.ALIGN_CENTER,
                         )
-                    cr.stroke()
-                    
-                draw_x += snapshot_width + WORKSPACE_SNAPSHOT_OFFSET_X * 2
+                
+    def draw_workspace_snapshot(self, cr, workspace, draw_x, draw_y):
+        # Draw workspace snapshot.
+        draw_pixbuf(
+            cr,
+            workspace.snapshot_pixbuf,
+            draw_x,
+            draw_y,
+        )
+        
+        # Draw workspace snapshot frame.
+        with cairo_disable_antialias(cr):
+            cr.set_source_rgba(*alpha_color_hex_to_cairo(("#FFFFFF", 0.1)))
+            cr.rectangle(
+                draw_x,
+                draw_y,
+                workspace.snapshot_pixbuf.get_width(),
+                workspace.snapshot_pixbuf.get_height(),
+                )
+            cr.stroke()
+            
+    def draw_hover_layer(self, cr, rect):
+        scale_value = self.scale_value
+        
+        if self.in_workspace_snapshot_area and self.workspace_index < len(self.workspace_layouts):
+            (workspace, draw_x, draw_y) = self.workspace_layouts[self.workspace_index]
+            snapshot_width = workspace.snapshot_pixbuf.get_width()
+            
+            snapshot_area_x = draw_x - WORKSPACE_SNAPSHOT_OFFSET_X
+            snapshot_area_y = rect.y
+            snapshot_area_width = snapshot_width + WORKSPACE_SNAPSHOT_OFFSET_X * 2
+            snapshot_area_height = rect.height
             
+            with cairo_state(cr):
+                cr.scale(scale_value, scale_value)
+                
+                # Draw workspace select background, snapshot is drawn again to keep it above background.
+                cr.set_source_rgba(*alpha_color_hex_to_cairo(("#FFFFFF", 0.1)))
+                cr.rectangle(
+                    snapshot_area_x,
+                    snapshot_area_y,
+                    snapshot_area_width,
+                    snapshot_area_height,
+                    )
+                cr.fill()
+                
+                self.draw_workspace_snapshot(cr, workspace, draw_x, draw_y)
+                
+                # Draw close button background.
+                button_x = snapshot_area_x + WORKSPACE_SNAPSHOT_OFFSET_X * 2
+                if self.in_workspace_close_area:
+                    cr.set_source_rgba(*alpha_color_hex_to_cairo(("#FF0000", 0.5)))
+                else:
+                    cr.set_source_rgba(*alpha_color_hex_to_cairo(("#333333", 0.5)))
+                cr.move_to(
+                    button_x + snapshot_width - self.close_button_size,
+                    snapshot_area_y,
+                    )
+                cr.line_to(
+                    button_x + snapshot_width,
+                    snapshot_area_y,
+                    )
+                cr.line_to(
+                    button_x + snapshot_width,
+                    snapshot_area_y + self.close_button_size,
+                    )
+                cr.line_to(
+                    button_x + snapshot_width - self.close_button_size,
+                    snapshot_area_y,
+                    )
+                cr.close_path()
+                cr.fill()
+                
+                # Draw close button foreground.
+                if self.in_workspace_close_area:
+                    cr.set_source_rgba(*alpha_color_hex_to_cairo(("#FFFFFF", 0.8)))
+                else:
+                    cr.set_source_rgba(*alpha_color_hex_to_cairo(("#FFFFFF", 0.5)))
+                padding = 5
+                cr.set_line_width(2)
+                cr.move_to(
+                    button_x + snapshot_width - self.close_button_size / 2 + padding,
+                    snapshot_area_y + padding,
+                    )
+                cr.line_to(
+                    button_x + snapshot_width - padding,
+                    snapshot_area_y + self.close_button_size / 2 - padding,
+                    )
+                cr.stroke()
+                cr.move_to(
+                    button_x + snapshot_width - self.close_button_size / 2 + padding,
+                    snapshot_area_y + self.close_button_size / 2 - padding,
+                    )
+                cr.line_to(
+                    button_x + snapshot_width - padding,
+                    snapshot_area_y + padding,
+                    )
+                cr.stroke()
+                    
         # Draw workspace add button.
         with cairo_state(cr):        
             workspace_add_size = scale_value * WORKSPACE_ADD_SIZE    
@@ -1846,9 +3731,15 @@ class WorkspaceSwitcher(gtk.Window):
              self.close_button_size,
              ))
     
+    def get_hover_state(self):
+        return (self.workspace_index, self.in_workspace_snapshot_area, self.in_workspace_close_area, self.in_workspace_add_area)
+    
     def motion_workspace_switcher(self, widget, event):
+        (prev_workspace_index, prev_in_snapshot_area, prev_in_close_area, prev_in_add_area) = self.get_hover_state()
+        
         self.in_workspace_snapshot_area = False
         self.in_workspace_close_area = False
+        self.in_workspace_add_area = False
         
         for (workspace_index, snapshot_area) in self.workspace_snapshot_areas:
             if is_in_rect((event.x, event.y), snapshot_area):
@@ -1856,15 +3747,31 @@ class WorkspaceSwitcher(gtk.Window):
                     self.in_workspace_close_area = True
                 
                 self.in_workspace_snapshot_area = True
-                self.in_workspace_add_area = False
                 self.workspace_index = workspace_index
-                self.queue_draw()
-                return False
+                break
+        else:
+            if self.workspace_add_area and is_in_rect((event.x, event.y), self.workspace_add_area):
+                self.in_workspace_add_area = True
+                
+        # Only repaint snapshot areas and add button that hover state changed.
+        if (prev_workspace_index, prev_in_snapshot_area, prev_in_close_area) != self.get_hover_state()[0:3]:
+            self.queue_draw_snapshot_area(prev_workspace_index)
+            self.queue_draw_snapshot_area(self.workspace_index)
             
-        if is_in_rect((event.x, event.y), self.workspace_add_area):
-            self.in_workspace_add_area = True
-            self.queue_draw()
-            return False
+        if prev_in_add_area != self.in_workspace_add_area and self.workspace_add_area:
+            (add_area_x, add_area_y, add_area_width, add_area_height) = self.workspace_add_area
+            rect = self.allocation
+            self.queue_draw_rect((add_area_x, rect.y, rect.width - add_area_x, rect.height))
+            
+        return False
+    
+    def queue_draw_snapshot_area(self, workspace_index):
+        if 0 <= workspace_index < len(self.workspace_snapshot_areas):
+            self.queue_draw_rect(self.workspace_snapshot_areas[workspace_index][1])
+            
+    def queue_draw_rect(self, (x, y, w, h)):
+        # Area is float after scale, expand it to cover antialias pixels.
+        self.queue_draw_area(int(x) - 1, int(y) - 1, int(w) + 3, int(h) + 3)
             
     def button_press_workspace_switcher(self, widget, event):        
         for (workspace_index, snapshot_area) in self.workspace_snapshot_areas:
@@ -1880,14 +3787,294 @@ class WorkspaceSwitcher(gtk.Window):
                 return False
             
         if is_in_rect((event.x, event.y), self.workspace_add_area):
-            global_event.emit("new-workspace")
+            self.new_workspace()
             self.queue_draw()
             return False
         
         self.hide_switcher()
         
-gobject.type_register(WorkspaceSwitcher)
-
+gobject.type_register(WorkspaceSwitcher)
+
+search_regex_cache = {}
+
+def compile_search_regex(pattern):
+    '''
+    Compile search pattern, compiled regex is cached.
+    
+    @return: Return compiled regex, return None if pattern is invalid.
+    '''
+    if pattern not in search_regex_cache:
+        if len(search_regex_cache) >= SEARCH_REGEX_CACHE_SIZE:
+            search_regex_cache.clear()
+            
+        try:
+            search_regex_cache[pattern] = re.compile(pattern.decode("utf-8"), re.UNICODE)
+        except re.error:
+            search_regex_cache[pattern] = None
+            
+    return search_regex_cache[pattern]
+
+class TerminalTextCache(object):
+    '''
+    Row text cache of terminal, for random row access near screen, such as moving cursor.
+    
+    Text is read without Python callback (pygtk vte use C predicate that select all cells when callback is None).
+    Only rows of screen and TEXT_CACHE_MARGIN_ROWS rows above screen are cached,
+    streaming readers read row ranges with TerminalWrapper.get_range_text and never fill cache.
+    '''
+	
+    def __init__(self, terminal):
+        '''
+        Init TerminalTextCache class.
+        
+        @param terminal: TerminalWrapper to read.
+        '''
+        self.terminal = terminal
+        self.row_texts = {}
+        self.upper = self.get_upper()
+        
+        terminal.connect("contents-changed", lambda w: self.invalidate())
+        
+    def get_upper(self):
+        return int(self.terminal.get_adjustment().get_upper())
+        
+    def get_screen_row(self):
+        return self.get_upper() - self.terminal.get_row_count()
+    
+    def clear(self):
+        self.row_texts = {}
+    
+    def invalidate(self):
+        upper = self.get_upper()
+        if upper < self.upper:
+            # Terminal is reset, row number start again.
+            self.row_texts = {}
+        self.upper = upper
+        
+        # Rows in screen maybe changed, rows far above screen are out of cache range.
+        screen_row = self.get_screen_row()
+        self.row_texts = dict(filter(
+                lambda (row, text): screen_row - TEXT_CACHE_MARGIN_ROWS <= row < screen_row,
+                self.row_texts.items()))
+        
+    def get_row_text(self, row):
+        if row in self.row_texts:
+            return self.row_texts[row]
+        
+        text = self.terminal.get_range_text(row, row)
+        if row >= self.get_screen_row() - TEXT_CACHE_MARGIN_ROWS:
+            self.row_texts[row] = text
+            
+        return text
+    
+WIDE_CHAR_REGEX = re.compile(u"[\u1100-\u115f\u2e80-\ua4cf\uac00-\ud7a3\uf900-\ufaff\ufe30-\ufe4f\uff00-\uff60\uffe0-\uffe6]")
+
+def get_text_width(text):
+    '''
+    Get number of columns that text take in terminal, wide characters take two columns.
+    '''
+    return len(text) + len(WIDE_CHAR_REGEX.findall(text))
+
+def get_line_row_count(line, column_count):
+    '''
+    Get number of rows that line take in terminal.
+    '''
+    return max(1, (get_text_width(line) + column_count - 1) / column_count)
+    
+class ScrollbackReader(object):
+    '''
+    Read scrollback of terminal by chunks, soft wrapped rows are joined to one line, 
+    so match cross rows can be found.
+    '''
+	
+    def __init__(self, terminal, read_archive=True):
+        '''
+        Init ScrollbackReader class.
+        
+        @param terminal: TerminalWrapper to read.
+        @param read_archive: Read lines in scrollback archive of terminal first, default is True.
+        '''
+        self.terminal = terminal
+        self.first_row = terminal.get_first_row()
+        self.row = self.first_row
+        self.end_row = terminal.get_last_row()
+        self.column_count = terminal.get_column_count()
+        
+        self.archive = None
+        if read_archive and terminal.scrollback_archive and terminal.scrollback_archive.get_first_row() != None:
+            # Read lines that dropped by vte from archive, and rows not archived yet from vte.
+            self.archive = terminal.scrollback_archive
+            self.archive_block_index = 0
+            self.archive_block_count = self.archive.get_block_count()
+            self.archive_pending_lines = self.archive.get_pending_lines()
+            self.first_row = self.archive.get_first_row()
+            self.row = max(self.row, terminal.get_archive_row())
+            
+        self.line = u""
+        self.line_row = self.row
+        
+    def is_finish(self):
+        return self.archive == None and self.row > self.end_row
+    
+    def update_rows(self, first_row, end_row):
+        '''
+        Update row range to read, for reading rows that appear after reader created.
+        
+        @return: Return number of rows dropped by vte before read.
+        '''
+        dropped_rows = 0
+        if self.row < first_row:
+            # Rows are dropped by vte before read.
+            dropped_rows = first_row - self.row
+            self.row = first_row
+            self.line = u""
+            self.line_row = first_row
+            
+        self.end_row = end_row
+        
+        return dropped_rows
+    
+    def read_lines(self, row_count, read_last_line=True):
+        '''
+        Read lines of next rows.
+        
+        @param row_count: Number of rows to read.
+        @param read_last_line: Whether return last line if it's soft wrapped to rows after end row.
+        
+        @return: Return list of (line_row, line), line_row is first row of line.
+        '''
+        if self.archive:
+            if self.archive_block_index < self.archive_block_count:
+                self.archive_block_index += 1
+                return self.archive.read_block(self.archive_block_index - 1)
+            else:
+                self.archive = None
+                return self.archive_pending_lines
+            
+        lines = []
+        end_row = min(self.row + row_count, self.end_row + 1)
+        if end_row > self.row:
+            # Read chunk with one vte call, then row of lines is calculated from their width.
+            line_texts = self.terminal.get_range_text(self.row, end_row - 1).split("\n")
+            for line_text in line_texts[:-1]:
+                line = self.line + line_text
+                lines.append((self.line_row, line))
+                self.line = u""
+                self.line_row = min(self.line_row + get_line_row_count(line, self.column_count), end_row)
+                
+            # Text after last newline is soft wrapped to rows of next chunk.
+            self.line += line_texts[-1]
+            if self.line == u"":
+                self.line_row = end_row
+        self.row = end_row
+        
+        if read_last_line and self.is_finish() and self.line:
+            lines.append((self.line_row, self.line))
+            self.line = u""
+            
+        return lines
+    
+    def get_match_row(self, line_row, offset):
+        return line_row + offset / self.column_count
+    
+    def get_match_position(self, line_row, line, start, end):
+        '''
+        Get cells of match in line.
+        
+        @return: Return (start_row, start_column, end_row, end_column), end_column is exclusive.
+        '''
+        start_offset = get_text_width(line[:start])
+        end_offset = max(start_offset + get_text_width(line[start:end]), start_offset + 1)
+        
+        return (line_row + start_offset / self.column_count,
+                start_offset % self.column_count,
+                line_row + (end_offset - 1) / self.column_count,
+                (end_offset - 1) % self.column_count + 1)
+    
+class ScrollbackSearch(object):
+    '''
+    Scan scrollback of terminal in chunks on idle, and build position index of matches.
+    
+    Jump to next or previous match just need index lookup, don't scan scrollback again.
+    '''
+	
+    def __init__(self, terminal, regex, update_callback):
+        '''
+        Init ScrollbackSearch class.
+        
+        @param terminal: TerminalWrapper to search.
+        @param regex: Compiled regex.
+        @param update_callback: Called when new matches found or scan finish.
+        '''
+        self.terminal = terminal
+        self.regex = regex
+        self.update_callback = update_callback
+        
+        # Row and cells of every match, sorted by position.
+        self.match_rows = []
+        self.match_positions = []
+        self.match_index = None
+        
+        self.scrollback_reader = ScrollbackReader(terminal)
+        self.start_time = time.time()
+        
+        self.is_finish = False
+        self.scan_id = gobject.idle_add(self.scan_chunk, priority=gobject.PRIORITY_LOW)
+        
+    def scan_chunk(self):
+        for (line_row, line) in self.scrollback_reader.read_lines(SEARCH_CHUNK_ROWS):
+            for match in self.regex.finditer(line):
+                match_position = self.scrollback_reader.get_match_position(line_row, line, match.start(), match.end())
+                self.match_rows.append(match_position[0])
+                self.match_positions.append(match_position)
+        
+        if self.scrollback_reader.is_finish():
+            self.is_finish = True
+            self.scan_id = None
+            
+            if PROFILE_TIMING:
+                print "Search %s rows: %.3fs" % (
+                    self.scrollback_reader.end_row - self.scrollback_reader.first_row + 1,
+                    time.time() - self.start_time)
+            
+        self.update_callback()
+        
+        return not self.is_finish
+    
+
+    def cancel(self):
+        if self.scan_id:
+            gobject.source_remove(self.scan_id)
+            self.scan_id = None
+            
+    def get_match_count(self):
+        return len(self.match_rows)
+    
+    def step(self, offset):
+        '''
+        Move to next or previous match.
+        
+        @param offset: 1 to move forward, -1 to move backward.
+        
+        @return: Return (start_row, start_column, end_row, end_column) of match, return None if nothing match.
+        '''
+        match_count = len(self.match_rows)
+        if match_count == 0:
+            return None
+        
+        if self.match_index == None:
+            # Start from first match in visible area.
+            visible_row = int(self.terminal.get_adjustment().get_value())
+            self.match_index = bisect.bisect_left(self.match_rows, visible_row)
+            if offset < 0:
+                self.match_index -= 1
+        else:
+            self.match_index += offset
+            
+        self.match_index %= match_count
+        
+        return self.match_positions[self.match_index]
+    
 class SearchBar(gtk.Window):
     '''
     class docs
@@ -1957,8 +4144,22 @@ class SearchBar(gtk.Window):
         self.button_align.set_padding(0, 0, 0, 0)
         self.button_align.add(self.button_box)
         
+        self.match_label = Label(
+            "",
+            text_color=ui_theme.get_color("entry_select_text"),
+            text_size=9,
+            text_x_align=ALIGN_END,
+            label_width=60,
+            enable_select=False,
+            )
+        self.match_label_align = gtk.Alignment()
+        self.match_label_align.set(0.5, 0.5, 0, 0)
+        self.match_label_align.set_padding(0, 0, 5, 5)
+        self.match_label_align.add(self.match_label)
+        
         self.box = gtk.HBox()
         self.box.pack_start(self.entry_align, True, True)
+        self.box.pack_start(self.match_label_align, False, False)
         self.box.pack_start(self.button_align, False, False)
         
         self.add(self.box)
@@ -1968,8 +4169,10 @@ class SearchBar(gtk.Window):
         self.close_button.connect("clicked", lambda w: self.hide_bar())
         
         self.search_regex = ""
+        self.search_timeout_id = None
+        self.scrollback_search = None
         
-        self.width = 320
+        self.width = 380
         self.height = 37
         self.radius = 5
         self.right_padding = 5
@@ -1985,117 +4188,615 @@ class SearchBar(gtk.Window):
         
         self.generate_keymap()
         
-        self.connect("expose-event", self.expose_search_bar)
-        self.connect("size-allocate", self.shape_search_bar)
-        self.connect("key-press-event", self.key_press_search_bar)
-        self.entry.connect("changed", self.search_terminal)
+        self.connect("expose-event", self.expose_search_bar)
+        self.connect("size-allocate", self.shape_search_bar)
+        self.connect("key-press-event", self.key_press_search_bar)
+        self.entry.connect("changed", self.search_terminal)
+        
+    def generate_keymap(self):
+        get_keybind = lambda key_value: get_config("keybind", key_value)
+        
+        key_values = [
+            "search_forward",
+            "search_backward",
+            ]
+        
+        self.keymap = {
+            "Escape": self.hide_bar,
+            "Return": self.search_forward,
+            }
+        
+        for key_value in key_values:
+            self.keymap[get_keybind(key_value)] = getattr(self, key_value)
+            
+    def search_terminal(self, entry, text):
+        # Search after user stop typing, don't scan scrollback for every character.
+        if self.search_timeout_id:
+            gobject.source_remove(self.search_timeout_id)
+        self.search_timeout_id = gobject.timeout_add(SEARCH_DELAY, self.start_search, text)
+        
+    def flush_search(self):
+        if self.search_timeout_id:
+            gobject.source_remove(self.search_timeout_id)
+            self.start_search(self.entry.get_text())
+            return True
+        else:
+            return False
+            
+    def start_search(self, text):
+        self.search_timeout_id = None
+        self.cancel_search()
+        
+        if self.active_terminal:
+            self.search_regex = text
+            
+            if text:
+                regex = compile_search_regex(text)
+                if regex:
+                    self.scrollback_search = ScrollbackSearch(self.active_terminal, regex, self.update_search)
+                    
+        self.update_match_label()
+                    
+        return False
+    
+    def cancel_search(self):
+        if self.scrollback_search:
+            self.scrollback_search.cancel()
+            self.scrollback_search = None
+            
+        if self.active_terminal:
+            self.active_terminal.set_search_highlight(None)
+            
+    def update_search(self):
+        # Jump to first match after cursor once it's found.
+        if self.scrollback_search.match_index == None and self.scrollback_search.get_match_count() > 0:
+            self.step_search(1)
+        else:
+            self.update_match_label()
+            
+    def update_match_label(self):
+        if self.scrollback_search:
+            match_count = self.scrollback_search.get_match_count()
+            match_index = self.scrollback_search.match_index
+            if not self.scrollback_search.is_finish:
+                self.match_label.set_text("%s+" % match_count)
+            elif match_index != None:
+                self.match_label.set_text(_("%s of %s") % (match_index + 1, match_count))
+            else:
+                self.match_label.set_text(str(match_count))
+        else:
+            self.match_label.set_text("")
+            
+    def step_search(self, offset):
+        # Matches are indexed by position, step don't scan terminal again.
+        if self.scrollback_search:
+            match_position = self.scrollback_search.step(offset)
+            if match_position != None:
+                self.active_terminal.scroll_to_row(match_position[0])
+                self.active_terminal.set_search_highlight(match_position)
+                
+            self.update_match_label()
+            
+    def search_forward(self):
+        if self.active_terminal and not self.flush_search():
+            self.step_search(1)
+        
+    def search_backward(self):
+        if self.active_terminal and not self.flush_search():
+            self.step_search(-1)
+            
+    def show_bar(self, terminal_box_coordinate, active_terminal, init_text=None):
+        (terminal_box_right_x, terminal_box_y) = terminal_box_coordinate
+        self.move(
+            terminal_box_right_x - self.width - self.right_padding,
+            terminal_box_y
+            )
+        
+        if active_terminal != self.active_terminal:
+            self.cancel_search()
+        self.active_terminal = active_terminal
+        
+        if init_text:
+            self.entry.set_text(init_text)
+        else:
+            self.entry.set_text("")
+    
+        self.show_all()    
+    
+    def hide_bar(self):
+        if self.search_timeout_id:
+            gobject.source_remove(self.search_timeout_id)
+            self.search_timeout_id = None
+        self.cancel_search()
+        
+        if self.active_terminal:
+            self.active_terminal.move_to_end()
+            
+        self.hide_all()
+        
+    def expose_search_bar(self, widget, event):
+        cr = widget.window.cairo_create()
+        rect = widget.allocation
+        x, y, w, h = rect.x, rect.y, rect.width, rect.height
+        
+        # Draw background.
+        with cairo_state(cr):
+            cr.set_source_rgba(*alpha_color_hex_to_cairo(("#000000", 0.5)))
+            cr.set_operator(cairo.OPERATOR_SOURCE)
+            cr.paint()
+            
+        # Draw frame.
+        with cairo_state(cr):
+            cr.set_source_rgba(*alpha_color_hex_to_cairo(("#FFFFFF", 0.1)))
+            cr.set_operator(cairo.OPERATOR_OVER)
+            draw_round_rectangle(cr, x, y, w, h, self.radius)
+            cr.stroke()
+            
+        propagate_expose(widget, event)
+            
+        return True    
+    
+    def shape_search_bar(self, widget, rect):
+        if widget.get_has_window() and rect.width > 0 and rect.height > 0:
+            # Init.
+            x, y, w, h = rect.x, rect.y, rect.width, rect.height
+            bitmap = gtk.gdk.Pixmap(None, w, h, 1)
+            cr = bitmap.cairo_create()
+            
+            # Clear the bitmap
+            cr.set_source_rgb(0.0, 0.0, 0.0)
+            cr.set_operator(cairo.OPERATOR_CLEAR)
+            cr.paint()
+            
+            # Draw shape of search bar.
+            cr.set_source_rgb(1.0, 1.0, 1.0)
+            cr.set_operator(cairo.OPERATOR_OVER)
+            draw_round_rectangle(cr, x, y, w, h, self.radius)
+            cr.fill()
+                
+            # Shape with given mask.
+            widget.shape_combine_mask(bitmap, 0, 0)
+            
+    def key_press_search_bar(self, widget, event):
+        key_name = get_keyevent_name(event)
+        if key_name in self.keymap:
+            self.keymap[key_name]()
+            
+            return True
+        else:
+            return False
+
+gobject.type_register(SearchBar)
+
+class WorkerPool(object):
+    '''
+    Threads to run function out of GTK thread, function should send result back through gobject.idle_add.
+    '''
+	
+    def __init__(self, thread_count):
+        '''
+        Init WorkerPool class.
+        
+        @param thread_count: Maximum number of threads, threads are started when first used.
+        '''
+        self.thread_count = thread_count
+        self.threads = []
+        self.task_queue = Queue.Queue()
+        
+    def put(self, function, *args):
+        if len(self.threads) < self.thread_count:
+            thread = threading.Thread(target=self.run_loop)
+            thread.setDaemon(True)
+            thread.start()
+            self.threads.append(thread)
+            
+        self.task_queue.put((function, args))
+        
+    def run_loop(self):
+        while True:
+            (function, args) = self.task_queue.get()
+            try:
+                function(*args)
+            except Exception, e:
+                print "function run_loop got error: %s" % e
+                traceback.print_exc(file=sys.stdout)
+                
+global_search_pool = WorkerPool(GLOBAL_SEARCH_THREADS)
+
+class GlobalSearchScan(object):
+    '''
+    Search scrollback of many terminals.
+    
+    Text is read by chunks in GTK thread (vte isn't thread safe), and matched in global_search_pool.
+    Terminals are read by turns, so every terminal give result soon.
+    '''
+	
+    def __init__(self, terminal_infos, regex, result_callback, finish_callback):
+        '''
+        Init GlobalSearchScan class.
+        
+        @param terminal_infos: List of (workspace_index, terminals).
+        @param regex: Compiled regex.
+        @param result_callback: Called with list of (workspace_index, pane_index, terminal, row, line_number, snippet),
+        pane_index is index of terminal in workspace.
+        @param finish_callback: Called when all terminals are searched.
+        '''
+        self.regex = regex
+        self.result_callback = result_callback
+        self.finish_callback = finish_callback
+        
+        self.readers = []
+        for (workspace_index, terminals) in terminal_infos:
+            for (pane_index, terminal) in enumerate(terminals):
+                self.readers.append((workspace_index, pane_index, terminal, ScrollbackReader(terminal)))
+                
+        self.result_count = 0
+        self.pending_chunk_count = 0
+        self.is_cancelled = False
+        self.read_id = gobject.idle_add(self.read_chunk, priority=gobject.PRIORITY_LOW)
+        
+    def read_chunk(self):
+        if len(self.readers) == 0:
+            self.read_id = None
+            self.check_finish()
+            
+            return False
+        
+        (workspace_index, pane_index, terminal, reader) = self.readers.pop(0)
+        lines = reader.read_lines(SEARCH_CHUNK_ROWS)
+        if not reader.is_finish():
+            self.readers.append((workspace_index, pane_index, terminal, reader))
+            
+        if len(lines) > 0:
+            self.pending_chunk_count += 1
+            global_search_pool.put(self.match_chunk, workspace_index, pane_index, terminal, reader, lines)
+            
+        return True
+    
+    def match_chunk(self, workspace_index, pane_index, terminal, reader, lines):
+        results = []
+        if not self.is_cancelled:
+            for (line_row, line) in lines:
+                for match in self.regex.finditer(line):
+                    row = reader.get_match_row(line_row, match.start())
+                    snippet_start = max(0, match.start() - GLOBAL_SEARCH_SNIPPET_LENGTH / 4)
+                    results.append((
+                            workspace_index,
+                            pane_index,
+                            terminal, 
+                            row,
+                            row - reader.first_row + 1,
+                            line[snippet_start:snippet_start + GLOBAL_SEARCH_SNIPPET_LENGTH].strip(),
+                            ))
+                    
+        gobject.idle_add(self.deliver_results, results)
+        
+    def deliver_results(self, results):
+        self.pending_chunk_count -= 1
+        
+        if not self.is_cancelled and len(results) > 0:
+            results = results[:GLOBAL_SEARCH_MAX_RESULTS - self.result_count]
+            self.result_count += len(results)
+            self.result_callback(results)
+            
+            if self.result_count >= GLOBAL_SEARCH_MAX_RESULTS:
+                self.cancel()
+                self.finish_callback()
+                
+        self.check_finish()
+        
+        return False
+    
+    def check_finish(self):
+        if not self.is_cancelled and self.read_id == None and self.pending_chunk_count == 0:
+            self.is_cancelled = True
+            self.finish_callback()
+            
+    def cancel(self):
+        self.is_cancelled = True
+        if self.read_id:
+            gobject.source_remove(self.read_id)
+            self.read_id = None
+            
+class GlobalSearch(DialogBox):
+    '''
+    Search scrollback of all terminals in all workspaces.
+    '''
+	
+    def __init__(self, get_terminal_infos, focus_terminal_row):
+        '''
+        Init GlobalSearch class.
+        
+        @param get_terminal_infos: Callback to get list of (workspace_index, terminals).
+        @param focus_terminal_row: Callback to show terminal and scroll to row.
+        '''
+        DialogBox.__init__(
+            self,
+            _("Search all terminals"),
+            600,
+            400,
+            mask_type=DIALOG_MASK_GLASS_PAGE,
+            close_callback=self.hide_window,
+            )
+        self.get_terminal_infos = get_terminal_infos
+        self.focus_terminal_row = focus_terminal_row
+        self.search_scan = None
+        
+        self.search_entry = InputEntry()
+        self.search_entry.set_size(560, 23)
+        self.search_entry.entry.connect("press-return", lambda w: self.start_search())
+        self.search_entry_align = gtk.Alignment()
+        self.search_entry_align.set(0.5, 0.5, 1, 1)
+        self.search_entry_align.set_padding(10, 10, 20, 20)
+        self.search_entry_align.add(self.search_entry)
+        
+        self.treeview = TreeView()
+        self.treeview.set_column_titles([_("Workspace"), _("Pane"), _("Line"), _("Text")])
+        self.treeview.connect("double-click-item", lambda treeview, item, column, x, y: self.show_result(item))
+        
+        self.status_label = Label("", enable_select=False)
+        self.search_button = Button(_("Search"))
+        self.search_button.connect("clicked", lambda w: self.start_search())
+        self.show_button = Button(_("Show"))
+        self.show_button.connect("clicked", lambda w: self.show_select_result())
+        self.right_button_box.set_buttons([self.search_button, self.show_button])
+        self.left_button_box.set_buttons([self.status_label])
+        
+        self.box = gtk.VBox()
+        self.box.pack_start(self.search_entry_align, False, False)
+        self.box.pack_start(self.treeview, True, True)
+        self.body_box.add(self.box)
+        
+        self.parent_window = None
+        
+        self.connect("key-press-event", self.key_press_global_search)
+        
+        self.keymap = {
+            "Escape" : self.hide_window,
+            }
+        
+    def key_press_global_search(self, widget, event):
+        key_name = get_keyevent_name(event)
+        if key_name in self.keymap:
+            self.keymap[key_name]()
+            return True
+        else:
+            return False
+        
+    def start_search(self):
+        self.cancel_search()
+        self.treeview.clear()
+        
+        text = self.search_entry.get_text()
+        if text:
+            regex = compile_search_regex(text)
+            if regex:
+                self.status_label.set_text(_("Searching..."))
+                self.search_scan = GlobalSearchScan(
+                    self.get_terminal_infos(), regex, self.add_results, self.finish_search)
+            else:
+                self.status_label.set_text(_("Invalid pattern"))
+        else:
+            self.status_label.set_text("")
+            
+    def cancel_search(self):
+        if self.search_scan:
+            self.search_scan.cancel()
+            self.search_scan = None
+            
+    def add_results(self, results):
+        self.treeview.add_items(map(lambda result: SearchResultItem(*result), results))
+        
+    def finish_search(self):
+        self.status_label.set_text(_("%s matches") % len(self.treeview.get_items()))
+        
+    def show_select_result(self):
+        if len(self.treeview.select_rows) == 1:
+            self.show_result(self.treeview.visible_items[self.treeview.select_rows[0]])
+            
+    def show_result(self, item):
+        terminal = item.get_terminal()
+        if terminal and terminal.get_realized():
+            self.focus_terminal_row(terminal, item.row)
+            self.hide_window()
+        
+    def show_search(self, parent_window):
+        self.parent_window = parent_window
+        
+        self.show_all()
+        place_center(parent_window, self)
+        
+        self.search_entry.entry.grab_focus()
+        
+    def hide_window(self):
+        self.cancel_search()
+        self.hide_all()
+        
+        return True
+    
+gobject.type_register(GlobalSearch)
+
+class SearchResultItem(NodeItem):
+    '''
+    Item of global search result.
+    '''
+	
+    def __init__(self, workspace_index, pane_index, terminal, row, line_number, snippet):
+        '''
+        Initialize SearchResultItem class.
+        '''
+        NodeItem.__init__(self)
+        self.workspace_index = workspace_index
+        self.pane_index = pane_index
+        # Don't keep closed terminal alive.
+        self.terminal_ref = weakref.ref(terminal)
+        self.row = row
+        self.line_number = line_number
+        self.snippet = snippet
+        self.text_size = DEFAULT_FONT_SIZE
+        self.text_padding = 10
+        self.height = 24
+        
+    def get_terminal(self):
+        return self.terminal_ref()
+        
+    def get_height(self):
+        return self.height
+        
+    def get_column_widths(self):
+        return [90, 60, 70, 360]
+        
+    def get_column_renders(self):
+        return [
+            lambda cr, rect: self.render_text(cr, rect, str(self.workspace_index + 1)),
+            lambda cr, rect: self.render_text(cr, rect, str(self.pane_index + 1)),
+            lambda cr, rect: self.render_text(cr, rect, str(self.line_number)),
+            lambda cr, rect: self.render_text(cr, rect, self.snippet),
+            ]
+        
+    def render_text(self, cr, rect, text):
+        # Draw select background.
+        background_color = get_background_color(self.is_highlight, self.is_select, self.is_hover)
+        if background_color:
+            cr.set_source_rgb(*color_hex_to_cairo(ui_theme.get_color(background_color).get_color()))    
+            cr.rectangle(rect.x, rect.y, rect.width, rect.height)
+            cr.fill()
+        
+        # Draw text.
+        text_color = get_text_color(self.is_select)
+        draw_text(cr, 
+                  text,
+                  rect.x + self.text_padding,
+                  rect.y,
+                  rect.width - self.text_padding,
+                  rect.height,
+                  text_color=text_color,
+                  text_size=self.text_size,
+                  )
+        
+gobject.type_register(SearchResultItem)
+
+class ScrollbackExport(object):
+    '''
+    Stream scrollback of terminal to file by chunks on idle, memory usage don't grow with history size.
+    
+    Output is written to temporary file, and renamed to target file after finish, so cancel won't leave half file.
+    '''
+	
+    def __init__(self, terminal, filepath, progress_callback, finish_callback):
+        '''
+        Init ScrollbackExport class.
         
-    def generate_keymap(self):
-        get_keybind = lambda key_value: get_config("keybind", key_value)
+        @param terminal: TerminalWrapper to export.
+        @param filepath: Target file, it's compressed with gzip if it end with '.gz'.
+        @param progress_callback: Called with fraction of exported rows.
+        @param finish_callback: Called with error message when export finish, error message is None if export successful.
+        '''
+        self.filepath = filepath
+        self.progress_callback = progress_callback
+        self.finish_callback = finish_callback
         
-        key_values = [
-            "search_forward",
-            "search_backward",
-            ]
+        self.reader = ScrollbackReader(terminal)
+        self.row_count = max(1, self.reader.end_row - self.reader.first_row + 1)
         
-        self.keymap = {
-            "Escape": self.hide_bar,
-            "Return": self.search_forward,
-            }
+        self.export_file = ExportFile(filepath)
+        self.export_id = gobject.idle_add(self.export_chunk, priority=gobject.PRIORITY_LOW)
         
-        for key_value in key_values:
-            self.keymap[get_keybind(key_value)] = getattr(self, key_value)
+    def export_chunk(self):
+        try:
+            lines = self.reader.read_lines(EXPORT_CHUNK_ROWS)
+            self.export_file.write("".join(map(lambda (line_row, line): line.encode("utf-8") + "\n", lines)))
             
-    def search_terminal(self, entry, text):
-        if self.active_terminal:
-            self.search_regex = text
-            self.active_terminal.search_set_gregex(text)
-            self.active_terminal.search_set_wrap_around(True)
-            self.active_terminal.search_find_next()
+            if self.reader.is_finish():
+                self.export_id = None
+                self.export_file.commit()
+                self.finish_callback(None)
+                
+                return False
+        except (IOError, OSError), e:
+            self.export_id = None
+            self.cancel()
+            self.finish_callback(str(e))
             
-    def search_forward(self):
-        if self.active_terminal:
-            self.active_terminal.search_find_next()
+            return False
         
-    def search_backward(self):
-        if self.active_terminal:
-            self.active_terminal.search_find_previous()
+        if len(lines) > 0:
+            (line_row, line) = lines[-1]
+            self.progress_callback(min(1.0, float(line_row - self.reader.first_row) / self.row_count))
             
-    def show_bar(self, terminal_box_coordinate, active_terminal, init_text=None):
-        (terminal_box_right_x, terminal_box_y) = terminal_box_coordinate
-        self.move(
-            terminal_box_right_x - self.width - self.right_padding,
-            terminal_box_y
+        return True
+    
+    def cancel(self):
+        if self.export_id:
+            gobject.source_remove(self.export_id)
+            self.export_id = None
+            
+        self.export_file.abort()
+            
+class ExportDialog(DialogBox):
+    '''
+    Show progress of scrollback export.
+    '''
+	
+    def __init__(self, terminal, filepath):
+        '''
+        Init ExportDialog class.
+        
+        @param terminal: TerminalWrapper to export.
+        @param filepath: Target file.
+        '''
+        DialogBox.__init__(
+            self,
+            _("Save output"),
+            400,
+            140,
+            mask_type=DIALOG_MASK_GLASS_PAGE,
+            close_callback=self.cancel_export,
             )
+        self.filepath = filepath
         
-        self.active_terminal = active_terminal
+        self.progress_bar = gtk.ProgressBar()
+        self.progress_bar.set_text(os.path.basename(filepath))
+        self.progress_align = gtk.Alignment()
+        self.progress_align.set(0.5, 0.5, 1, 0)
+        self.progress_align.set_padding(10, 10, 20, 20)
+        self.progress_align.add(self.progress_bar)
+        self.body_box.add(self.progress_align)
         
-        if init_text:
-            self.entry.set_text(init_text)
-        else:
-            self.entry.set_text("")
-    
-        self.show_all()    
-    
-    def hide_bar(self):
-        if self.active_terminal:
-            self.active_terminal.move_to_end()
-            
-        self.hide_all()
+        self.cancel_button = Button(_("Cancel"))
+        self.cancel_button.connect("clicked", lambda w: self.cancel_export())
+        self.right_button_box.set_buttons([self.cancel_button])
         
-    def expose_search_bar(self, widget, event):
-        cr = widget.window.cairo_create()
-        rect = widget.allocation
-        x, y, w, h = rect.x, rect.y, rect.width, rect.height
+        self.scrollback_export = None
+        try:
+            self.scrollback_export = ScrollbackExport(terminal, filepath, self.update_progress, self.finish_export)
+        except (IOError, OSError), e:
+            self.finish_export(str(e))
         
-        # Draw background.
-        with cairo_state(cr):
-            cr.set_source_rgba(*alpha_color_hex_to_cairo(("#000000", 0.5)))
-            cr.set_operator(cairo.OPERATOR_SOURCE)
-            cr.paint()
-            
-        # Draw frame.
-        with cairo_state(cr):
-            cr.set_source_rgba(*alpha_color_hex_to_cairo(("#FFFFFF", 0.1)))
-            cr.set_operator(cairo.OPERATOR_OVER)
-            draw_round_rectangle(cr, x, y, w, h, self.radius)
-            cr.stroke()
-            
-        propagate_expose(widget, event)
+    def show_export(self, parent_window):
+        self.show_all()
+        place_center(parent_window, self)
+        
+    def update_progress(self, fraction):
+        self.progress_bar.set_fraction(fraction)
+        
+    def finish_export(self, error):
+        self.scrollback_export = None
+        if error:
+            self.progress_bar.set_text(_("Save failed: %s") % error)
+        else:
+            self.destroy()
+        
+    def cancel_export(self):
+        if self.scrollback_export:
+            self.scrollback_export.cancel()
+            self.scrollback_export = None
             
-        return True    
+        self.destroy()
+        
+        return True
     
-    def shape_search_bar(self, widget, rect):
-        if widget.get_has_window() and rect.width > 0 and rect.height > 0:
-            # Init.
-            x, y, w, h = rect.x, rect.y, rect.width, rect.height
-            bitmap = gtk.gdk.Pixmap(None, w, h, 1)
-            cr = bitmap.cairo_create()
-            
-            # Clear the bitmap
-            cr.set_source_rgb(0.0, 0.0, 0.0)
-            cr.set_operator(cairo.OPERATOR_CLEAR)
-            cr.paint()
-            
-            # Draw shape of search bar.
-            cr.set_source_rgb(1.0, 1.0, 1.0)
-            cr.set_operator(cairo.OPERATOR_OVER)
-            draw_round_rectangle(cr, x, y, w, h, self.radius)
-            cr.fill()
-                
-            # Shape with given mask.
-            widget.shape_combine_mask(bitmap, 0, 0)
-            
-    def key_press_search_bar(self, widget, event):
-        key_name = get_keyevent_name(event)
-        if key_name in self.keymap:
-            self.keymap[key_name]()
-            
-            return True
-        else:
-            return False
-
-gobject.type_register(SearchBar)
+gobject.type_register(ExportDialog)
 
 class HelperWindow(Window):
     '''
@@ -2208,10 +4909,7 @@ class HelperWindow(Window):
         container_remove_all(self.table_box)    
         
         def get_keybind(key_value):
-            try:
-                return setting_config.config.config_parser.get("keybind", key_value)
-            except:
-                return key_value
+            return get_config("keybind", key_value, key_value)
         
         first_table_key = [
             (_("Terminal command"), None),
@@ -2221,12 +4919,14 @@ class HelperWindow(Window):
             (_("Scroll page down"), "scroll_page_down"),
             (_("Search forward"), "search_forward"),
             (_("Search backward"), "search_backward"),
+            (_("Search all terminals"), "search_all_terminals"),
             (_("Select word"), _("Double click")),
             (_("Open"), _("Ctrl + Left click")),
             (_("Zoom out"), "zoom_out"),
             (_("Zoom in"), "zoom_in"),
             (_("Reset zoom"), "revert_default_size"),
             (_("Show correlative child window"), "show_correlative_window"),
+            (_("Save output"), "save_output"),
             ]
         
         second_table_key = [
@@ -2418,7 +5118,7 @@ class GeneralSettings(gtk.VBox):
         
         font_size = get_config("general", "font_size")
         self.font_size_widget = SpinBox(lower=1, step=1)
-        self.font_size_widget.set_value(int(font_size))
+        self.font_size_widget.set_value(font_size)
         self.font_size_widget.connect("value-changed", self.change_font_size)
         self.font_size_widget.value_entry.connect("changed", self.change_font_size)
         
@@ -2446,10 +5146,10 @@ class GeneralSettings(gtk.VBox):
         
         transparent = get_config("general", "background_transparent")
         self.background_transparent_widget = HScalebar(value_min=MIN_TRANSPARENT, value_max=1)
-        self.background_transparent_widget.set_value(float(transparent))
+        self.background_transparent_widget.set_value(transparent)
         self.background_transparent_widget.connect("value-changed", self.save_background_transparent)
         
-        display_background_image = is_bool(get_config("general", "background_image"))
+        display_background_image = get_config("general", "background_image")
         self.background_image_widget = SwitchButton(display_background_image)
         self.background_image_widget.connect("toggled", self.background_image_toggle)
         
@@ -2476,23 +5176,19 @@ class GeneralSettings(gtk.VBox):
         with save_config(setting_config):    
             setting_config.config.set("general", "background_image", str(toggle_button.get_active()))
         
-        global_event.emit("background-image-toggle", toggle_button.get_active())
-        
     def change_color_scheme(self, combo_box, option_name, option_value, index):
+        # Save scheme and its colors together, so color is applied once.
         with save_config(setting_config):    
             setting_config.config.set("general", "color_scheme", option_value)
         
+            if option_value != "custom" and color_style.has_key(option_value):
+                (_, [font_color, background_color]) = color_style[option_value]
+                setting_config.config.set("general", "font_color", font_color)
+                setting_config.config.set("general", "background_color", background_color)
+                
         if option_value != "custom" and color_style.has_key(option_value):
-            (_, [font_color, background_color]) = color_style[option_value]
-            
             self.font_color_widget.set_color(font_color)
             self.background_color_widget.set_color(background_color)
-            
-            with save_config(setting_config):    
-                setting_config.config.set("general", "font_color", font_color)
-                setting_config.config.set("general", "background_color", background_color)
-            
-            global_event.emit("change-color-scheme", option_value)
     
     def change_font_color(self, color_button, font_color):
         self.color_scheme_widget.set_select_index(
@@ -2501,8 +5197,6 @@ class GeneralSettings(gtk.VBox):
         with save_config(setting_config):    
             setting_config.config.set("general", "color_scheme", "custom")
             setting_config.config.set("general", "font_color", font_color)
-        
-        global_event.emit("change-font-color", font_color)
     
     def change_background_color(self, color_button, background_color):
         self.color_scheme_widget.set_select_index(
@@ -2512,26 +5206,18 @@ class GeneralSettings(gtk.VBox):
             setting_config.config.set("general", "color_scheme", "custom")
             setting_config.config.set("general", "background_color", background_color)
         
-        global_event.emit("change-background-color", background_color)
-        
     def change_font(self, combo_box, option_name, option_value, index):
         with save_config(setting_config):    
             setting_config.config.set("general", "font", option_value)
-        
-        global_event.emit("change-font", option_value)
     
     def change_font_size(self, spin, font_size):
         with save_config(setting_config):    
             setting_config.config.set("general", "font_size", font_size)
         
-        global_event.emit("change-font-size", font_size)
-        
     def save_background_transparent(self, scalebar, value):
         with save_config(setting_config):    
             setting_config.config.set("general", "background_transparent", value)
         
-        global_event.emit("change-background-transparent", value)
-        
     def fill_table(self, table, table_items):
         for (index, (setting_name, setting_widget)) in enumerate(table_items):
             table.attach(
@@ -2583,10 +5269,12 @@ class KeybindSettings(ScrolledWindow):
              ("switch_next_workspace", _("Next workspace")),
              ("search_forward", _("Search forward")),
              ("search_backward", _("Search backward")),
+             ("search_all_terminals", _("Search all terminals")),
              ("toggle_full_screen", _("Fullscreen")),
              ("show_helper_window", _("Display hotkeys")),
              ("show_remote_login_window", _("Set up SSH connection")),
              ("show_correlative_window", _("Show correlative child window")),
+             ("save_output", _("Save output")),
              ])
         
         self.table = gtk.Table(len(key_name_dict), 2)
@@ -2640,11 +5328,9 @@ class KeybindEntry(ShortcutKeyEntry):
         with save_config(setting_config):    
             setting_config.config.set("keybind", self.key_value, new_keybind)
         
-        global_event.emit("keybind-changed", self.key_value, new_keybind)
-        
 gobject.type_register(KeybindEntry)        
 
-class AdvancedSettings(gtk.VBox):
+class AdvancedSettings(ScrolledWindow):
     '''
     class docs
     '''
@@ -2653,7 +5339,8 @@ class AdvancedSettings(gtk.VBox):
         '''
         init docs
         '''
-        gtk.VBox.__init__(self)
+        ScrolledWindow.__init__(self)
+        self.box = gtk.VBox()
 
         startup_mode = get_config("advanced", "startup_mode")
         self.startup_widget = ComboBox(STARTUP_MODE_ITEMS, fixed_width=COMBO_BOX_WIDTH)
@@ -2675,7 +5362,7 @@ class AdvancedSettings(gtk.VBox):
         self.cursor_shape_widget.connect("item-selected", self.save_cursor_shape)
         self.cursor_shape_widget.set_select_index(unzip(CURSOR_SHAPE_ITEMS)[-1].index(cursor_shape))
         
-        ask_on_quit = is_bool(get_config("advanced", "ask_on_quit"))
+        ask_on_quit = get_config("advanced", "ask_on_quit")
         self.ask_on_quit_widget = SwitchButton(ask_on_quit)
         self.ask_on_quit_widget.connect("toggled", self.ask_on_quit_toggle)
         
@@ -2684,21 +5371,45 @@ class AdvancedSettings(gtk.VBox):
         self.cursor_blink_mode_widget.connect("item-selected", self.save_cursor_blink_mode)
         self.cursor_blink_mode_widget.set_select_index(unzip(CURSOR_BLINK_MODE_ITEMS)[-1].index(cursor_blink_mode))
 
-        scroll_on_key = is_bool(get_config("advanced", "scroll_on_key"))
+        scroll_on_key = get_config("advanced", "scroll_on_key")
         self.scroll_on_key_widget = SwitchButton(scroll_on_key)
         self.scroll_on_key_widget.connect("toggled", self.scroll_on_key_toggle)
         
-        scroll_on_output = is_bool(get_config("advanced", "scroll_on_output"))
+        scroll_on_output = get_config("advanced", "scroll_on_output")
         self.scroll_on_output_widget = SwitchButton(scroll_on_output)
         self.scroll_on_output_widget.connect("toggled", self.scroll_on_output_toggle)
         
-        copy_on_selection = is_bool(get_config("advanced", "copy_on_selection"))
+        copy_on_selection = get_config("advanced", "copy_on_selection")
         self.copy_on_selection_widget = SwitchButton(copy_on_selection)
         self.copy_on_selection_widget.connect("toggled", self.copy_on_selection_toggle)
         
-        self.table = gtk.Table(7, 2)
-        self.table.set_row_spacings(TABLE_ROW_SPACING)
-        self.table.set_col_spacing(0, TABLE_COLUMN_SPACING)
+        shell_pool_size = get_config("advanced", "shell_pool_size")
+        self.shell_pool_size_widget = SpinBox(lower=0, upper=SHELL_POOL_MAX_SIZE, step=1)
+        self.shell_pool_size_widget.set_value(shell_pool_size)
+        self.shell_pool_size_widget.connect("value-changed", self.save_shell_pool_size)
+        
+        scrollback_lines = get_config("advanced", "scrollback_lines")
+        self.scrollback_lines_widget = SpinBox(lower=0, upper=SCROLLBACK_MAX_LINES, step=1000)
+        self.scrollback_lines_widget.set_value(scrollback_lines)
+        self.scrollback_lines_widget.connect("value-changed", self.save_scrollback_lines)
+        
+        scrollback_archive = get_config("advanced", "scrollback_archive")
+        self.scrollback_archive_widget = SwitchButton(scrollback_archive)
+        self.scrollback_archive_widget.connect("toggled", self.scrollback_archive_toggle)
+        
+        memory_budget = get_config("advanced", "memory_budget")
+        self.memory_budget_widget = SpinBox(lower=0, upper=MEMORY_BUDGET_MAX_SIZE, step=128)
+        self.memory_budget_widget.set_value(memory_budget)
+        self.memory_budget_widget.connect("value-changed", self.save_memory_budget)
+        
+        session_log = get_config("advanced", "session_log")
+        self.session_log_widget = SwitchButton(session_log)
+        self.session_log_widget.connect("toggled", self.session_log_toggle)
+        
+        restore_session = get_config("advanced", "restore_session")
+        self.restore_session_widget = SwitchButton(restore_session)
+        self.restore_session_widget.connect("toggled", self.restore_session_toggle)
+        
         table_items = [
             (_("Cursor shape: "), self.cursor_shape_widget),
             (_("Cursor blink: "), self.cursor_blink_mode_widget),
@@ -2709,14 +5420,27 @@ class AdvancedSettings(gtk.VBox):
             (_("Scroll on keystroke: "), self.scroll_on_key_widget),
             (_("Scroll on output: "), self.scroll_on_output_widget),
             (_("Copy on selection: "), self.copy_on_selection_widget),
+            (_("Preforked shells: "), self.shell_pool_size_widget),
+            (_("Scrollback lines: "), self.scrollback_lines_widget),
+            (_("Archive scrollback: "), self.scrollback_archive_widget),
+            (_("Scrollback memory (MB): "), self.memory_budget_widget),
+            (_("Log new terminals: "), self.session_log_widget),
+            (_("Restore session: "), self.restore_session_widget),
             ]
+        self.table = gtk.Table(len(table_items), 2)
+        self.table.set_row_spacings(TABLE_ROW_SPACING)
+        self.table.set_col_spacing(0, TABLE_COLUMN_SPACING)
         self.table_align = gtk.Alignment()
         self.table_align.set(0, 0, 1, 1)
-        self.table_align.set_padding(TABLE_PADDING_TOP, TABLE_PADDING_BOTTOM, TABLE_PADDING_LEFT, 0)
+        self.table_align.set_padding(TABLE_PADDING_TOP, TABLE_PADDING_BOTTOM, TABLE_PADDING_LEFT, int(_("40")))
         
         self.fill_table(self.table, table_items)
         self.table_align.add(self.table)
-        self.add(self.table_align)
+        self.box.add(self.table_align)
+        self.add_with_viewport(self.box)
+        
+        # Rows don't fit in preference dialog, show first row when page is shown.
+        self.connect("hierarchy-changed", lambda w, t: self.get_vadjustment().set_value(0))
         
     def save_startup_setting(self, combo_box, option_name, option_value, index):
         with save_config(setting_config):    
@@ -2726,14 +5450,10 @@ class AdvancedSettings(gtk.VBox):
         with save_config(setting_config):    
             setting_config.config.set("advanced", "cursor_shape", option_value)
         
-        global_event.emit("set-cursor-shape", option_value)
-        
     def save_cursor_blink_mode(self, combo_box, option_name, option_value, index):
         with save_config(setting_config):
             setting_config.config.set("advanced", "cursor_blink_mode", option_value)
 
-        global_event.emit("set-cursor-blink-mode", option_value)
-
     def startup_command_changed(self, entry, startup_command):
         with save_config(setting_config):    
             setting_config.config.set("advanced", "startup_command", startup_command)
@@ -2749,20 +5469,38 @@ class AdvancedSettings(gtk.VBox):
     def scroll_on_key_toggle(self, toggle_button):
         with save_config(setting_config):    
             setting_config.config.set("advanced", "scroll_on_key", toggle_button.get_active())
-        
-        global_event.emit("scroll-on-key-toggle", toggle_button.get_active())
 
     def scroll_on_output_toggle(self, toggle_button):
         with save_config(setting_config):    
             setting_config.config.set("advanced", "scroll_on_output", toggle_button.get_active())
         
-        global_event.emit("scroll-on-output-toggle", toggle_button.get_active())
-        
     def copy_on_selection_toggle(self, toggle_button):
         with save_config(setting_config):
             setting_config.config.set("advanced", "copy_on_selection", toggle_button.get_active())
         
-        global_event.emit("copy-on-selection-toggle", toggle_button.get_active())
+    def save_shell_pool_size(self, spin, shell_pool_size):
+        with save_config(setting_config):
+            setting_config.config.set("advanced", "shell_pool_size", shell_pool_size)
+            
+    def save_scrollback_lines(self, spin, scrollback_lines):
+        with save_config(setting_config):
+            setting_config.config.set("advanced", "scrollback_lines", scrollback_lines)
+        
+    def scrollback_archive_toggle(self, toggle_button):
+        with save_config(setting_config):
+            setting_config.config.set("advanced", "scrollback_archive", toggle_button.get_active())
+            
+    def save_memory_budget(self, spin, memory_budget):
+        with save_config(setting_config):
+            setting_config.config.set("advanced", "memory_budget", memory_budget)
+            
+    def session_log_toggle(self, toggle_button):
+        with save_config(setting_config):
+            setting_config.config.set("advanced", "session_log", toggle_button.get_active())
+            
+    def restore_session_toggle(self, toggle_button):
+        with save_config(setting_config):
+            setting_config.config.set("advanced", "restore_session", toggle_button.get_active())
         
     def fill_table(self, table, table_items):
         for (index, (setting_name, setting_widget)) in enumerate(table_items):
@@ -2784,6 +5522,10 @@ class SettingConfig(gobject.GObject):
     class docs
     '''
 	
+    __gsignals__ = {
+        "changed" : (gobject.SIGNAL_RUN_LAST, gobject.TYPE_NONE, (gobject.TYPE_PYOBJECT,)),
+    }
+    
     def __init__(self):
         '''
         init docs
@@ -2798,6 +5540,163 @@ class SettingConfig(gobject.GObject):
             self.config = Config(self.config_path)
             self.config.load()
             
+        self.snapshot = self.build_snapshot()
+        
+        self.is_dirty = False
+        # Keys changed in this process but not written yet.
+        self.dirty_keys = set()
+        self.dirty_time = None
+        self.write_id = None
+        
+        # Watch config file with inotify (through gio), settings changed by other process apply at once.
+        self.file_content = self.read_config_file()
+        self.reload_id = None
+        self.file_monitor = gio.File(self.config_path).monitor_file()
+        self.file_monitor.connect("changed", self.config_file_changed)
+        
+    def read_config_file(self):
+        try:
+            with open(self.config_path) as config_file:
+                return config_file.read()
+        except IOError:
+            return None
+        
+    def config_file_changed(self, monitor, gfile, other_file, event_type):
+        # Only read file after it's written completely.
+        if event_type in [gio.FILE_MONITOR_EVENT_CHANGES_DONE_HINT, gio.FILE_MONITOR_EVENT_CREATED]:
+            if self.reload_id != None:
+                gobject.source_remove(self.reload_id)
+                
+            self.reload_id = gobject.timeout_add(CONFIG_RELOAD_DELAY, self.reload_timeout)
+            
+    def reload_timeout(self):
+        self.reload_id = None
+        self.reload()
+        
+        return False
+        
+    def reload(self):
+        '''
+        Reload config file changed by other process, "changed" signal is emitted with changed keys.
+        
+        Local changes that not written yet are applied on reloaded config,
+        so pending write keep changes of other process.
+        '''
+        # Nothing to do if it's our own write, or content is same.
+        content = self.read_config_file()
+        if content == None or content == self.file_content:
+            return
+        
+        config = Config(self.config_path)
+        try:
+            config.config_parser.readfp(StringIO.StringIO(content))
+        except Exception, e:
+            print "function reload got error: %s" % e
+            return
+        
+        for (selection, option) in self.dirty_keys:
+            if self.config.config_parser.has_option(selection, option):
+                if not config.config_parser.has_section(selection):
+                    config.config_parser.add_section(selection)
+                config.config_parser.set(selection, option, self.config.config_parser.get(selection, option))
+            elif config.config_parser.has_option(selection, option):
+                config.config_parser.remove_option(selection, option)
+            
+        self.config = config
+        self.file_content = content
+        
+        self.publish_snapshot()
+        
+    def schedule_write(self, changed_keys):
+        '''
+        Mark config dirty and write it after changes quiet down.
+        
+        @param changed_keys: Keys changed locally.
+        '''
+        self.dirty_keys |= changed_keys
+        if not self.is_dirty:
+            self.is_dirty = True
+            self.dirty_time = time.time()
+            
+        if self.write_id != None:
+            # Keep pending write if changes keep coming too long.
+            if time.time() - self.dirty_time > CONFIG_WRITE_MAX_DELAY:
+                return
+            
+            gobject.source_remove(self.write_id)
+            
+        self.write_id = gobject.timeout_add(CONFIG_WRITE_DELAY, self.write_timeout)
+        
+    def write_timeout(self):
+        self.write_id = None
+        self.write_config()
+        
+        return False
+        
+    def flush(self):
+        '''
+        Write pending changes at once, call this before quit.
+        '''
+        if self.write_id != None:
+            gobject.source_remove(self.write_id)
+            self.write_id = None
+            
+        if self.is_dirty:
+            self.write_config()
+            
+    def write_config(self):
+        # Write temp file and rename it, config file is never left half written.
+        try:
+            content_buffer = StringIO.StringIO()
+            self.config.config_parser.write(content_buffer)
+            content = content_buffer.getvalue()
+            
+            write_file_atomic(self.config_path, content, ".config.")
+        except Exception, e:
+            print "function write_config got error: %s" % e
+            traceback.print_exc(file=sys.stdout)
+        else:
+            self.is_dirty = False
+            self.dirty_keys = set()
+            self.file_content = content
+        
+    def build_snapshot(self):
+        values = {}
+        for (selection, options) in DEFAULT_CONFIG:
+            for (option, value) in options:
+                values[(selection, option)] = CONFIG_TYPES.get((selection, option), str)(value)
+                
+        config_parser = self.config.config_parser        
+        for selection in config_parser.sections():
+            for (option, value) in config_parser.items(selection):
+                key = (selection, option)
+                if key in CONFIG_TYPES:
+                    try:
+                        values[key] = CONFIG_TYPES[key](value)
+                    except (ValueError, TypeError, AttributeError):
+                        print "Invalid config %s/%s: %s, use default value instead." % (selection, option, value)
+                else:
+                    values[key] = value
+                    
+        return ConfigSnapshot(values)
+    
+    def publish_snapshot(self):
+        '''
+        Replace snapshot with current config, and emit "changed" signal with changed keys.
+        
+        Both local changes and changes reloaded from other process go through here.
+        
+        @return: Return set of changed keys.
+        '''
+        snapshot = self.build_snapshot()
+        changed_keys = snapshot.get_changed_keys(self.snapshot)
+        self.snapshot = snapshot
+        
+        if len(changed_keys) > 0:
+            self.emit("changed", changed_keys)
+        
+        return changed_keys
+            
 gobject.type_register(SettingConfig)        
 
 @contextmanager
@@ -2814,20 +5713,16 @@ def save_config(setting_config):
         print 'function save_config got error: %s' % e  
         traceback.print_exc(file=sys.stdout)
     else:  
-        # Save setting config last.
-        setting_config.config.write()
+        # Write config file later and merge burst changes, new values are visible at once through snapshot.
+        setting_config.schedule_write(setting_config.publish_snapshot())
         
 def get_config(selection, option, default=None):
-    try:
-        return setting_config.config.config_parser.get(selection, option)
-    except:
-        try:
-            if default:
-                return default
-            else:
-                return dict(dict(DEFAULT_CONFIG)[selection])[option]
-        except:
-            raise "This is a buf of get_config(%s, %s, %s)" % (selection, option, default)
+    '''
+    Get typed config value from current snapshot.
+    
+    @return: Return bool, int or float value for typed options, otherwise return string. 
+    '''
+    return setting_config.snapshot.get(selection, option, default)
         
 class EditRemoteLogin(DialogBox):
     '''
@@ -3072,7 +5967,7 @@ class RemoteLogin(DialogBox):
     def connect_remote_login(self):
         if len(self.treeview.select_rows) == 1:
             text_item = self.treeview.visible_items[self.treeview.select_rows[0]]
-            global_event.emit("ssh-login", text_item.user, text_item.server, text_item.password, text_item.port)
+            global_event.emit("ssh-login", self.parent_window, text_item.user, text_item.server, text_item.password, text_item.port)
             
             self.hide_all()
         
@@ -3148,6 +6043,35 @@ gobject.type_register(TextItem)
 
 setting_config = SettingConfig()
 
+# Global event of config option, it's emitted when config changed by this process or other process.
+CONFIG_EVENTS = {
+    ("general", "font") : "change-font",
+    ("general", "font_size") : "change-font-size",
+    ("general", "background_transparent") : "change-background-transparent",
+    ("general", "background_image") : "background-image-toggle",
+    ("advanced", "cursor_shape") : "set-cursor-shape",
+    ("advanced", "cursor_blink_mode") : "set-cursor-blink-mode",
+    ("advanced", "scroll_on_key") : "scroll-on-key-toggle",
+    ("advanced", "scroll_on_output") : "scroll-on-output-toggle",
+    ("advanced", "copy_on_selection") : "copy-on-selection-toggle",
+    ("advanced", "scrollback_lines") : "set-scrollback-lines",
+    }
+
+def emit_config_events(setting_config, changed_keys):
+    for key in changed_keys:
+        (selection, option) = key
+        if key in CONFIG_EVENTS:
+            global_event.emit(CONFIG_EVENTS[key], get_config(selection, option))
+        elif selection == "keybind":
+            global_event.emit("keybind-changed", option, get_config(selection, option))
+            
+    # Color scheme, font color and background color are applied together.
+    color_keys = set([("general", "color_scheme"), ("general", "font_color"), ("general", "background_color")])
+    if len(color_keys & changed_keys) > 0:
+        global_event.emit("change-color-scheme", get_config("general", "color_scheme"))
+        
+setting_config.connect("changed", emit_config_events)
+
 class Paned(gtk.Paned):
     '''
     class docs
@@ -3224,35 +6148,28 @@ class SettingDialog(PreferenceDialog):
             (_, [font_color, background_color]) = color_style[config_dict["color_scheme"]]
                     
             font = config_dict["font"]
-            global_event.emit("change-font", font)
             font_families = get_font_families()
             page_widget.font_widget.set_select_index(font_families.index(font))
             
             font_size = int(config_dict["font_size"])
-            global_event.emit("change-font-size", font_size)
             page_widget.font_size_widget.set_value(font_size)
             
             color_scheme = config_dict["color_scheme"]
-            global_event.emit("change-color-scheme", color_scheme)
             page_widget.color_scheme_widget.set_select_index(
                 map(lambda (color_scheme_value, color_infos): color_scheme_value, color_style.items()).index(color_scheme))
             
-            global_event.emit("change-font-color", font_color)
             page_widget.font_color_widget.set_color(font_color)
-            
-            global_event.emit("change-background-color", background_color)
             page_widget.background_color_widget.set_color(background_color)
             
             background_transparent = float(config_dict["background_transparent"])
-            global_event.emit("change-background-transparent", background_transparent)
             page_widget.background_transparent_widget.set_value(background_transparent)
             
             background_image = is_bool(config_dict["background_image"])
-            global_event.emit("background-image-toggle", background_image)
             page_widget.background_image_widget.set_active(background_image)
         elif isinstance(page_widget, KeybindSettings):
             with save_config(setting_config):
                 for (config_key, config_value) in KEYBIND_CONFIG:
+                    setting_config.config.set("keybind", config_key, config_value)
                     page_widget.entry_widget_dict[config_key].set_shortcut_key(config_value)
                     
         elif isinstance(page_widget, AdvancedSettings):
@@ -3273,7 +6190,6 @@ class SettingDialog(PreferenceDialog):
             
             cursor_shape = config_dict["cursor_shape"]
             page_widget.cursor_shape_widget.set_select_index(unzip(CURSOR_SHAPE_ITEMS)[-1].index(cursor_shape))
-            global_event.emit("set-cursor-shape", cursor_shape)
             
             ask_on_quit = is_bool(config_dict["ask_on_quit"])
             page_widget.ask_on_quit_widget.set_active(ask_on_quit)
@@ -3281,32 +6197,37 @@ class SettingDialog(PreferenceDialog):
             cursor_blink_mode = config_dict["cursor_blink_mode"]
             page_widget.cursor_blink_mode_widget.set_select_index(
                 unzip(CURSOR_BLINK_MODE_ITEMS)[-1].index(cursor_blink_mode))
-            global_event.emit("set-cursor-blink-mode", cursor_blink_mode)
             
             scroll_on_key = is_bool(config_dict["scroll_on_key"])
             page_widget.scroll_on_key_widget.set_active(scroll_on_key)
-            global_event.emit("scroll-on-key-toggle", scroll_on_key)
             
             scroll_on_output = is_bool(config_dict["scroll_on_output"])
             page_widget.scroll_on_output_widget.set_active(scroll_on_output)
-            global_event.emit("scroll-on-output-toggle", scroll_on_output)
 
             copy_on_selection = is_bool(config_dict["copy_on_selection"])
             page_widget.copy_on_selection_widget.set_active(copy_on_selection)
-            global_event.emit("copy-on-selection-toggle", copy_on_selection)
+            
+            shell_pool_size = int(config_dict["shell_pool_size"])
+            page_widget.shell_pool_size_widget.set_value(shell_pool_size)
+            
+            scrollback_lines = int(config_dict["scrollback_lines"])
+            page_widget.scrollback_lines_widget.set_value(scrollback_lines)
+            
+            scrollback_archive = is_bool(config_dict["scrollback_archive"])
+            page_widget.scrollback_archive_widget.set_active(scrollback_archive)
+            
+            memory_budget = int(config_dict["memory_budget"])
+            page_widget.memory_budget_widget.set_value(memory_budget)
+            
+            session_log = is_bool(config_dict["session_log"])
+            page_widget.session_log_widget.set_active(session_log)
+            
+            restore_session = is_bool(config_dict["restore_session"])
+            page_widget.restore_session_widget.set_active(restore_session)
 
 gobject.type_register(SettingDialog)        
 
 if __name__ == "__main__":
-    quake_mode = "--quake-mode" in sys.argv
-    opts, args = getopt.getopt(sys.argv[1:], "", ["quake-mode", "working-directory="])  
-    quake_mode = False
-    working_directory = None
-    for (option_name, option_value) in opts:
-        if option_name == "--quake-mode":
-            quake_mode = True
-        elif option_name == "--working-directory":
-            working_directory = option_value
-            
-    if (not quake_mode) or (not is_exists(APP_DBUS_NAME, APP_OBJECT_NAME)):
-        Terminal(quake_mode, working_directory).run()
+    (quake_mode, working_directory, standalone) = parse_options(sys.argv[1:])
+    if quake_mode or standalone or not open_in_running_server(working_directory):
+        start(quake_mode, working_directory, standalone)
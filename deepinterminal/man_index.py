@@ -0,0 +1,230 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+#
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import json
+import os
+import subprocess
+import threading
+import time
+
+from file_utils import write_file_atomic
+
+DEFAULT_MAN_PATHS = ["/usr/local/share/man", "/usr/share/man", "/usr/local/man", "/usr/man"]
+COMPRESS_EXTENSIONS = [".gz", ".bz2", ".xz", ".lzma", ".Z"]
+
+def get_man_paths():
+    '''
+    Get man page directories, same as `man` searching.
+
+    @return: Return list of man directories.
+    '''
+    try:
+        process = subprocess.Popen(["manpath", "-q"], stdout=subprocess.PIPE, stderr=open(os.devnull, "w"))
+        output = process.communicate()[0].strip()
+        if process.returncode == 0 and output:
+            return output.split(":")
+    except OSError:
+        pass
+
+    # Empty MANPATH component means default directories.
+    man_paths = []
+    for man_path in os.environ.get("MANPATH", "").split(":"):
+        if man_path:
+            man_paths.append(man_path)
+        else:
+            man_paths += DEFAULT_MAN_PATHS
+
+    return man_paths or DEFAULT_MAN_PATHS
+
+def get_page_keys(filename):
+    '''
+    Get page keys from man file name, such as 'ls.1.gz' to ['ls.1'].
+
+    Key of page in sub section, such as 'printf.3posix', also has key of main section 'printf.3',
+    because `man 3 printf` find it too.
+    '''
+    for extension in COMPRESS_EXTENSIONS:
+        if filename.endswith(extension):
+            filename = filename[:-len(extension)]
+            break
+
+    if "." not in filename:
+        return []
+
+    (name, section) = filename.rsplit(".", 1)
+    if len(section) > 1:
+        return [filename, "%s.%s" % (name, section[0])]
+    else:
+        return [filename]
+
+def split_page_key(page_key):
+    '''
+    Split page key to (name, section), name maybe include '.', section never.
+    '''
+    return tuple(page_key.rsplit(".", 1))
+
+class ManIndex(object):
+    '''
+    Index of man page names, make MATCH_COMMAND detection just dictionary lookup.
+
+    Index is scan in worker thread, section directories that mtime not changed reuse names in cache file,
+    so refresh after first time just need stat some directories.
+    '''
+
+    def __init__(self, index_path, render_dir, refresh_interval=60):
+        '''
+        Init ManIndex class.
+
+        @param index_path: Cache file of man page index.
+        @param render_dir: Directory to cache rendered man text.
+        @param refresh_interval: Minimum seconds between two refresh.
+        '''
+        self.index_path = index_path
+        self.render_dir = render_dir
+        self.refresh_interval = refresh_interval
+
+        # Dict that key is page key 'name.section' and value is man file path, replace whole dict when refresh.
+        self.page_paths = {}
+        # Dict that key is section directory and value is [mtime, filenames].
+        self.directory_cache = None
+        self.refresh_time = 0
+        self.refresh_thread = None
+        self.render_names = set()
+        self.render_lock = threading.Lock()
+
+    def has_page(self, page_key):
+        '''
+        Whether man page of page key exists, such as 'printf.3'.
+
+        Return False before index finish loading, and refresh index if page missing, maybe new package installed.
+        '''
+        if page_key in self.page_paths:
+            return True
+        else:
+            if time.time() - self.refresh_time > self.refresh_interval:
+                self.refresh()
+
+            return False
+
+    def refresh(self):
+        '''
+        Refresh index in background thread.
+        '''
+        if self.refresh_thread == None or not self.refresh_thread.is_alive():
+            self.refresh_time = time.time()
+            self.refresh_thread = threading.Thread(target=self.scan)
+            self.refresh_thread.setDaemon(True)
+            self.refresh_thread.start()
+
+    def load_cache(self):
+        try:
+            with open(self.index_path) as index_file:
+                return json.load(index_file)
+        except (IOError, ValueError):
+            return {}
+
+    def scan(self):
+        try:
+            if self.directory_cache == None:
+                self.directory_cache = self.load_cache()
+
+            directory_cache = {}
+            page_paths = {}
+            for man_path in get_man_paths():
+                try:
+                    section_names = sorted(os.listdir(man_path))
+                except OSError:
+                    continue
+
+                for section_name in section_names:
+                    if not (section_name.startswith("man") or section_name.startswith("cat")):
+                        continue
+
+                    section_dir = os.path.join(man_path, section_name)
+                    try:
+                        mtime = os.stat(section_dir).st_mtime
+                        if section_dir in self.directory_cache and self.directory_cache[section_dir][0] == mtime:
+                            filenames = self.directory_cache[section_dir][1]
+                        else:
+                            filenames = os.listdir(section_dir)
+                    except OSError:
+                        continue
+
+                    directory_cache[section_dir] = [mtime, filenames]
+                    for filename in filenames:
+                        for page_key in get_page_keys(filename):
+                            if page_key not in page_paths:
+                                page_paths[page_key] = os.path.join(section_dir, filename)
+
+            self.page_paths = page_paths
+
+            if directory_cache != self.directory_cache:
+                self.directory_cache = directory_cache
+                write_file_atomic(self.index_path, json.dumps(directory_cache))
+        except Exception, e:
+            print "function scan got error: %s" % e
+
+    def get_render_path(self, page_key):
+        '''
+        Get rendered man text of page key, pages of same name in different sections are cached separately.
+
+        @return: Return path of rendered text, return None if not render yet or man page updated after render.
+        '''
+        if page_key in self.page_paths:
+            render_path = os.path.join(self.render_dir, page_key)
+            try:
+                if os.stat(render_path).st_mtime >= os.stat(self.page_paths[page_key]).st_mtime:
+                    return render_path
+            except OSError:
+                pass
+
+        return None
+
+    def render(self, page_key):
+        '''
+        Render man page of page key to cache in background thread.
+        '''
+        if page_key in self.page_paths and self.get_render_path(page_key) == None:
+            with self.render_lock:
+                if page_key in self.render_names:
+                    return
+                self.render_names.add(page_key)
+
+            thread = threading.Thread(target=self.render_page, args=(page_key,))
+            thread.setDaemon(True)
+            thread.start()
+
+    def render_page(self, page_key):
+        try:
+            # Keep bold and underline for pager, same as man output in terminal.
+            env = dict(os.environ, MAN_KEEP_FORMATTING="1", MANWIDTH="80")
+            (name, section) = split_page_key(page_key)
+            process = subprocess.Popen(["man", section, name], stdout=subprocess.PIPE, stderr=open(os.devnull, "w"), env=env)
+            output = process.communicate()[0]
+            if process.returncode == 0 and output:
+                write_file_atomic(os.path.join(self.render_dir, page_key), output)
+        except Exception, e:
+            print "function render_page got error: %s" % e
+        finally:
+            with self.render_lock:
+                self.render_names.discard(page_key)
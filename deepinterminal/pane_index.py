@@ -0,0 +1,162 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+#
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import bisect
+
+DIRECTION_UP = 0
+DIRECTION_DOWN = 1
+DIRECTION_LEFT = 2
+DIRECTION_RIGHT = 3
+
+class PaneIndex(object):
+    '''
+    Spatial index of panes in workspace, find nearest pane in given direction.
+
+    For every direction, panes are grouped by edge facing that direction, edges are sorted,
+    and panes with same edge are sorted by start in perpendicular axis.
+    Lookup bisect to nearest edge, then bisect panes overlap with given pane in that edge.
+
+    Panes of split tree tile workspace, so nearest edge that has overlapping pane is within tolerance,
+    and lookup is O(log n + k), k is number of overlapping panes.
+    For panes that don't tile, lookup go through farther edges until overlapping pane found, that is O(n) at worst.
+    Result is cached until index rebuild.
+    '''
+
+    def __init__(self, pane_rects, tolerance=0):
+        '''
+        Init PaneIndex class.
+
+        @param pane_rects: List of (pane, (x, y, width, height)).
+        @param tolerance: Edge distance difference in tolerance pixels is treat as same,
+        it cover paned handle and rounding of paned position.
+        '''
+        self.panes = map(lambda (pane, rect): pane, pane_rects)
+        self.rects = map(lambda (pane, rect): rect, pane_rects)
+        self.pane_indexes = dict(map(lambda (index, pane): (pane, index), enumerate(self.panes)))
+        self.tolerance = tolerance
+        self.neighbour_cache = {}
+
+        # Distance from pane to candidate is key of candidate minus origin of pane.
+        self.direction_keys = {}
+        # Key is edge, value is (starts, indexes, max_length), sorted by start in perpendicular axis.
+        self.direction_buckets = {}
+        for direction in [DIRECTION_UP, DIRECTION_DOWN, DIRECTION_LEFT, DIRECTION_RIGHT]:
+            spans = {}
+            for (index, rect) in enumerate(self.rects):
+                (start, length) = self.get_span(direction, rect)
+                spans.setdefault(self.get_key(direction, rect), []).append((start, index, length))
+
+            buckets = {}
+            for (key, key_spans) in spans.items():
+                key_spans.sort()
+                buckets[key] = (map(lambda (start, index, length): start, key_spans),
+                                map(lambda (start, index, length): index, key_spans),
+                                max(map(lambda (start, index, length): length, key_spans)))
+
+            self.direction_keys[direction] = sorted(buckets.keys())
+            self.direction_buckets[direction] = buckets
+
+    def get_key(self, direction, (x, y, w, h)):
+        if direction == DIRECTION_UP:
+            return -(y + h)
+        elif direction == DIRECTION_DOWN:
+            return y
+        elif direction == DIRECTION_LEFT:
+            return -(x + w)
+        else:
+            return x
+
+    def get_origin(self, direction, (x, y, w, h)):
+        if direction == DIRECTION_UP:
+            return -y
+        elif direction == DIRECTION_DOWN:
+            return y + h
+        elif direction == DIRECTION_LEFT:
+            return -x
+        else:
+            return x + w
+
+    def get_span(self, direction, (x, y, w, h)):
+        '''
+        Get (start, length) of rectangle in axis perpendicular to direction.
+        '''
+        if direction in [DIRECTION_UP, DIRECTION_DOWN]:
+            return (x, w)
+        else:
+            return (y, h)
+
+    def find_neighbour(self, pane, direction):
+        '''
+        Find nearest pane in direction.
+
+        Pane must be on that side and overlap with given pane in perpendicular axis,
+        nearest edge win, then longest overlap, then nearest center.
+
+        @param pane: Pane in index.
+        @param direction: DIRECTION_UP, DIRECTION_DOWN, DIRECTION_LEFT or DIRECTION_RIGHT.
+
+        @return: Return neighbour pane, return None if no pane in that direction.
+        '''
+        if pane not in self.pane_indexes:
+            return None
+
+        if (pane, direction) not in self.neighbour_cache:
+            index = self.pane_indexes[pane]
+            rect = self.rects[index]
+            origin = self.get_origin(direction, rect)
+            (start, length) = self.get_span(direction, rect)
+            keys = self.direction_keys[direction]
+            buckets = self.direction_buckets[direction]
+
+            neighbour_index = None
+            neighbour_distance = None
+            neighbour_score = None
+            for key_index in xrange(bisect.bisect_left(keys, origin - self.tolerance), len(keys)):
+                key = keys[key_index]
+                distance = key - origin
+                if neighbour_distance != None and distance > neighbour_distance + self.tolerance:
+                    break
+
+                # Candidates start before end of pane, and end after start of pane.
+                (starts, indexes, max_length) = buckets[key]
+                candidate_position = bisect.bisect_left(starts, start + length) - 1
+                while candidate_position >= 0 and starts[candidate_position] + max_length > start:
+                    candidate_index = indexes[candidate_position]
+                    (candidate_start, candidate_length) = self.get_span(direction, self.rects[candidate_index])
+                    overlap = min(start + length, candidate_start + candidate_length) - max(start, candidate_start)
+                    if candidate_index != index and overlap > 0:
+                        score = (overlap, -abs((start * 2 + length) - (candidate_start * 2 + candidate_length)))
+                        if neighbour_score == None or score > neighbour_score:
+                            if neighbour_distance == None:
+                                neighbour_distance = distance
+                            neighbour_index = candidate_index
+                            neighbour_score = score
+
+                    candidate_position -= 1
+
+            if neighbour_index == None:
+                self.neighbour_cache[(pane, direction)] = None
+            else:
+                self.neighbour_cache[(pane, direction)] = self.panes[neighbour_index]
+
+        return self.neighbour_cache[(pane, direction)]
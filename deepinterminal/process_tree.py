@@ -0,0 +1,109 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+#
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+class ProcessTree(object):
+    '''
+    Snapshot of process tree, read /proc once and answer questions of all terminals.
+    '''
+
+    def __init__(self, proc_dir="/proc"):
+        '''
+        Init ProcessTree class.
+
+        @param proc_dir: Directory of proc filesystem.
+        '''
+        # Value is (command_name, parent_pid, process_group, foreground_process_group).
+        self.process_infos = {}
+        self.process_children = {}
+
+        for entry in os.listdir(proc_dir):
+            if entry.isdigit():
+                try:
+                    with open(os.path.join(proc_dir, entry, "stat")) as stat_file:
+                        stat = stat_file.read()
+                except IOError:
+                    # Process exit when we read it.
+                    continue
+
+                # Command name may include space and parenthesis, so split fields after last ')'.
+                command_name = stat[stat.find("(") + 1:stat.rfind(")")]
+                fields = stat[stat.rfind(")") + 2:].split()
+                pid = int(entry)
+                parent_pid = int(fields[1])
+                process_group = int(fields[2])
+                foreground_process_group = int(fields[5])
+
+                self.process_infos[pid] = (command_name, parent_pid, process_group, foreground_process_group)
+                self.process_children.setdefault(parent_pid, []).append(pid)
+
+    def get_children(self, pid):
+        return self.process_children.get(pid, [])
+
+    def get_descendants(self, pid):
+        '''
+        Get all descendant processes.
+
+        @param pid: Process id.
+
+        @return: Return set of descendant process ids, not include given pid.
+        '''
+        descendants = set()
+        pids = [pid]
+        while len(pids) > 0:
+            for child_pid in self.get_children(pids.pop()):
+                if child_pid not in descendants:
+                    descendants.add(child_pid)
+                    pids.append(child_pid)
+
+        return descendants
+
+    def get_command_name(self, pid):
+        if pid in self.process_infos:
+            return self.process_infos[pid][0]
+        else:
+            return None
+
+    def get_job(self, pid):
+        '''
+        Get job running in shell.
+
+        @param pid: Process id of shell.
+
+        @return: Return (job_pid, job_name) of foreground job, or first child if no foreground job,
+        return None if shell is idle.
+        '''
+        if pid not in self.process_infos:
+            return None
+
+        (command_name, parent_pid, process_group, foreground_process_group) = self.process_infos[pid]
+        if foreground_process_group > 0 and foreground_process_group != process_group:
+            job_name = self.get_command_name(foreground_process_group)
+            if job_name:
+                return (foreground_process_group, job_name)
+
+        children = self.get_children(pid)
+        if len(children) > 0:
+            return (children[0], self.get_command_name(children[0]))
+        else:
+            return None
@@ -0,0 +1,149 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+#
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import atexit
+import mmap
+import os
+import tempfile
+import weakref
+import zlib
+
+ARCHIVE_BLOCK_LINES = 1000
+
+live_archives = weakref.WeakSet()
+
+class ScrollbackArchive(object):
+    '''
+    Append-only archive of scrollback lines that vte drop from memory.
+
+    Lines are compressed by blocks with zlib, block index (first row, offset, length) is kept in memory,
+    and archive file is memory-mapped when read blocks.
+    '''
+
+    def __init__(self, archive_dir, block_lines=ARCHIVE_BLOCK_LINES):
+        '''
+        Init ScrollbackArchive class.
+
+        @param archive_dir: Directory to create archive file.
+        @param block_lines: Number of lines in one compressed block.
+        '''
+        if not os.path.exists(archive_dir):
+            os.makedirs(archive_dir)
+
+        (fd, self.path) = tempfile.mkstemp(prefix="scrollback-", dir=archive_dir)
+        self.archive_file = os.fdopen(fd, "w+b")
+        self.block_lines = block_lines
+        self.blocks = []
+        # Lines not compressed yet, value is (row, line).
+        self.pending_lines = []
+        self.line_count = 0
+        self.file_size = 0
+        self.mmap = None
+
+        live_archives.add(self)
+
+    def append_lines(self, lines):
+        '''
+        Append lines to archive.
+
+        @param lines: List of (row, line), line is unicode without newline.
+        '''
+        self.pending_lines += lines
+        self.line_count += len(lines)
+        while len(self.pending_lines) >= self.block_lines:
+            self.write_block(self.pending_lines[:self.block_lines])
+            self.pending_lines = self.pending_lines[self.block_lines:]
+
+    def write_block(self, lines):
+        data = zlib.compress(u"\n".join(map(lambda (row, line): u"%s\t%s" % (row, line), lines)).encode("utf-8"))
+        self.archive_file.seek(0, os.SEEK_END)
+        self.archive_file.write(data)
+        self.archive_file.flush()
+
+        self.blocks.append((lines[0][0], self.file_size, len(data)))
+        self.file_size += len(data)
+
+    def get_block_count(self):
+        return len(self.blocks)
+
+    def get_first_row(self):
+        if len(self.blocks) > 0:
+            return self.blocks[0][0]
+        elif len(self.pending_lines) > 0:
+            return self.pending_lines[0][0]
+        else:
+            return None
+
+    def get_pending_lines(self):
+        return list(self.pending_lines)
+
+    def get_size(self):
+        '''
+        Get size of archive in bytes, include lines not compressed yet.
+        '''
+        return self.file_size + sum(map(lambda (row, line): len(line), self.pending_lines))
+
+    def read_block(self, index):
+        '''
+        Read lines of block.
+
+        @param index: Index of block.
+
+        @return: Return list of (row, line).
+        '''
+        (first_row, offset, length) = self.blocks[index]
+        if self.mmap == None or len(self.mmap) < offset + length:
+            if self.mmap:
+                self.mmap.close()
+            self.mmap = mmap.mmap(self.archive_file.fileno(), self.file_size, access=mmap.ACCESS_READ)
+
+        lines = []
+        for text in zlib.decompress(self.mmap[offset:offset + length]).decode("utf-8").split(u"\n"):
+            (row, line) = text.split(u"\t", 1)
+            lines.append((int(row), line))
+
+        return lines
+
+    def close(self):
+        '''
+        Close and remove archive file.
+        '''
+        if self in live_archives:
+            live_archives.discard(self)
+
+            if self.mmap:
+                self.mmap.close()
+                self.mmap = None
+            self.archive_file.close()
+
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+def close_live_archives():
+    for archive in list(live_archives):
+        archive.close()
+
+# Terminals are not closed one by one when application quit, remove their archive files here.
+atexit.register(close_live_archives)
@@ -0,0 +1,210 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+#
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import Queue
+import atexit
+import gzip
+import os
+import shutil
+import threading
+import time
+
+SESSION_LOG_QUEUE_SIZE = 1024
+SESSION_LOG_BUFFER_SIZE = 64 * 1024
+SESSION_LOG_MAX_SIZE = 16 * 1024 * 1024
+SESSION_LOG_MAX_AGE = 24 * 60 * 60  # seconds
+SESSION_LOG_FLUSH_INTERVAL = 1      # seconds
+
+class SessionLog(object):
+    '''
+    Log file of one terminal.
+
+    Attributes without 'writer' comment are only changed by GTK thread, others are only changed by writer thread.
+    '''
+
+    def __init__(self, path):
+        '''
+        Init SessionLog class.
+
+        @param path: Path of log file, rotated files are named as path.TIME.gz or path.TIME-COUNT.gz.
+        '''
+        self.path = path
+        self.is_closed = False
+        self.dropped_bytes = 0
+        self.put_count = 0
+
+        # Writer.
+        self.log_file = None
+        self.file_size = 0
+        self.open_time = 0
+        self.write_count = 0
+
+class SessionLogWriter(object):
+    '''
+    Write session logs of all terminals in background thread.
+
+    Data pass through bounded queue, and GTK thread never wait for disk,
+    data is dropped and counted when queue is full.
+    '''
+
+    def __init__(self):
+        '''
+        Init SessionLogWriter class.
+        '''
+        self.queue = Queue.Queue(SESSION_LOG_QUEUE_SIZE)
+        self.logs = []
+        self.thread = None
+        self.is_stopped = False
+
+    def write(self, session_log, data):
+        '''
+        Put data to write queue, don't block.
+
+        @return: Return False if queue is full and data is dropped.
+        '''
+        if self.thread == None:
+            self.thread = threading.Thread(target=self.write_loop)
+            self.thread.setDaemon(True)
+            self.thread.start()
+
+        if session_log.dropped_bytes > 0:
+            notice = "\n[deepin-terminal: %s bytes of output dropped]\n" % session_log.dropped_bytes
+            if not self.put(session_log, notice):
+                session_log.dropped_bytes += len(data)
+                return False
+
+            print "Session log %s dropped %s bytes" % (session_log.path, session_log.dropped_bytes)
+            session_log.dropped_bytes = 0
+
+        if self.put(session_log, data):
+            return True
+        else:
+            session_log.dropped_bytes += len(data)
+            return False
+
+    def put(self, session_log, data):
+        try:
+            self.queue.put_nowait((session_log, data))
+            session_log.put_count += 1
+            return True
+        except Queue.Full:
+            return False
+
+    def close(self, session_log):
+        '''
+        Close log, log file is closed after all data written.
+        '''
+        session_log.is_closed = True
+
+    def write_loop(self):
+        while True:
+            try:
+                (session_log, data) = self.queue.get(timeout=SESSION_LOG_FLUSH_INTERVAL)
+            except Queue.Empty:
+                self.check_logs()
+
+                if self.is_stopped:
+                    break
+                else:
+                    continue
+
+            try:
+                self.write_data(session_log, data)
+            except (IOError, OSError), e:
+                print "function write_loop got error: %s" % e
+            session_log.write_count += 1
+
+            if session_log.is_closed and session_log.write_count == session_log.put_count:
+                self.close_file(session_log)
+
+    def write_data(self, session_log, data):
+        if session_log.log_file == None:
+            log_dir = os.path.dirname(session_log.path)
+            if not os.path.exists(log_dir):
+                os.makedirs(log_dir)
+
+            session_log.log_file = open(session_log.path, "ab", SESSION_LOG_BUFFER_SIZE)
+            session_log.file_size = os.path.getsize(session_log.path)
+            session_log.open_time = time.time()
+            self.logs.append(session_log)
+
+        session_log.log_file.write(data)
+        session_log.file_size += len(data)
+
+        if session_log.file_size >= SESSION_LOG_MAX_SIZE:
+            self.rotate(session_log)
+
+    def check_logs(self):
+        for session_log in list(self.logs):
+            try:
+                if session_log.is_closed and session_log.write_count == session_log.put_count:
+                    self.close_file(session_log)
+                elif time.time() - session_log.open_time >= SESSION_LOG_MAX_AGE:
+                    self.rotate(session_log)
+                else:
+                    session_log.log_file.flush()
+            except (IOError, OSError), e:
+                print "function check_logs got error: %s" % e
+
+    def close_file(self, session_log):
+        if session_log.log_file:
+            session_log.log_file.close()
+            session_log.log_file = None
+            self.logs.remove(session_log)
+
+    def rotate(self, session_log):
+        '''
+        Rename log file with time suffix and compress it with gzip, next write will create new log file.
+        '''
+        self.close_file(session_log)
+
+        # Add counter when log rotate more than once in one second, don't overwrite previous rotated file.
+        rotate_base = "%s.%s" % (session_log.path, time.strftime("%Y%m%d-%H%M%S"))
+        rotate_path = rotate_base
+        rotate_count = 0
+        while os.path.exists(rotate_path) or os.path.exists(rotate_path + ".gz"):
+            rotate_count += 1
+            rotate_path = "%s-%s" % (rotate_base, rotate_count)
+        os.rename(session_log.path, rotate_path)
+        with open(rotate_path, "rb") as rotate_file:
+            gzip_file = gzip.open(rotate_path + ".gz", "wb")
+            try:
+                shutil.copyfileobj(rotate_file, gzip_file)
+            finally:
+                gzip_file.close()
+        os.remove(rotate_path)
+
+    def stop(self, timeout=5):
+        '''
+        Write data in queue and close all log files, wait writer thread at most timeout seconds.
+        '''
+        if self.thread:
+            for session_log in list(self.logs):
+                session_log.is_closed = True
+
+            self.is_stopped = True
+            self.thread.join(timeout)
+
+session_log_writer = SessionLogWriter()
+
+atexit.register(session_log_writer.stop)
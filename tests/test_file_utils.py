@@ -0,0 +1,54 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "deepinterminal"))
+
+from file_utils import ExportFile
+
+CONTENT = "".join(map(lambda index: "line %s\n" % index, range(1000)))
+
+class TestExportFile(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_export_gzip(self):
+        path = os.path.join(self.directory, "output.txt.gz")
+        export_file = ExportFile(path)
+        export_file.write(CONTENT[:100])
+        export_file.write(CONTENT[100:])
+        export_file.commit()
+
+        with gzip.open(path) as gzip_file:
+            self.assertEqual(gzip_file.read(), CONTENT)
+        self.assertEqual(os.listdir(self.directory), ["output.txt.gz"])
+
+    def test_export_plain(self):
+        path = os.path.join(self.directory, "output.txt")
+        export_file = ExportFile(path)
+        export_file.write(CONTENT)
+        export_file.commit()
+
+        with open(path) as plain_file:
+            self.assertEqual(plain_file.read(), CONTENT)
+
+    def test_abort(self):
+        path = os.path.join(self.directory, "output.txt.gz")
+        export_file = ExportFile(path)
+        export_file.write(CONTENT)
+        export_file.abort()
+
+        self.assertEqual(os.listdir(self.directory), [])
+
+if __name__ == "__main__":
+    unittest.main()
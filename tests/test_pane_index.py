@@ -0,0 +1,128 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "deepinterminal"))
+
+from pane_index import PaneIndex, DIRECTION_UP, DIRECTION_DOWN, DIRECTION_LEFT, DIRECTION_RIGHT
+
+HANDLE_SIZE = 1
+TOLERANCE = HANDLE_SIZE + 1
+MIN_PANE_SIZE = 40
+MAX_PANE_NUMBER = 128
+
+def split_rect(rect, pane_number, rects):
+    '''
+    Split rect randomly like nested paneds, append pane rects to rects.
+    '''
+    (x, y, w, h) = rect
+    if pane_number == 1 or (w < MIN_PANE_SIZE and h < MIN_PANE_SIZE):
+        rects.append(rect)
+        return
+
+    first_number = random.randint(1, pane_number - 1)
+    if (random.random() < 0.5 and h >= MIN_PANE_SIZE) or w < MIN_PANE_SIZE:
+        position = int(h * random.uniform(0.2, 0.8))
+        split_rect((x, y, w, position), first_number, rects)
+        split_rect((x, y + position + HANDLE_SIZE, w, h - position - HANDLE_SIZE), pane_number - first_number, rects)
+    else:
+        position = int(w * random.uniform(0.2, 0.8))
+        split_rect((x, y, position, h), first_number, rects)
+        split_rect((x + position + HANDLE_SIZE, y, w - position - HANDLE_SIZE, h), pane_number - first_number, rects)
+
+def get_distance_overlap((x, y, w, h), (cx, cy, cw, ch), direction):
+    if direction == DIRECTION_UP:
+        distance = y - (cy + ch)
+    elif direction == DIRECTION_DOWN:
+        distance = cy - (y + h)
+    elif direction == DIRECTION_LEFT:
+        distance = x - (cx + cw)
+    else:
+        distance = cx - (x + w)
+
+    if direction in [DIRECTION_UP, DIRECTION_DOWN]:
+        overlap = min(x + w, cx + cw) - max(x, cx)
+    else:
+        overlap = min(y + h, cy + ch) - max(y, cy)
+
+    return (distance, overlap)
+
+class TestPaneIndex(unittest.TestCase):
+
+    def get_candidates(self, rects, index, direction):
+        '''
+        Brute force candidates: (distance, overlap, index) of panes on that side and overlap with pane.
+        '''
+        candidates = []
+        for (candidate_index, candidate_rect) in enumerate(rects):
+            if candidate_index != index:
+                (distance, overlap) = get_distance_overlap(rects[index], candidate_rect, direction)
+                if distance >= -TOLERANCE and overlap > 0:
+                    candidates.append((distance, overlap, candidate_index))
+
+        return candidates
+
+    def check_rects(self, rects):
+        pane_index = PaneIndex(list(enumerate(rects)), TOLERANCE)
+        for index in range(len(rects)):
+            for direction in [DIRECTION_UP, DIRECTION_DOWN, DIRECTION_LEFT, DIRECTION_RIGHT]:
+                neighbour = pane_index.find_neighbour(index, direction)
+                candidates = self.get_candidates(rects, index, direction)
+                if candidates == []:
+                    self.assertEqual(neighbour, None)
+                    continue
+
+                self.assertNotEqual(neighbour, None)
+
+                # Neighbour of tiled panes is always adjacent, at nearest distance and with longest overlap.
+                nearest_distance = min(map(lambda (distance, overlap, candidate_index): distance, candidates))
+                self.assertTrue(nearest_distance <= TOLERANCE)
+
+                (distance, overlap) = get_distance_overlap(rects[index], rects[neighbour], direction)
+                self.assertTrue(abs(distance - nearest_distance) <= TOLERANCE)
+                self.assertEqual(
+                    overlap,
+                    max(map(lambda (distance, overlap, candidate_index): overlap,
+                            filter(lambda (distance, overlap, candidate_index): abs(distance - nearest_distance) <= TOLERANCE,
+                                   candidates))))
+
+                # Cached result must be same.
+                self.assertEqual(pane_index.find_neighbour(index, direction), neighbour)
+
+    def test_single_pane(self):
+        pane_index = PaneIndex([("pane", (0, 0, 800, 600))], TOLERANCE)
+        for direction in [DIRECTION_UP, DIRECTION_DOWN, DIRECTION_LEFT, DIRECTION_RIGHT]:
+            self.assertEqual(pane_index.find_neighbour("pane", direction), None)
+
+    def test_unknown_pane(self):
+        pane_index = PaneIndex([("pane", (0, 0, 800, 600))], TOLERANCE)
+        self.assertEqual(pane_index.find_neighbour("other", DIRECTION_UP), None)
+
+    def test_grid(self):
+        rects = []
+        for row in range(4):
+            for column in range(4):
+                rects.append((column * 101, row * 101, 100, 100))
+
+        pane_index = PaneIndex(list(enumerate(rects)), TOLERANCE)
+        self.assertEqual(pane_index.find_neighbour(5, DIRECTION_UP), 1)
+        self.assertEqual(pane_index.find_neighbour(5, DIRECTION_DOWN), 9)
+        self.assertEqual(pane_index.find_neighbour(5, DIRECTION_LEFT), 4)
+        self.assertEqual(pane_index.find_neighbour(5, DIRECTION_RIGHT), 6)
+        self.assertEqual(pane_index.find_neighbour(0, DIRECTION_UP), None)
+        self.assertEqual(pane_index.find_neighbour(15, DIRECTION_RIGHT), None)
+
+    def test_random_split_tree(self):
+        random.seed(0)
+        for trial in range(200):
+            rects = []
+            split_rect((0, 0, random.randint(200, 4000), random.randint(200, 3000)),
+                       random.randint(1, MAX_PANE_NUMBER), rects)
+            self.check_rects(rects)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "deepinterminal"))
+
+from session_log import SessionLog, SessionLogWriter
+
+class TestSessionLogRotate(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_rotate_in_same_second(self):
+        writer = SessionLogWriter()
+        session_log = SessionLog(os.path.join(self.directory, "session.log"))
+        contents = ["first\n", "second\n", "third\n"]
+        for content in contents:
+            writer.write_data(session_log, content)
+            writer.rotate(session_log)
+
+        rotate_names = sorted(os.listdir(self.directory))
+        self.assertEqual(len(rotate_names), len(contents))
+
+        rotate_contents = []
+        for rotate_name in rotate_names:
+            self.assertTrue(rotate_name.endswith(".gz"))
+            with gzip.open(os.path.join(self.directory, rotate_name)) as gzip_file:
+                rotate_contents.append(gzip_file.read())
+        self.assertEqual(sorted(rotate_contents), sorted(contents))
+
+if __name__ == "__main__":
+    unittest.main()
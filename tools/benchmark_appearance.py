@@ -0,0 +1,79 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+#
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+# Benchmark burst of appearance changes, such as slider dragging and Ctrl + scroll.
+#
+# Usage: python tools/benchmark_appearance.py [pane_number] [change_number]
+#
+# Emit burst of font size and transparency changes between two frames,
+# count terminal updates and time until burst applied.
+# Config is written to temporary directory, user config is not touched.
+
+import os
+import sys
+import tempfile
+import time
+
+os.environ["XDG_CONFIG_HOME"] = tempfile.mkdtemp()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "deepinterminal"))
+
+import gtk
+import main
+
+def run_pending_events():
+    while gtk.events_pending():
+        gtk.main_iteration(False)
+        
+def main_loop():
+    pane_number = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    change_number = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    
+    terminal = main.Terminal(working_directory=os.getcwd())
+    for index in xrange(pane_number - 1):
+        workspace_terminals = terminal.terminal_box.get_current_workspace().get_terminals()
+        workspace_terminals[index % len(workspace_terminals)].parent_widget.split(main.TerminalGrid.SPLIT_HORIZONTALLY)
+    run_pending_events()
+    
+    # Count updates of terminals.
+    update_counts = [0]
+    apply_appearance = main.TerminalWrapper.apply_appearance
+    def count_apply_appearance(self):
+        update_counts[0] += 1
+        apply_appearance(self)
+    main.TerminalWrapper.apply_appearance = count_apply_appearance
+    
+    start_time = time.time()
+    for index in xrange(change_number):
+        if index % 2 == 0:
+            main.global_event.emit("change-font-size", 10 + index % 6)
+        else:
+            main.global_event.emit("change-background-transparent", 0.5 + (index % 10) / 20.0)
+    run_pending_events()
+    
+    print "Panes: %s, changes: %s" % (pane_number, change_number)
+    print "Terminal updates: %s, without merge: %s" % (update_counts[0], pane_number * change_number)
+    print "Burst applied in %.3fs" % (time.time() - start_time)
+    
+if __name__ == "__main__":
+    main_loop()
@@ -0,0 +1,93 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+#
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+# Benchmark match check of pointer motion over terminal screen.
+#
+# Usage: python tools/benchmark_match_motion.py [motion_count]
+#
+# Move pointer over every cell of screen full of urls, paths, man references and commit shas,
+# and time what motion handler do: vte match check of MATCH_RULES and parse of match.
+
+import gtk
+import os
+import sys
+import time
+import vte
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "deepinterminal"))
+
+from main import MATCH_RULES, man_index
+
+SCREEN_LINES = [
+    "see https://github.com/linuxdeepin/deepin-terminal/issues and mail dev@example.com",
+    "main.c:12:5: warning: unused variable, see ~/src/main.c and ../include/config.h",
+    "printf(3) ls(1) open(2) systemd.unit(5) SSL_read(3ssl) commit 3f2a9c1d on 192.168.1.10:8080",
+    "plain text without any match plain text without any match plain text without any",
+    ]
+
+def main():
+    motion_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    
+    # Wait man index loading, otherwise man references never match.
+    man_index.refresh()
+    man_index.refresh_thread.join()
+    
+    window = gtk.Window()
+    terminal = vte.Terminal()
+    terminal.set_size(100, 24)
+    window.add(terminal)
+    window.show_all()
+    
+    match_rules = {}
+    for match_rule in MATCH_RULES:
+        match_rules[terminal.match_add(match_rule.pattern)] = match_rule
+        
+    terminal.feed("\r\n".join(map(lambda index: SCREEN_LINES[index % len(SCREEN_LINES)], xrange(24))))
+    while gtk.events_pending():
+        gtk.main_iteration(False)
+        
+    column_count = terminal.get_column_count()
+    row_count = terminal.get_row_count()
+    motion_times = []
+    match_count = 0
+    for index in xrange(motion_count):
+        (column, row) = (index % column_count, (index / column_count) % row_count)
+        
+        start_time = time.time()
+        match_text = terminal.match_check(column, row)
+        if match_text:
+            (match_string, match_tag) = match_text
+            if match_tag in match_rules and match_rules[match_tag].parse(match_string):
+                match_count += 1
+        motion_times.append(time.time() - start_time)
+        
+    motion_times.sort()
+    print "Motions: %s, matches: %s" % (motion_count, match_count)
+    print "Average: %.3fms, 99th percentile: %.3fms, max: %.3fms" % (
+        sum(motion_times) * 1000 / motion_count,
+        motion_times[int(motion_count * 0.99)] * 1000,
+        motion_times[-1] * 1000)
+    
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+#
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+# Benchmark finding running jobs of panes on quit and workspace close.
+#
+# Usage: python tools/benchmark_process_tree.py [pane_number ...]
+#
+# Compare one 'pgrep -P' per pane that used before,
+# and one /proc snapshot for all panes that ProcessTree use now.
+
+import commands
+import os
+import signal
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "deepinterminal"))
+
+from process_tree import ProcessTree
+
+def spawn_shells(pane_number):
+    '''
+    Spawn shell that run job for every pane, trailing ':' keep shell from exec job.
+    '''
+    return map(lambda index: subprocess.Popen(["sh", "-c", "sleep 600; :"], preexec_fn=os.setsid), xrange(pane_number))
+
+def find_jobs_with_pgrep(pids):
+    return filter(lambda pid: pid != '', map(lambda pid: commands.getoutput("pgrep -P %s" % pid), pids))
+
+def find_jobs_with_process_tree(pids):
+    process_tree = ProcessTree()
+    return filter(lambda job: job != None, map(process_tree.get_job, pids))
+
+def main():
+    pane_numbers = map(int, sys.argv[1:]) if len(sys.argv) > 1 else [10, 100, 500]
+    
+    for pane_number in pane_numbers:
+        shells = spawn_shells(pane_number)
+        try:
+            # Wait shells fork their jobs.
+            time.sleep(1)
+            pids = map(lambda shell: shell.pid, shells)
+            
+            for (name, find_jobs) in [("pgrep per pane", find_jobs_with_pgrep),
+                                      ("/proc snapshot", find_jobs_with_process_tree),
+                                      ]:
+                start_time = time.time()
+                jobs = find_jobs(pids)
+                print "%s panes, %s: %.3fs, %s jobs" % (pane_number, name, time.time() - start_time, len(jobs))
+        finally:
+            for shell in shells:
+                os.killpg(shell.pid, signal.SIGTERM)
+            for shell in shells:
+                shell.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+#
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+# Benchmark split latency with and without preforked shell pool.
+#
+# Usage: python tools/benchmark_split.py [split_count]
+#
+# Time split call, and time until shell of new pane print prompt.
+# Config is written to temporary directory, user config is not touched.
+
+import os
+import sys
+import tempfile
+import time
+
+os.environ["XDG_CONFIG_HOME"] = tempfile.mkdtemp()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "deepinterminal"))
+
+import gtk
+import main
+
+# Wait pool refill in idle before next split.
+REFILL_WAIT_TIME = 1.0
+
+def run_events(seconds):
+    end_time = time.time() + seconds
+    while time.time() < end_time:
+        if gtk.events_pending():
+            gtk.main_iteration(False)
+        else:
+            time.sleep(0.01)
+        
+def wait_prompt(terminal, timeout=5.0):
+    '''
+    Wait shell print prompt, return False if timeout.
+    '''
+    end_time = time.time() + timeout
+    while time.time() < end_time:
+        if terminal.get_text(lambda *args: True).strip() != "":
+            return True
+        gtk.main_iteration(True)
+        
+    return False
+
+def get_last_terminal(terminal):
+    # Terminals of workspace are in order of split tree, last one is new pane of vertical split.
+    return terminal.terminal_box.get_current_workspace().get_terminals()[-1]
+
+def benchmark(pool_size, split_count):
+    with main.save_config(main.setting_config):
+        main.setting_config.config.set("advanced", "shell_pool_size", pool_size)
+        
+    terminal = main.Terminal(working_directory=os.getcwd())
+    run_events(REFILL_WAIT_TIME)
+    
+    split_times = []
+    prompt_times = []
+    for index in xrange(split_count):
+        grid = get_last_terminal(terminal).parent_widget
+        
+        start_time = time.time()
+        grid.split(main.TerminalGrid.SPLIT_VERTICALLY)
+        split_times.append(time.time() - start_time)
+        
+        if wait_prompt(get_last_terminal(terminal)):
+            prompt_times.append(time.time() - start_time)
+            
+        run_events(REFILL_WAIT_TIME)
+        
+    print "Pool size %s: split %.3fms, prompt %.3fms (average of %s splits)" % (
+        pool_size,
+        sum(split_times) * 1000 / len(split_times),
+        sum(prompt_times) * 1000 / max(1, len(prompt_times)),
+        split_count)
+    
+def main_loop():
+    split_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    
+    for pool_size in [0, 1]:
+        benchmark(pool_size, split_count)
+        
+if __name__ == "__main__":
+    main_loop()
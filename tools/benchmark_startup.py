@@ -0,0 +1,77 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+#
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+# Benchmark startup of terminal window.
+#
+# Usage: python tools/benchmark_startup.py
+#
+# Measure time to first frame of window, components that built lazily after first frame,
+# and time that first frame would wait if those components were built in startup.
+# Config is read from temporary directory, user config is not touched.
+
+import os
+import sys
+import tempfile
+import time
+
+start_time = time.time()
+
+os.environ["XDG_CONFIG_HOME"] = tempfile.mkdtemp()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "deepinterminal"))
+
+import gtk
+import main
+
+def first_expose(widget, event, terminal, handler_ids):
+    widget.disconnect(handler_ids[0])
+    first_frame_time = time.time() - start_time
+    print "Time to first frame: %.3fs" % first_frame_time
+    
+    # Build components before terminal warm up them in idle.
+    deferred_time = 0
+    for (component_name, component) in terminal.lazy_components.items():
+        if not component.is_built():
+            build_start_time = time.time()
+            component.get()
+            build_time = time.time() - build_start_time
+            deferred_time += build_time
+            print "Deferred %s: %.3fs" % (component_name, build_time)
+            
+    print "Time to first frame if components built in startup: %.3fs" % (first_frame_time + deferred_time)
+    gtk.main_quit()
+    
+    return False
+
+def main_loop():
+    print "Import: %.3fs" % (time.time() - start_time)
+    
+    terminal = main.Terminal(working_directory=os.getcwd())
+    handler_ids = []
+    handler_ids.append(terminal.application.window.connect_after(
+            "expose-event", first_expose, terminal, handler_ids))
+    
+    gtk.main()
+    
+if __name__ == "__main__":
+    main_loop()
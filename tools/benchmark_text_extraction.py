@@ -0,0 +1,83 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+#
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Benchmark text extraction of 100k scrollback lines from vte.
+#
+# Usage: python tools/benchmark_text_extraction.py [line_count]
+#
+# Compare per-cell Python callback that used before, one vte call per row,
+# and one vte call per chunk that ScrollbackReader use now.
+
+import gtk
+import sys
+import time
+import vte
+
+CHUNK_ROWS = 500
+
+def feed_lines(terminal, line_count):
+    for index in xrange(0, line_count, 1000):
+        terminal.feed("".join(map(lambda i: "line %s: %s\r\n" % (i, "x" * (i % 120)),
+                                  xrange(index, min(index + 1000, line_count)))))
+        while gtk.events_pending():
+            gtk.main_iteration(False)
+
+def read_with_callback(terminal, first_row, last_row, column_count):
+    return terminal.get_text_range(first_row, 0, last_row, column_count - 1, lambda *args: True)
+
+def read_per_row(terminal, first_row, last_row, column_count):
+    return map(lambda row: terminal.get_text_range(row, 0, row, column_count - 1),
+               xrange(first_row, last_row + 1))
+
+def read_per_chunk(terminal, first_row, last_row, column_count):
+    return map(lambda row: terminal.get_text_range(row, 0, min(row + CHUNK_ROWS, last_row + 1) - 1, column_count - 1),
+               xrange(first_row, last_row + 1, CHUNK_ROWS))
+
+def main():
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    
+    window = gtk.Window()
+    terminal = vte.Terminal()
+    terminal.set_scrollback_lines(line_count * 2)
+    terminal.set_size(80, 24)
+    window.add(terminal)
+    window.show_all()
+    
+    feed_lines(terminal, line_count)
+    
+    adjustment = terminal.get_adjustment()
+    first_row = int(adjustment.get_lower())
+    last_row = int(adjustment.get_upper()) - 1
+    column_count = terminal.get_column_count()
+    print "Rows: %s, columns: %s" % (last_row - first_row + 1, column_count)
+    
+    for (name, read_text) in [("Per-cell callback", read_with_callback),
+                              ("One call per row", read_per_row),
+                              ("One call per %s rows" % CHUNK_ROWS, read_per_chunk),
+                              ]:
+        start_time = time.time()
+        read_text(terminal, first_row, last_row, column_count)
+        print "%s: %.3fs" % (name, time.time() - start_time)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+#
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+# Benchmark latency of switching workspaces.
+#
+# Usage: python tools/benchmark_workspace_switch.py [workspace_number] [switch_number]
+#
+# Every workspace has some panes full of output, switch between them,
+# and time until new workspace is laid out and drawn.
+# Config is written to temporary directory, user config is not touched.
+
+import os
+import sys
+import tempfile
+import time
+
+os.environ["XDG_CONFIG_HOME"] = tempfile.mkdtemp()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "deepinterminal"))
+
+import gtk
+import main
+
+PANE_NUMBER = 4
+
+def run_pending_events():
+    while gtk.events_pending():
+        gtk.main_iteration(False)
+        
+def main_loop():
+    workspace_number = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    switch_number = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    
+    terminal = main.Terminal(working_directory=os.getcwd())
+    for index in xrange(workspace_number):
+        if index > 0:
+            terminal.new_workspace(os.getcwd())
+            
+        for pane_index in xrange(PANE_NUMBER - 1):
+            terminal.terminal_box.get_current_workspace().get_terminals()[-1].parent_widget.split(
+                main.TerminalGrid.SPLIT_VERTICALLY)
+            
+        for workspace_terminal in terminal.terminal_box.get_current_workspace().get_terminals():
+            workspace_terminal.feed("".join(map(lambda line: "line %s\r\n" % line, xrange(200))))
+            
+        run_pending_events()
+        
+    switch_times = []
+    for index in xrange(switch_number):
+        start_time = time.time()
+        terminal.switch_to_workspace(index % workspace_number)
+        # Relayout and redraw run in idle, new workspace is drawn when events are processed.
+        run_pending_events()
+        switch_times.append(time.time() - start_time)
+        
+    switch_times.sort()
+    print "Workspaces: %s, panes per workspace: %s, switches: %s" % (workspace_number, PANE_NUMBER, switch_number)
+    print "Average: %.3fms, median: %.3fms, max: %.3fms" % (
+        sum(switch_times) * 1000 / switch_number,
+        switch_times[switch_number / 2] * 1000,
+        switch_times[-1] * 1000)
+    
+if __name__ == "__main__":
+    main_loop()